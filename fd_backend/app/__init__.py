@@ -1,14 +1,80 @@
 from flask import Flask, jsonify, make_response, send_from_directory, render_template_string
-from app.extensions import db, migrate, bcrypt, jwt, mail
+from app.extensions import db, migrate, bcrypt, jwt, mail, query_instrumentation, metrics, background_tasks, cache
 from flask_cors import CORS
 from config import config_by_name
 from app.models import *
+from app.inventory import purge_expired_reservations, take_stock_snapshots, reconcile_stock, rebuild_low_stock
+from app.orders import rebuild_customer_stats
+from app.privacy import resume_erasures
+from app.inbox import sweep_response_emails
+from app.sentiment import analyze_feedback
+from app.static_export import export_static
+from app.commands import register_commands
+from sqlalchemy import inspect
 import os
 from app.status_codes import (
     HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST,
     HTTP_404_NOT_FOUND, HTTP_401_UNAUTHORIZED, HTTP_500_INTERNAL_SERVER_ERROR
 )
 
+def _missing_columns():
+    """'table.column' for every model column the database does not have yet"""
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        missing.extend(f'{table.name}.{column.name}' for column in table.columns if column.name not in existing)
+    return missing
+
+
+def _prepare_database(app):
+    """Seed an empty database and build the derived tables that are still empty"""
+    # Seed database if empty
+    if Product.query.count() == 0:
+        from app.seed_data import seed_database
+        from app.catalog import refresh_price_range
+        seed_database()
+        refresh_price_range()
+        db.session.commit()
+    
+    # File products created before the category table existed
+    try:
+        from app.categories import sync_product_categories
+        if sync_product_categories():
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error assigning product categories: {e}")
+    
+    # Normalize phone numbers of customers created before phone search existed
+    try:
+        from app.customers import backfill_phone_numbers
+        backfill_phone_numbers()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error normalizing customer phone numbers: {e}")
+    
+    # Build customer_stats on first start; order writes keep it current after that
+    try:
+        if app.config.get('CUSTOMER_STATS_ENABLED', True) and CustomerStats.query.first() is None:
+            rebuild_customer_stats()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error building customer stats: {e}")
+    
+    # Build low_stock_products on first start; stock writes and the periodic
+    # rebuild keep it current after that
+    try:
+        if LowStockProduct.query.first() is None:
+            rebuild_low_stock()
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error rebuilding low stock products: {e}")
+
+
 def create_app(config_class=None):
     app = Flask(__name__)
     
@@ -25,6 +91,10 @@ def create_app(config_class=None):
     bcrypt.init_app(app)
     jwt.init_app(app)
     mail.init_app(app)
+    query_instrumentation.init_app(app)
+    metrics.init_app(app)
+    background_tasks.init_app(app)
+    cache.init_app(app)
     
     # Configure CORS
     CORS(app, resources={
@@ -52,6 +122,8 @@ def create_app(config_class=None):
     app.register_blueprint(admin_bp)
     from app.controllers.product import product_bp
     app.register_blueprint(product_bp)  
+    from app.controllers.category import category_bp
+    app.register_blueprint(category_bp)
     from app.controllers.order import order_bp
     app.register_blueprint(order_bp)
     from app.controllers.feedback import feedback_bp
@@ -62,6 +134,8 @@ def create_app(config_class=None):
     app.register_blueprint(cart_bp)
     from app.controllers.content import content_bp
     app.register_blueprint(content_bp)
+    from app.controllers.health import health_bp
+    app.register_blueprint(health_bp)
     
     # Create directories
     with app.app_context():
@@ -79,26 +153,87 @@ def create_app(config_class=None):
         
         db.create_all()
         
-        # Seed database if empty
-        if Product.query.count() == 0:
-            from app.seed_data import seed_database
-            seed_database()
+        # create_all() adds new tables but never new columns to existing ones;
+        # until `flask db upgrade` has run, the startup tasks would fail on them
+        missing = _missing_columns()
+        if missing:
+            app.logger.warning(
+                f"Database schema is behind the models (missing {', '.join(missing)}); "
+                "run 'flask db upgrade'. Skipping the startup data tasks."
+            )
+        else:
+            _prepare_database(app)
+    
+    # Periodic background jobs
+    background_tasks.add_periodic(
+        'purge_guest_carts',
+        app.config.get('GUEST_CART_SWEEP_INTERVAL', 3600),
+        GuestCart.purge_expired
+    )
+    background_tasks.add_periodic(
+        'purge_expired_reservations',
+        app.config.get('RESERVATION_SWEEP_INTERVAL', 60),
+        purge_expired_reservations
+    )
+    background_tasks.add_periodic(
+        'take_stock_snapshots',
+        app.config.get('STOCK_SNAPSHOT_INTERVAL', 300),
+        take_stock_snapshots
+    )
+    # One worker reconciles, so each stock_drift is logged (and alerted on) once
+    background_tasks.add_periodic(
+        'reconcile_stock',
+        app.config.get('STOCK_RECONCILE_INTERVAL', 3600),
+        reconcile_stock,
+        exclusive=True,
+        chunk_size=app.config.get('STOCK_RECONCILE_CHUNK_SIZE', 500)
+    )
+    background_tasks.add_periodic(
+        'rebuild_low_stock',
+        app.config.get('LOW_STOCK_REBUILD_INTERVAL', 3600),
+        rebuild_low_stock
+    )
+    if app.config.get('CUSTOMER_STATS_ENABLED', True):
+        # Corrects any drift in the incrementally maintained customer_stats;
+        # one worker is enough
+        background_tasks.add_periodic(
+            'rebuild_customer_stats',
+            app.config.get('CUSTOMER_STATS_REBUILD_INTERVAL', 86400),
+            rebuild_customer_stats,
+            exclusive=True
+        )
+    background_tasks.add_periodic(
+        'resume_erasures',
+        app.config.get('CUSTOMER_ERASURE_SWEEP_INTERVAL', 300),
+        resume_erasures
+    )
+    if app.config.get('FEEDBACK_ANALYSIS_ENABLED', True):
+        # Tags feedback whose submit-time job was lost, and any backlog; one
+        # worker does it, so the same rows are not analyzed once per worker
+        background_tasks.add_periodic(
+            'analyze_feedback',
+            app.config.get('FEEDBACK_ANALYSIS_INTERVAL', 300),
+            analyze_feedback,
+            exclusive=True
+        )
+    # Emails owed for responses whose batch was cut short; one worker sends them
+    background_tasks.add_periodic(
+        'sweep_response_emails',
+        app.config.get('FEEDBACK_EMAIL_SWEEP_INTERVAL', 600),
+        sweep_response_emails,
+        exclusive=True
+    )
+    if app.config.get('STATIC_EXPORT_ENABLED'):
+        # Picks up changes made by other workers and product changes in best sellers;
+        # one worker is enough, since they all write the same directory
+        background_tasks.add_periodic(
+            'export_static',
+            app.config.get('STATIC_EXPORT_INTERVAL', 300),
+            export_static,
+            exclusive=True
+        )
     
-    # Health check endpoint
-    @app.route('/health')
-    def health_check():
-        try:
-            db.session.execute('SELECT 1')
-            return jsonify({
-                'status': 'healthy',
-                'database': 'connected'
-            }), 200
-        except Exception as e:
-            return jsonify({
-                'status': 'unhealthy',
-                'database': 'disconnected',
-                'error': str(e)
-            }), 503
+    register_commands(app)
     
     @app.route('/test-cors')
     def test_cors():
@@ -0,0 +1,179 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+# Namespaces shared between modules
+PRODUCTS = 'products'
+CATEGORIES = 'categories'
+HEALTH_TIPS = 'health_tips'
+CONTENT = 'content'
+CONTACT = 'contact'
+
+
+class Cache:
+    """
+    In-process cache for computed responses, grouped into namespaces.
+
+    Every namespace has a version stored in the cache_namespaces table and
+    entries are keyed by it, so invalidate() only has to bump the version:
+    each worker process notices within CACHE_VERSION_CHECK_INTERVAL seconds
+    and the old entries age out of the LRU. Call invalidate() after the
+    change has been committed, so no worker can cache pre-change data under
+    the new version.
+    """
+
+    def __init__(self, app=None):
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._versions = {}  # namespace -> (version, checked_at)
+        self._lock = threading.RLock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_ENABLED', True)
+        app.config.setdefault('CACHE_DEFAULT_TTL', 300)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 2000)
+        app.config.setdefault('CACHE_VERSION_CHECK_INTERVAL', 2)
+        app.extensions['cache'] = self
+
+    @property
+    def enabled(self):
+        return current_app.config.get('CACHE_ENABLED', True)
+
+    # Namespace versions
+    def versions(self, *namespaces):
+        """Current version of each namespace, reading stale ones in one query"""
+        from app.extensions import db
+        from app.models.cache_namespace import CacheNamespace
+
+        interval = current_app.config.get('CACHE_VERSION_CHECK_INTERVAL', 2)
+        now = time.monotonic()
+        result = {}
+        stale = []
+        for namespace in namespaces:
+            cached = self._versions.get(namespace)
+            if cached and now - cached[1] < interval:
+                result[namespace] = cached[0]
+            else:
+                stale.append(namespace)
+
+        if stale:
+            rows = dict(db.session.query(CacheNamespace.namespace, CacheNamespace.version).filter(
+                CacheNamespace.namespace.in_(stale)
+            ).all())
+            for namespace in stale:
+                result[namespace] = rows.get(namespace, 0)
+                self._versions[namespace] = (result[namespace], now)
+        return result
+
+    def version(self, namespace):
+        return self.versions(namespace)[namespace]
+
+    def invalidate(self, *namespaces):
+        """Bump the namespaces' versions (in their own transaction) so cached entries are dropped everywhere"""
+        from app.extensions import db
+
+        self.bump(*namespaces)
+        db.session.commit()
+        self.forget(*namespaces)
+
+    def bump(self, *namespaces):
+        """
+        Bump the namespaces' versions in the caller's transaction, for changes
+        made by code that leaves the commit to its caller: the new versions
+        become visible together with the change. Call forget() after the
+        commit so this worker sees them straight away.
+        """
+        from app.extensions import db
+        from app.models.cache_namespace import CacheNamespace
+
+        for namespace in namespaces:
+            result = db.session.execute(
+                update(CacheNamespace)
+                .where(CacheNamespace.namespace == namespace)
+                .values(version=CacheNamespace.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                try:
+                    with db.session.begin_nested():
+                        db.session.add(CacheNamespace(namespace=namespace, version=1))
+                except IntegrityError:
+                    # Created by another worker in the meantime
+                    db.session.execute(
+                        update(CacheNamespace)
+                        .where(CacheNamespace.namespace == namespace)
+                        .values(version=CacheNamespace.version + 1)
+                        .execution_options(synchronize_session=False)
+                    )
+
+    def forget(self, *namespaces):
+        """Drop this worker's remembered versions, so the next read goes to the database"""
+        with self._lock:
+            for namespace in namespaces:
+                self._versions.pop(namespace, None)
+
+    # Entries
+    def _key(self, namespace, key, version=None):
+        if version is None:
+            version = self.version(namespace)
+        return f'{namespace}:{version}:{key}'
+
+    def get(self, namespace, key, default=None):
+        if not self.enabled:
+            return default
+        full_key = self._key(namespace, key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is None:
+                return default
+            if entry[0] < time.monotonic():
+                del self._entries[full_key]
+                return default
+            self._entries.move_to_end(full_key)
+            return entry[1]
+
+    def set(self, namespace, key, value, ttl=None, version=None):
+        if not self.enabled:
+            return
+        ttl = ttl if ttl is not None else current_app.config.get('CACHE_DEFAULT_TTL', 300)
+        full_key = self._key(namespace, key, version)
+        max_entries = current_app.config.get('CACHE_MAX_ENTRIES', 2000)
+        with self._lock:
+            self._entries[full_key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_set(self, namespace, key, func, ttl=None):
+        """
+        Return the cached value, or compute it with func() and cache it.
+        Cached values are shared between requests and must not be mutated.
+        """
+        from app.extensions import metrics
+
+        if not self.enabled:
+            return func()
+        # Pin the version first, so a value computed across an invalidation is filed under the old one
+        version = self.version(namespace)
+        full_key = self._key(namespace, key, version)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and entry[0] >= time.monotonic():
+                self._entries.move_to_end(full_key)
+                metrics.cache_requests_total.inc(namespace=namespace, result='hit')
+                return entry[1]
+
+        metrics.cache_requests_total.inc(namespace=namespace, result='miss')
+        value = func()
+        self.set(namespace, key, value, ttl=ttl, version=version)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
@@ -0,0 +1,583 @@
+# app/catalog.py
+# Bulk catalog import/export. Rows are streamed from CSV or NDJSON, validated
+# one by one and upserted by SKU in chunks with the database's native upsert
+# (INSERT ... ON DUPLICATE KEY UPDATE on MySQL, ON CONFLICT on SQLite/PostgreSQL).
+# Bulk admin operations change many products with set-based UPDATEs.
+# Variant prices are denormalized onto products.min_price/max_price so price
+# filters and sorting never have to aggregate variants at read time.
+# Faceted browsing counts active products per category, price bucket, featured
+# and in-stock from one cached GROUP BY over all four.
+from app.extensions import db, cache
+from app.cache import PRODUCTS
+from app.models.product import Product, ProductVariant
+from app.models.inventory import StockMovement
+from app.inventory import set_stock_levels, adjust_stock_bulk, sync_low_stock
+from app.categories import sync_product_categories, find_category, subtree_ids, category_tree
+from flask import current_app
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.orm import selectinload
+from datetime import datetime
+import csv
+import io
+import json
+import time
+
+REQUIRED_FIELDS = ('sku', 'name', 'price', 'category')
+OPTIONAL_FIELDS = ('description', 'image_url', 'is_active', 'is_featured')
+EXPORT_FIELDS = ('id', 'sku', 'name', 'description', 'price', 'category', 'stock_quantity',
+                 'image_url', 'is_active', 'is_featured')
+
+# Errors beyond this many are counted but not listed
+MAX_REPORTED_ERRORS = 1000
+
+# Listing sort orders, served from the denormalized price range
+PRODUCT_SORTS = {
+    'price_asc': (Product.min_price.asc(), Product.id.asc()),
+    'price_desc': (Product.max_price.desc(), Product.id.asc()),
+    'name': (Product.name.asc(), Product.id.asc()),
+    'newest': (Product.created_at.desc(), Product.id.desc())
+}
+
+
+def listing_query(query=None):
+    """
+    Product query that loads variants and best-seller flags for the whole
+    result in one extra query each, instead of one per product.
+    """
+    query = query if query is not None else Product.query
+    return query.options(selectinload(Product.variants), selectinload(Product.best_seller_info))
+
+
+def featured_products():
+    """Featured products as dicts with their variants, cached while products are unchanged"""
+    def load():
+        products = listing_query(Product.query.filter_by(is_featured=True)).all()
+        return [product.to_dict(include_variants=True) for product in products]
+
+    return cache.get_or_set(PRODUCTS, 'featured', load, ttl=current_app.config.get('CACHE_PRODUCTS_TTL'))
+
+
+def refresh_price_range(product_ids=None):
+    """
+    Recompute min_price/max_price from active variants, falling back to the
+    product's own price, with one correlated UPDATE. Refreshes every product
+    when product_ids is None. The caller commits.
+    """
+    def variant_price(aggregate):
+        return select(aggregate(ProductVariant.price)).where(
+            ProductVariant.product_id == Product.id,
+            ProductVariant.is_active.is_(True)
+        ).scalar_subquery()
+
+    statement = update(Product).values(
+        min_price=func.coalesce(variant_price(func.min), Product.price),
+        max_price=func.coalesce(variant_price(func.max), Product.price),
+        # Keep updated_at as is; this is derived data
+        updated_at=Product.updated_at
+    ).execution_options(synchronize_session=False)
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return 0
+        statement = statement.where(Product.id.in_(product_ids))
+    return db.session.execute(statement).rowcount
+
+
+def parse_csv(stream):
+    """Yield (line_number, row dict) from a binary CSV stream with a header row"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    for row in reader:
+        yield reader.line_num, {key.strip(): value for key, value in row.items() if key}
+
+
+def parse_ndjson(stream):
+    """Yield (line_number, row) from a binary stream of one JSON object per line"""
+    for line_number, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8'), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = {'__error__': f'Invalid JSON: {e}'}
+        yield line_number, row if isinstance(row, dict) else {'__error__': 'Expected a JSON object'}
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ('true', '1', 'yes', 'y', 'on'):
+        return True
+    if isinstance(value, str) and value.strip().lower() in ('false', '0', 'no', 'n', 'off', ''):
+        return False
+    if isinstance(value, int):
+        return bool(value)
+    raise ValueError('must be a boolean')
+
+
+def validate_row(row):
+    """
+    Turn a raw import row into column values.
+    Returns (values, stock_quantity, errors); stock_quantity is None when not given.
+    """
+    if '__error__' in row:
+        return None, None, [row['__error__']]
+
+    errors = []
+    values = {}
+    for field in REQUIRED_FIELDS:
+        value = row.get(field)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            errors.append(f'{field} is required')
+
+    sku = str(row.get('sku') or '').strip()
+    if sku and len(sku) > 64:
+        errors.append('sku must be at most 64 characters')
+    values['sku'] = sku
+
+    name = str(row.get('name') or '').strip()
+    if len(name) > 255:
+        errors.append('name must be at most 255 characters')
+    values['name'] = name
+
+    category = str(row.get('category') or '').strip()
+    if len(category) > 100:
+        errors.append('category must be at most 100 characters')
+    values['category'] = category
+
+    if row.get('price') not in (None, ''):
+        try:
+            values['price'] = float(row['price'])
+            if values['price'] <= 0:
+                errors.append('price must be greater than 0')
+        except (TypeError, ValueError):
+            errors.append('price must be a number')
+
+    stock_quantity = None
+    if row.get('stock_quantity') not in (None, ''):
+        try:
+            stock_quantity = int(row['stock_quantity'])
+            if stock_quantity < 0:
+                errors.append('stock_quantity cannot be negative')
+        except (TypeError, ValueError):
+            errors.append('stock_quantity must be an integer')
+
+    for field in OPTIONAL_FIELDS:
+        if field not in row or row[field] is None:
+            continue
+        if field in ('is_active', 'is_featured'):
+            try:
+                values[field] = _parse_bool(row[field])
+            except ValueError as e:
+                errors.append(f'{field} {e}')
+        else:
+            values[field] = str(row[field]).strip() or None
+
+    return values, stock_quantity, errors
+
+
+def upsert_statement(rows, update_columns):
+    """Build the dialect-native upsert of `rows` keyed on products.sku"""
+    dialect = db.engine.dialect.name
+    if dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(Product.__table__).values(rows)
+        return statement.on_duplicate_key_update(
+            {column: statement.inserted[column] for column in update_columns}
+        )
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f'Bulk upsert is not supported on {dialect}')
+    statement = insert(Product.__table__).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=['sku'],
+        set_={column: statement.excluded[column] for column in update_columns}
+    )
+
+
+def _flush_chunk(chunk, report, created_by):
+    """Upsert one chunk of validated rows and apply their stock levels in one transaction"""
+    # Last row wins when a SKU repeats within the chunk
+    by_sku = {}
+    for values, stock_quantity in chunk:
+        by_sku[values['sku']] = (values, stock_quantity)
+
+    existing = dict(db.session.query(Product.sku, Product.id).filter(Product.sku.in_(list(by_sku))).all())
+    now = datetime.utcnow()
+
+    # Rows providing different columns only update the columns they provide
+    groups = {}
+    for values, _ in by_sku.values():
+        groups.setdefault(tuple(sorted(values)), []).append(values)
+    for columns, rows in groups.items():
+        for values in rows:
+            values['updated_at'] = now
+        update_columns = [column for column in columns if column != 'sku'] + ['updated_at']
+        db.session.execute(upsert_statement(rows, update_columns))
+
+    ids = dict(db.session.query(Product.sku, Product.id).filter(Product.sku.in_(list(by_sku))).all())
+    refresh_price_range(ids.values())
+    sync_product_categories(ids.values())
+    levels = {sku: stock_quantity for sku, (_, stock_quantity) in by_sku.items() if stock_quantity is not None}
+    if levels:
+        set_stock_levels(
+            {ids[sku]: quantity for sku, quantity in levels.items() if sku in ids},
+            note='Bulk import', created_by=created_by
+        )
+    db.session.commit()
+
+    report['inserted'] += sum(1 for sku in by_sku if sku not in existing)
+    report['updated'] += sum(1 for sku in by_sku if sku in existing)
+
+
+def import_products(rows, chunk_size=1000, dry_run=False, created_by=None):
+    """
+    Validate and upsert `rows` (an iterable of (line_number, row dict)) in
+    chunks of `chunk_size`, one transaction per chunk. Invalid rows are
+    reported and skipped; a chunk that fails to write is rolled back and its
+    rows reported as failed. Returns a report including rows/sec.
+    """
+    started = time.perf_counter()
+    report = {'rows': 0, 'inserted': 0, 'updated': 0, 'failed': 0, 'errors': [], 'dry_run': dry_run}
+
+    def add_error(line, sku, messages):
+        report['failed'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'line': line, 'sku': sku, 'errors': messages})
+
+    chunk = []
+    chunk_lines = []
+
+    def flush():
+        if not chunk:
+            return
+        if dry_run:
+            report['inserted'] += len(chunk)
+        else:
+            try:
+                _flush_chunk(chunk, report, created_by)
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Bulk import chunk failed: {str(e)}")
+                for line, (values, _) in zip(chunk_lines, chunk):
+                    add_error(line, values.get('sku'), [f'Chunk failed to write: {e.__class__.__name__}'])
+        chunk.clear()
+        chunk_lines.clear()
+
+    for line, row in rows:
+        report['rows'] += 1
+        values, stock_quantity, errors = validate_row(row)
+        if errors:
+            add_error(line, (values or {}).get('sku') or row.get('sku'), errors)
+            continue
+        chunk.append((values, stock_quantity))
+        chunk_lines.append(line)
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+
+    elapsed = time.perf_counter() - started
+    report['elapsed_seconds'] = round(elapsed, 3)
+    report['rows_per_second'] = round(report['rows'] / elapsed, 1) if elapsed > 0 else None
+    if dry_run:
+        # Nothing was written, so nothing can be classed as inserted or updated
+        report['valid'] = report.pop('inserted')
+        report.pop('updated')
+    return report
+
+
+def export_rows(chunk_size=1000):
+    """Yield catalog rows as dicts, reading the table in keyset-paginated chunks"""
+    columns = [getattr(Product, field) for field in EXPORT_FIELDS]
+    last_id = 0
+    while True:
+        rows = db.session.query(*columns).filter(Product.id > last_id).order_by(Product.id).limit(chunk_size).all()
+        if not rows:
+            break
+        for row in rows:
+            yield dict(zip(EXPORT_FIELDS, row))
+        last_id = rows[-1][0]
+        if len(rows) < chunk_size:
+            break
+
+
+def export_csv(chunk_size=1000):
+    """Yield the catalog as CSV text, a chunk of rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    count = 0
+    for row in export_rows(chunk_size):
+        writer.writerow(row)
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_ndjson(chunk_size=1000):
+    """Yield the catalog as NDJSON, a chunk of rows at a time"""
+    lines = []
+    for row in export_rows(chunk_size):
+        lines.append(json.dumps(row))
+        if len(lines) >= chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def select_products(product_ids=None, filters=None):
+    """Query of product IDs matching an explicit ID list and/or a filter"""
+    query = db.session.query(Product.id)
+    if product_ids is not None:
+        query = query.filter(Product.id.in_(product_ids))
+    filters = filters or {}
+    if filters.get('category'):
+        category = find_category(filters['category'])
+        query = query.filter(Product.category_id.in_(subtree_ids(category) if category else []))
+    for field in ('is_active', 'is_featured'):
+        if filters.get(field) is not None:
+            query = query.filter(getattr(Product, field) == filters[field])
+    return query
+
+
+def bulk_update_products(selection, is_active=None, is_featured=None, price_change_percent=None,
+                         stock_delta=None, dry_run=False, created_by=None):
+    """
+    Apply flag and price changes to every selected product with one
+    UPDATE ... WHERE id IN (...), after locking the selection in one query;
+    stock deltas go through the ledger as one batched adjustment.
+    Returns a report of what matched and changed. The caller commits.
+    """
+    product_ids = [row.id for row in selection.order_by(Product.id).with_for_update().all()]
+    report = {'matched': len(product_ids), 'updated': 0, 'product_ids': product_ids, 'dry_run': dry_run}
+    if dry_run or not product_ids:
+        return report
+
+    values = {}
+    if is_active is not None:
+        values['is_active'] = is_active
+    if is_featured is not None:
+        values['is_featured'] = is_featured
+    if price_change_percent:
+        values['price'] = func.round(Product.price * (1 + price_change_percent / 100.0), 2)
+
+    if values:
+        values['updated_at'] = datetime.utcnow()
+        result = db.session.execute(
+            update(Product)
+            .where(Product.id.in_(product_ids))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        report['updated'] = result.rowcount
+        if price_change_percent:
+            # Variants move with their product, then the price index follows
+            db.session.execute(
+                update(ProductVariant)
+                .where(ProductVariant.product_id.in_(product_ids))
+                .values(
+                    price=func.round(ProductVariant.price * (1 + price_change_percent / 100.0), 2),
+                    updated_at=values['updated_at']
+                )
+                .execution_options(synchronize_session=False)
+            )
+            refresh_price_range(product_ids)
+
+    if stock_delta:
+        adjusted, skipped = adjust_stock_bulk(
+            product_ids, stock_delta,
+            movement_type=StockMovement.RECEIPT if stock_delta > 0 else StockMovement.ADJUSTMENT,
+            note='Bulk update', created_by=created_by
+        )
+        report['stock'] = {'adjusted': len(adjusted), 'skipped_below_zero': skipped}
+    elif is_active is not None:
+        # Deactivated products leave the low-stock set, reactivated ones may rejoin it
+        sync_low_stock(product_ids)
+    if is_active is not None:
+        sync_product_categories(product_ids)
+    return report
+
+
+def price_buckets():
+    """
+    Price facet buckets from PRICE_FACET_EDGES, as (key, low, high) with
+    high None for the last one: edges 5,10 give 0-5, 5-10 and 10+.
+    """
+    edges = sorted({
+        float(edge) for edge in str(current_app.config.get('PRICE_FACET_EDGES', '5,10,20,50')).split(',')
+        if edge.strip()
+    })
+    buckets = []
+    low = 0.0
+    for edge in edges:
+        buckets.append((f'{low:g}-{edge:g}', low, edge))
+        low = edge
+    buckets.append((f'{low:g}+', low, None))
+    return buckets
+
+
+def _price_bucket_expression(buckets):
+    """CASE expression putting a product's from-price (min_price) in its bucket"""
+    price = func.coalesce(Product.min_price, Product.price)
+    return case(
+        *[(price < high, key) for key, _, high in buckets if high is not None],
+        else_=buckets[-1][0]
+    )
+
+
+def _price_bucket_condition(buckets, keys):
+    price = func.coalesce(Product.min_price, Product.price)
+    conditions = []
+    for key, low, high in buckets:
+        if key in keys:
+            conditions.append(price >= low if high is None else (price >= low) & (price < high))
+    return or_(*conditions)
+
+
+def facet_cube():
+    """
+    Active product counts grouped by (category_id, price bucket, featured,
+    in stock), from one GROUP BY. Every facet count for every filter
+    combination is a sum over these rows, so the cube is all a browse
+    request needs besides its page of results. Cached until products change.
+    """
+    def load():
+        buckets = price_buckets()
+        bucket = _price_bucket_expression(buckets).label('bucket')
+        in_stock = case((Product.stock_quantity > 0, True), else_=False).label('in_stock')
+        rows = db.session.query(
+            Product.category_id,
+            bucket,
+            Product.is_featured,
+            in_stock,
+            func.count(Product.id)
+        ).filter(Product.is_active.is_(True)).group_by(
+            Product.category_id, bucket, Product.is_featured, in_stock
+        ).all()
+        return [
+            (category_id, bucket_key, bool(is_featured), bool(has_stock), count)
+            for category_id, bucket_key, is_featured, has_stock, count in rows
+        ]
+
+    return cache.get_or_set(PRODUCTS, 'facet_cube', load, ttl=current_app.config.get('CACHE_PRODUCTS_TTL'))
+
+
+def _matches(row, filters, skip=None):
+    category_id, bucket, is_featured, in_stock, _ = row
+    if skip != 'category' and filters.get('category') is not None and category_id not in filters['category']:
+        return False
+    if skip != 'price' and filters.get('price') is not None and bucket not in filters['price']:
+        return False
+    if skip != 'featured' and filters.get('featured') is not None and is_featured != filters['featured']:
+        return False
+    if skip != 'in_stock' and filters.get('in_stock') is not None and in_stock != filters['in_stock']:
+        return False
+    return True
+
+
+def facet_counts(filters):
+    """
+    Facet counts for a browse request. Each facet is counted with every
+    filter except its own, so the other values of a facet stay selectable.
+    Category counts include subcategories.
+    """
+    cube = facet_cube()
+
+    own = {}
+    for row in cube:
+        if _matches(row, filters, skip='category'):
+            own[row[0]] = own.get(row[0], 0) + row[4]
+    _, by_id = category_tree()
+    totals = {}
+    for category_id, count in own.items():
+        # Add each category's products to it and every ancestor
+        current = category_id
+        while current is not None and current in by_id:
+            totals[current] = totals.get(current, 0) + count
+            current = by_id[current]['parent_id']
+    categories = [
+        {
+            'id': category_id,
+            'name': by_id[category_id]['name'],
+            'slug': by_id[category_id]['slug'],
+            'parent_id': by_id[category_id]['parent_id'],
+            'count': count
+        }
+        for category_id, count in totals.items()
+    ]
+    categories.sort(key=lambda item: (by_id[item['id']]['display_order'], item['name']))
+
+    price = {key: 0 for key, _, _ in price_buckets()}
+    featured = {'true': 0, 'false': 0}
+    in_stock = {'true': 0, 'false': 0}
+    for row in cube:
+        _, bucket, is_featured, has_stock, count = row
+        if _matches(row, filters, skip='price') and bucket in price:
+            price[bucket] += count
+        if _matches(row, filters, skip='featured'):
+            featured['true' if is_featured else 'false'] += count
+        if _matches(row, filters, skip='in_stock'):
+            in_stock['true' if has_stock else 'false'] += count
+
+    buckets = price_buckets()
+    return {
+        'category': categories,
+        'price': [
+            {'key': key, 'min': low, 'max': high, 'count': price[key]}
+            for key, low, high in buckets
+        ],
+        'featured': featured,
+        'in_stock': in_stock
+    }
+
+
+def browse_products(filters, sort=None, page=1, per_page=24):
+    """
+    One page of active products matching `filters` plus facet counts and
+    the total, all served from the cache while products are unchanged.
+    `filters` holds 'category' (set of category ids, subcategories already
+    included), 'price' (set of bucket keys), 'featured' and 'in_stock'
+    (booleans); None or missing means unfiltered.
+    """
+    total = sum(row[4] for row in facet_cube() if _matches(row, filters))
+    key = 'browse:' + json.dumps({
+        'category': sorted(filters['category']) if filters.get('category') is not None else None,
+        'price': sorted(filters['price']) if filters.get('price') is not None else None,
+        'featured': filters.get('featured'),
+        'in_stock': filters.get('in_stock'),
+        'sort': sort,
+        'page': page,
+        'per_page': per_page
+    }, sort_keys=True)
+
+    def load():
+        query = Product.query.filter(Product.is_active.is_(True))
+        if filters.get('category') is not None:
+            query = query.filter(Product.category_id.in_(list(filters['category'])))
+        if filters.get('price') is not None:
+            query = query.filter(_price_bucket_condition(price_buckets(), filters['price']))
+        if filters.get('featured') is not None:
+            query = query.filter(Product.is_featured.is_(filters['featured']))
+        if filters.get('in_stock') is not None:
+            query = query.filter(Product.stock_quantity > 0 if filters['in_stock'] else Product.stock_quantity <= 0)
+        query = query.order_by(*PRODUCT_SORTS.get(sort or 'newest'))
+        products = listing_query(query).offset((page - 1) * per_page).limit(per_page).all()
+        return [product.to_dict(include_variants=True) for product in products]
+
+    products = cache.get_or_set(PRODUCTS, key, load, ttl=current_app.config.get('CACHE_PRODUCTS_TTL'))
+    return {
+        'products': products,
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page,
+        'facets': facet_counts(filters)
+    }
@@ -0,0 +1,176 @@
+# app/categories.py
+# Category taxonomy: products point at a categories row through category_id
+# and every category keeps the number of its active products, so listing
+# categories with counts never scans the products table.
+from app.extensions import db, cache
+from app.cache import CATEGORIES
+from app.models.category import Category
+from app.models.product import Product
+from flask import current_app
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+import re
+
+
+def slugify(name):
+    """'Fresh Juices & Smoothies' -> 'fresh-juices-smoothies'"""
+    slug = re.sub(r'[^a-z0-9]+', '-', (name or '').strip().lower()).strip('-')
+    return slug[:120] or 'category'
+
+
+def get_or_create_categories(names):
+    """
+    Map each category name (case-insensitively) to a category id, creating the
+    missing categories. Returns {name.lower(): id}. The caller commits.
+    """
+    wanted = {name.strip().lower(): name.strip() for name in names if name and name.strip()}
+    if not wanted:
+        return {}
+
+    def existing():
+        return {
+            name.lower(): category_id for category_id, name in db.session.query(Category.id, Category.name).filter(
+                func.lower(Category.name).in_(list(wanted))
+            ).all()
+        }
+
+    found = existing()
+    for key, name in wanted.items():
+        if key in found:
+            continue
+        try:
+            with db.session.begin_nested():
+                category = Category(name=name, slug=unique_slug(name))
+                db.session.add(category)
+            found[key] = category.id
+        except IntegrityError:
+            # Created by another request in the meantime
+            found.update(existing())
+    return found
+
+
+def unique_slug(name, exclude_id=None):
+    base = slugify(name)
+    slug = base
+    suffix = 2
+    while True:
+        query = db.session.query(Category.id).filter(Category.slug == slug)
+        if exclude_id is not None:
+            query = query.filter(Category.id != exclude_id)
+        if query.first() is None:
+            return slug
+        slug = f'{base[:115]}-{suffix}'
+        suffix += 1
+
+
+def refresh_category_counts(category_ids=None):
+    """
+    Recompute product_count (active products) with one correlated UPDATE,
+    for every category when category_ids is None. The caller commits.
+    """
+    count = select(func.count(Product.id)).where(
+        Product.category_id == Category.id,
+        Product.is_active.is_(True)
+    ).scalar_subquery()
+    statement = update(Category).values(
+        product_count=count,
+        updated_at=Category.updated_at
+    ).execution_options(synchronize_session=False)
+    if category_ids is not None:
+        category_ids = [category_id for category_id in set(category_ids) if category_id is not None]
+        if not category_ids:
+            return 0
+        statement = statement.where(Category.id.in_(category_ids))
+    return db.session.execute(statement).rowcount
+
+
+def sync_product_categories(product_ids=None, previous_category_ids=()):
+    """
+    Point products at the category named by their category string and
+    refresh the counts of every category they left or joined. Covers all
+    products without a category when product_ids is None. The caller commits.
+    """
+    query = db.session.query(Product.id, Product.category, Product.category_id)
+    if product_ids is None:
+        query = query.filter(Product.category_id.is_(None))
+    else:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return 0
+        query = query.filter(Product.id.in_(product_ids))
+    rows = query.all()
+    if not rows:
+        refresh_category_counts(previous_category_ids)
+        return 0
+
+    ids_by_name = get_or_create_categories({row.category for row in rows})
+    moves = {}
+    for product_id, name, category_id in rows:
+        target = ids_by_name.get((name or '').strip().lower())
+        if target is not None and target != category_id:
+            moves.setdefault(target, []).append(product_id)
+    for target, moved_ids in moves.items():
+        db.session.execute(
+            update(Product)
+            .where(Product.id.in_(moved_ids))
+            .values(category_id=target, updated_at=Product.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
+    affected = set(previous_category_ids) | {row.category_id for row in rows} | set(moves)
+    refresh_category_counts(affected)
+    return sum(len(moved_ids) for moved_ids in moves.values())
+
+
+def category_tree():
+    """
+    Every category as a dict with nested children and total_count (its own
+    products plus its descendants'), cached until categories or products change.
+    Returns (roots, by_id).
+    """
+    def load():
+        categories = Category.query.order_by(Category.display_order, Category.name).all()
+        nodes = {category.id: dict(category.to_dict(), children=[]) for category in categories}
+        roots = []
+        for node in nodes.values():
+            parent = nodes.get(node['parent_id'])
+            (parent['children'] if parent else roots).append(node)
+
+        def total(node):
+            node['total_count'] = node['product_count'] + sum(total(child) for child in node['children'])
+            return node['total_count']
+
+        for root in roots:
+            total(root)
+        return roots
+
+    roots = cache.get_or_set(CATEGORIES, 'tree', load, ttl=current_app.config.get('CACHE_CATEGORIES_TTL'))
+    by_id = {}
+    stack = list(roots)
+    while stack:
+        node = stack.pop()
+        by_id[node['id']] = node
+        stack.extend(node['children'])
+    return roots, by_id
+
+
+def find_category(value):
+    """Look a category up by slug or (case-insensitive) name in the cached tree"""
+    _, by_id = category_tree()
+    slug = slugify(value)
+    lowered = (value or '').strip().lower()
+    for node in by_id.values():
+        if node['slug'] == slug or node['name'].lower() == lowered:
+            return node
+    return None
+
+
+def subtree_ids(node):
+    """IDs of a category node and all of its descendants"""
+    ids = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        ids.append(current['id'])
+        stack.extend(current['children'])
+    return ids
@@ -0,0 +1,341 @@
+import json
+import time
+
+import click
+
+
+def register_commands(app):
+    """Register the maintenance commands available through `flask <command>`"""
+
+    @app.cli.command('snapshot-stock')
+    @click.option('--chunk-size', default=500, show_default=True, help='Products per transaction')
+    def snapshot_stock_command(chunk_size):
+        """Record opening balances and roll the stock ledger into snapshots."""
+        from app.inventory import record_opening_balances, take_stock_snapshots
+        initialised = record_opening_balances(batch_size=chunk_size)
+        updated = take_stock_snapshots(chunk_size=chunk_size)
+        click.echo(f'Opening balances recorded: {initialised}; snapshots updated: {updated}')
+
+    @app.cli.command('reconcile-stock')
+    @click.option('--chunk-size', default=500, show_default=True, help='Products per scan')
+    def reconcile_stock_command(chunk_size):
+        """Compare every product's stock_quantity with its ledger."""
+        from app.inventory import reconcile_stock
+        started = time.perf_counter()
+        report = reconcile_stock(chunk_size=chunk_size)
+        elapsed = time.perf_counter() - started
+        click.echo(json.dumps(report, indent=2))
+        click.echo(f"Checked {report['products_checked']} products in {elapsed:.2f}s, "
+                   f"{len(report['discrepancies'])} discrepancies")
+        if report['discrepancies']:
+            raise SystemExit(1)
+
+    @app.cli.command('rebuild-low-stock')
+    def rebuild_low_stock_command():
+        """Re-derive the low-stock set from current stock levels."""
+        from app.inventory import rebuild_low_stock
+        crossed = rebuild_low_stock()
+        click.echo(f'Low stock set rebuilt; {crossed} newly flagged products')
+
+    @app.cli.command('rebuild-price-index')
+    def rebuild_price_index_command():
+        """Recompute every product's min/max price from its variants."""
+        from app.catalog import refresh_price_range
+        from app.extensions import db, cache
+        from app.cache import PRODUCTS
+        updated = refresh_price_range()
+        db.session.commit()
+        cache.invalidate(PRODUCTS)
+        click.echo(f'Price range refreshed for {updated} products')
+
+    @app.cli.command('rebuild-categories')
+    def rebuild_categories_command():
+        """File uncategorised products and recount every category."""
+        from app.categories import sync_product_categories, refresh_category_counts
+        from app.extensions import db, cache
+        from app.cache import CATEGORIES, PRODUCTS
+        assigned = sync_product_categories()
+        refresh_category_counts()
+        db.session.commit()
+        cache.invalidate(CATEGORIES, PRODUCTS)
+        click.echo(f'{assigned} products filed; category counts refreshed')
+
+    @app.cli.command('rebuild-customer-stats')
+    @click.option('--chunk-size', default=1000, show_default=True, help='Customers per transaction')
+    def rebuild_customer_stats_command(chunk_size):
+        """Recompute every customer's order count, lifetime value and order dates."""
+        from app.orders import rebuild_customer_stats
+        started = time.perf_counter()
+        rebuilt = rebuild_customer_stats(chunk_size=chunk_size)
+        click.echo(f'Customer stats rebuilt for {rebuilt} customers in {time.perf_counter() - started:.2f}s')
+
+    @app.cli.command('analyze-feedback')
+    @click.option('--batch-size', default=500, show_default=True, help='Rows per transaction')
+    @click.option('--limit', type=int, default=None, help='Stop after this many rows')
+    @click.option('--reanalyze', is_flag=True, help='Re-tag feedback that was already analyzed')
+    def analyze_feedback_command(batch_size, limit, reanalyze):
+        """Tag the feedback backlog with sentiment, topics and urgency."""
+        from app.sentiment import analyze_feedback
+        report = analyze_feedback(batch_size=batch_size, limit=limit, reanalyze=reanalyze)
+        click.echo(json.dumps(report, indent=2))
+        click.echo(f"Analyzed {report['processed']} feedback in {report['elapsed_seconds']}s "
+                   f"({report['rows_per_second'] or 0} rows/sec)")
+
+    @app.cli.command('erase-customer')
+    @click.argument('customer_id', type=int)
+    @click.option('--mode', type=click.Choice(['delete', 'anonymize']), default='delete', show_default=True)
+    @click.option('--chunk-size', default=500, show_default=True, help='Rows per transaction')
+    def erase_customer_command(customer_id, mode, chunk_size):
+        """Delete or anonymize a customer's data now, in the foreground."""
+        from app.extensions import db
+        from app.models.customer import Customer, CustomerErasure
+        from app.privacy import run_erasure, COMPLETED
+        if db.session.get(Customer, customer_id) is None:
+            raise click.ClickException(f'Customer {customer_id} not found')
+        job = CustomerErasure(customer_id=customer_id, mode=mode, requested_by='cli')
+        db.session.add(job)
+        db.session.commit()
+        started = time.perf_counter()
+        job = run_erasure(job.id, chunk_size=chunk_size)
+        click.echo(json.dumps(job.to_dict(), indent=2))
+        click.echo(f'Erasure {job.status} in {time.perf_counter() - started:.2f}s')
+        if job.status != COMPLETED:
+            raise SystemExit(1)
+
+    @app.cli.command('benchmark-suggest')
+    @click.option('--products', default=50000, show_default=True, help='Synthetic products in the index')
+    @click.option('--queries', default=5000, show_default=True, help='Lookups to time')
+    @click.option('--limit', default=10, show_default=True)
+    def benchmark_suggest_command(products, queries, limit):
+        """Time building the typeahead index and uncached prefix lookups."""
+        import random
+        from app.suggest import SuggestIndex, normalize
+
+        rng = random.Random(42)
+        brands = ['Fresh Farm', 'Tropical Gold', 'Sunrise', 'Green Valley', 'Nature\'s Best', 'Kenya Pure',
+                  'Highland', 'Daily Press', 'Orchard Lane', 'Zesty', 'Pure Harvest', 'Coastal Fruits']
+        fruits = ['orange', 'apple', 'mango', 'pineapple', 'passion', 'guava', 'banana', 'strawberry',
+                  'watermelon', 'lemon', 'lime', 'ginger', 'beetroot', 'carrot', 'avocado', 'papaya',
+                  'tamarind', 'baobab', 'hibiscus', 'coconut', 'blueberry', 'raspberry', 'grape', 'kiwi']
+        kinds = ['juice', 'smoothie', 'fresh', 'cold pressed', 'blend', 'punch', 'nectar', 'slices',
+                 'concentrate', 'lemonade', 'sorbet', 'fruit salad', 'dried', 'cordial']
+        sizes = ['250ml', '330ml', '500ml', '1l', '2l', 'family pack', '6 pack', '500g', '1kg']
+
+        def product_name():
+            flavour = rng.choice(fruits).title()
+            if rng.random() < 0.4:
+                flavour = f'{flavour} & {rng.choice(fruits).title()}'
+            return f'{rng.choice(brands)} {flavour} {rng.choice(kinds).title()} {rng.choice(sizes)}'
+
+        rows = [
+            (product_id, product_name(), rng.choice(['Juices', 'Fresh Fruit', 'Smoothies', 'Vegetables', 'Snacks']),
+             rng.random() < 0.1)
+            for product_id in range(1, products + 1)
+        ]
+
+        index = SuggestIndex()
+        started = time.perf_counter()
+        index.build(rows)
+        click.echo(f'Built index of {products} products ({len(index._words.words)} distinct words) '
+                   f'in {(time.perf_counter() - started) * 1000:.0f}ms')
+
+        # What shoppers type: a (partial) fruit, kind or brand word, often after another whole word
+        words = [word for name in brands + fruits + kinds for word in normalize(name).split()]
+        samples = {'single-word': [], 'multi-word': []}
+        for _ in range(queries):
+            word = rng.choice(words)
+            query = word[:rng.randint(2, len(word))] if len(word) > 2 else word
+            if rng.random() < 0.4:
+                samples['multi-word'].append(f'{rng.choice(words)} {query}')
+            else:
+                samples['single-word'].append(query)
+
+        for label, lookups in samples.items():
+            timings = []
+            for query in lookups:
+                index._results.clear()  # time the index, not the result memo
+                started = time.perf_counter()
+                index.search(query, limit=limit)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            click.echo(f'{len(lookups)} {label} lookups: p50 {timings[len(timings) // 2]:.3f}ms, '
+                       f'p95 {timings[int(len(timings) * 0.95)]:.3f}ms, p99 {timings[int(len(timings) * 0.99)]:.3f}ms')
+
+        started = time.perf_counter()
+        for product_id in range(1, 1001):
+            index.upsert(product_id, f'Renamed Product {product_id}', 'Juice', False)
+        click.echo(f'1000 incremental updates in {(time.perf_counter() - started) * 1000:.0f}ms')
+
+    @app.cli.command('import-products')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension')
+    @click.option('--chunk-size', default=1000, show_default=True, help='Rows per upsert')
+    @click.option('--dry-run', is_flag=True, help='Validate without writing')
+    def import_products_command(path, file_format, chunk_size, dry_run):
+        """Create or update products by SKU from a CSV or NDJSON file."""
+        from app.catalog import import_products, parse_csv, parse_ndjson
+        from app.extensions import db, cache
+        from app.cache import CATEGORIES, PRODUCTS
+        file_format = file_format or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+        try:
+            with open(path, 'rb') as fh:
+                rows = parse_csv(fh) if file_format == 'csv' else parse_ndjson(fh)
+                report = import_products(rows, chunk_size=chunk_size, dry_run=dry_run, created_by='cli')
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            # Every chunk commits on its own, so even a failed import may have written some
+            if not dry_run:
+                cache.invalidate(PRODUCTS, CATEGORIES)
+        for error in report['errors']:
+            click.echo(f"line {error['line']} ({error['sku']}): {'; '.join(error['errors'])}", err=True)
+        click.echo(f"{report['rows']} rows in {report['elapsed_seconds']}s "
+                   f"({report['rows_per_second']} rows/sec), {report['failed']} failed")
+
+    @app.cli.command('export-products')
+    @click.argument('path', type=click.Path(dir_okay=False, writable=True), required=False)
+    @click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']), default='csv', show_default=True)
+    def export_products_command(path, file_format):
+        """Write the catalog to PATH (or stdout) as CSV or NDJSON."""
+        from app.catalog import export_csv, export_ndjson
+        generator = export_csv() if file_format == 'csv' else export_ndjson()
+        out = open(path, 'w', newline='') if path else click.get_text_stream('stdout')
+        try:
+            for chunk in generator:
+                out.write(chunk)
+        finally:
+            if path:
+                out.close()
+
+    @app.cli.command('benchmark-import')
+    @click.option('--rows', default=5000, show_default=True, help='Synthetic products to import')
+    @click.option('--chunk-size', default=1000, show_default=True)
+    @click.option('--keep', is_flag=True, help='Keep the benchmark products afterwards')
+    def benchmark_import_command(rows, chunk_size, keep):
+        """Measure import throughput (rows/sec) for inserts and then updates."""
+        from app.catalog import import_products
+        from app.extensions import db, cache
+        from app.cache import CATEGORIES, PRODUCTS
+        from app.models.product import Product
+
+        def synthetic(price):
+            for i in range(rows):
+                yield i + 1, {
+                    'sku': f'BENCH-{i:06d}', 'name': f'Benchmark product {i}', 'category': 'Benchmark',
+                    'price': price + (i % 100) / 100, 'stock_quantity': i % 50
+                }
+
+        for label, price in (('insert', 1.0), ('update', 2.0)):
+            try:
+                report = import_products(synthetic(price), chunk_size=chunk_size, created_by='benchmark')
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                cache.invalidate(PRODUCTS, CATEGORIES)
+            click.echo(f"{label}: {report['rows']} rows in {report['elapsed_seconds']}s "
+                       f"= {report['rows_per_second']} rows/sec ({report['failed']} failed)")
+
+        if not keep:
+            from app.models.inventory import StockMovement, StockSnapshot, LowStockProduct
+            ids = db.session.query(Product.id).filter(Product.sku.like('BENCH-%'))
+            for model in (StockMovement, StockSnapshot, LowStockProduct):
+                model.query.filter(model.product_id.in_(ids)).delete(synchronize_session=False)
+            Product.query.filter(Product.sku.like('BENCH-%')).delete(synchronize_session=False)
+            from app.categories import refresh_category_counts
+            refresh_category_counts()
+            db.session.commit()
+            cache.invalidate(PRODUCTS, CATEGORIES)
+
+    @app.cli.command('benchmark-customer-search')
+    @click.option('--customers', default=500000, show_default=True, help='Synthetic customers to insert')
+    @click.option('--queries', default=200, show_default=True, help='Searches to time per query kind')
+    @click.option('--keep', is_flag=True, help='Keep the benchmark customers afterwards')
+    def benchmark_customer_search_command(customers, queries, keep):
+        """Time admin customer search by name, email and phone at scale."""
+        import random
+        from datetime import datetime
+        from sqlalchemy import insert
+        from app.customers import search_customers, normalize_phone
+        from app.extensions import db
+        from app.models.customer import Customer
+
+        rng = random.Random(7)
+        first = ['wanjiku', 'otieno', 'achieng', 'kamau', 'njeri', 'mutua', 'wambui', 'kiprop', 'akinyi', 'omondi',
+                 'chebet', 'mwangi', 'atieno', 'kariuki', 'nyambura', 'odhiambo', 'jeptoo', 'karanja', 'auma', 'ndungu']
+        last = first[::-1] + ['grace', 'peter', 'mary', 'john', 'faith', 'james', 'mercy', 'david']
+
+        existing = db.session.query(db.func.count(Customer.id)).filter(Customer.email.like('%@bench.invalid')).scalar()
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        batch = []
+        for i in range(existing, customers):
+            phone = f'07{rng.randint(0, 99999999):08d}'
+            batch.append({
+                'name': f'{rng.choice(first).title()} {rng.choice(last).title()}',
+                'phone': phone,
+                'phone_normalized': normalize_phone(phone),
+                'email': f'customer{i}@bench.invalid',
+                'password': '!',  # not a bcrypt hash, so these accounts cannot log in
+                'email_verified': rng.random() < 0.6,
+                'is_active': rng.random() < 0.95,
+                'created_at': now,
+                'updated_at': now
+            })
+            if len(batch) >= 10000:
+                db.session.execute(insert(Customer), batch)
+                db.session.commit()
+                batch = []
+        if batch:
+            db.session.execute(insert(Customer), batch)
+            db.session.commit()
+        click.echo(f'Inserted {max(customers - existing, 0)} customers in {time.perf_counter() - started:.1f}s '
+                   f'(dialect: {db.engine.dialect.name})')
+        if db.engine.dialect.name == 'sqlite':
+            # SQLite only weighs indexes by selectivity once it has statistics; MySQL keeps its own
+            db.session.execute(db.text('ANALYZE customers'))
+            db.session.commit()
+
+        samples = {
+            'name': [f'{rng.choice(first)[:rng.randint(3, 6)]}' for _ in range(queries)],
+            'full name': [f'{rng.choice(first)} {rng.choice(last)}' for _ in range(queries)],
+            'email': [f'customer{rng.randint(0, customers - 1)}@' for _ in range(queries)],
+            'phone': [f'07{rng.randint(0, 9999):04d}' for _ in range(queries)],
+        }
+        for kind, terms in samples.items():
+            timings = []
+            for term in terms:
+                started = time.perf_counter()
+                search_customers(term, is_active=True, limit=25)
+                timings.append((time.perf_counter() - started) * 1000)
+                db.session.rollback()
+            timings.sort()
+            click.echo(f'{kind:>9}: p50 {timings[len(timings) // 2]:.2f}ms, '
+                       f'p95 {timings[int(len(timings) * 0.95)]:.2f}ms over {len(timings)} searches')
+
+        timings = []
+        cursor = None
+        for _ in range(queries):
+            started = time.perf_counter()
+            page, cursor = search_customers(before_id=cursor, limit=100)
+            timings.append((time.perf_counter() - started) * 1000)
+            if cursor is None:
+                break
+        timings.sort()
+        click.echo(f'    pages: p50 {timings[len(timings) // 2]:.2f}ms, p95 {timings[int(len(timings) * 0.95)]:.2f}ms '
+                   f'over {len(timings)} keyset pages of 100')
+
+        if not keep:
+            Customer.query.filter(Customer.email.like('%@bench.invalid')).delete(synchronize_session=False)
+            db.session.commit()
+
+    @app.cli.command('export-static')
+    @click.option('--output', type=click.Path(file_okay=False), default=None,
+                  help='Directory to write to (default STATIC_EXPORT_DIR)')
+    @click.option('--force', is_flag=True, help='Rewrite every file, not only the changed ones')
+    def export_static_command(output, force):
+        """Write the public content and contact responses as static JSON files."""
+        from app.static_export import export_static
+        report = export_static(output_dir=output, force=force)
+        click.echo(json.dumps(report, indent=2))
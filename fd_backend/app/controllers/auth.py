@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify, current_app
 from app.models.customer import Customer
 from app.models.admin_user import AdminUser
-from app.extensions import db, bcrypt, jwt
+from app.controllers.cart import merge_guest_cart, clear_guest_cookie
+from app.extensions import db, bcrypt, jwt, metrics
 from flask_jwt_extended import (
     create_access_token, jwt_required, get_jwt_identity, 
     get_jwt, create_refresh_token, get_jti
@@ -47,8 +48,9 @@ def hash_password(password):
         # Encode password to bytes
         password_bytes = password.encode('utf-8')
         # Generate salt and hash password
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password_bytes, salt)
+        with metrics.bcrypt_duration_seconds.time(operation='hash'):
+            salt = bcrypt.gensalt()
+            hashed = bcrypt.hashpw(password_bytes, salt)
         # Return as string
         return hashed.decode('utf-8')
     except Exception as e:
@@ -63,7 +65,8 @@ def check_password(hashed_password, input_password):
         # Encode input password to bytes
         input_password = input_password.encode('utf-8')
         # Check if passwords match
-        return bcrypt.checkpw(input_password, stored_password)
+        with metrics.bcrypt_duration_seconds.time(operation='check'):
+            return bcrypt.checkpw(input_password, stored_password)
     except Exception as e:
         print(f"Error checking password: {str(e)}", file=sys.stderr)
         print(f"Hashed password: {hashed_password}", file=sys.stderr)
@@ -234,8 +237,21 @@ def login():
         
         if not user:
             current_app.logger.warning(f"Login failed for email {email}")
+            metrics.logins_total.inc(result='failure')
             return jsonify({'error': 'Invalid credentials'}), HTTP_401_UNAUTHORIZED
         
+        # Merge any guest cart into the customer's cart in the same transaction
+        merged_cart_items = 0
+        guest_cart_merged = False
+        if user_type == 'customer':
+            try:
+                with db.session.begin_nested():
+                    merged_cart_items = merge_guest_cart(user.id)
+                guest_cart_merged = True
+            except Exception as e:
+                # The savepoint rolled back, so the guest cart is still there to merge on the next login
+                current_app.logger.error(f"Guest cart merge error: {str(e)}")
+        
         # Commit the last login update
         db.session.commit()
         
@@ -278,8 +294,15 @@ def login():
                 'role': user.role
             }
         
+        if user_type == 'customer':
+            response_data['merged_cart_items'] = merged_cart_items
+        
         current_app.logger.info(f"Login successful for {email} as {user_type}")
-        return jsonify(response_data), HTTP_200_OK
+        metrics.logins_total.inc(result='success')
+        response = jsonify(response_data)
+        if guest_cart_merged:
+            clear_guest_cookie(response)
+        return response, HTTP_200_OK
         
     except Exception as e:
         current_app.logger.error(f"Login error: {str(e)}")
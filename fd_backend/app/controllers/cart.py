@@ -1,14 +1,20 @@
-from flask import Blueprint, request, jsonify
-from app.models.cart import Cart, CartItem
+from flask import Blueprint, request, jsonify, current_app
+from app.models.cart import Cart, CartItem, GuestCart
 from app.models.product import Product
 from app.models.order import Order, OrderItem
-from app.extensions import db
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.extensions import db, metrics
+from app.inventory import (
+    InsufficientStockError, available_stock, cart_holder, guest_holder, order_reference, release, reserve, sell
+)
+from app.orders import PENDING, record_status, record_order_placed
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from app.status_codes import (
     HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST,
-    HTTP_404_NOT_FOUND, HTTP_401_UNAUTHORIZED, HTTP_500_INTERNAL_SERVER_ERROR
+    HTTP_404_NOT_FOUND, HTTP_401_UNAUTHORIZED, HTTP_409_CONFLICT, HTTP_500_INTERNAL_SERVER_ERROR
 )
-from datetime import datetime
+from datetime import datetime, timedelta
+from itsdangerous import URLSafeSerializer, BadSignature
+import secrets
 
 cart_bp = Blueprint('cart', __name__, url_prefix='/api/v1/carts')
 
@@ -47,9 +53,130 @@ def get_user_info():
                 user_id = int(parts[1])
             except ValueError:
                 pass
+        elif identity.isdigit():
+            # Tokens issued by auth carry the plain user ID with the role in the claims
+            user_id = int(identity)
+            user_role = get_jwt().get('role')
+            if user_role == 'super_admin':
+                user_role = 'superadmin'
     
     return user_id, user_role
 
+# Helper function to find the cart for a user, optionally creating it
+def get_user_cart(user_id, user_role, create=False):
+    if user_role == 'customer':
+        filters = {'customer_id': user_id}
+    elif user_role in ['admin', 'superadmin']:
+        filters = {'admin_id': user_id}
+    else:
+        return None
+    
+    cart = Cart.query.filter_by(**filters).first()
+    if not cart and create:
+        cart = Cart(**filters)
+        db.session.add(cart)
+        db.session.flush()  # Flush to get cart.id before adding items
+    return cart
+
+# Helper function to price cart lines given as (cart_item_id, quantity, price_at_added, product).
+# Lines are priced at the current product price and flagged when that price has
+# drifted from price_at_added or when available stock (stock minus other carts'
+# holds, looked up for the given holder) no longer covers the quantity.
+def price_cart_lines(lines, holder=None):
+    lines = list(lines)
+    available_by_product = available_stock([line[3] for line in lines], exclude_holder=holder)
+    
+    items_data = []
+    subtotal = 0.0
+    total_quantity = 0
+    has_price_changes = False
+    has_stock_issues = False
+    for cart_item_id, quantity, price_at_added, product in lines:
+        line_total = round(product.price * quantity, 2)
+        available = available_by_product.get(product.id, 0)
+        shortfall = max(quantity - available, 0)
+        price_changed = price_at_added is not None and round(price_at_added, 2) != round(product.price, 2)
+        
+        subtotal += line_total
+        total_quantity += quantity
+        has_price_changes = has_price_changes or price_changed
+        has_stock_issues = has_stock_issues or shortfall > 0 or not product.is_active
+        
+        items_data.append({
+            'cart_item_id': cart_item_id,
+            'product_id': product.id,
+            'product_name': product.name,
+            'image_url': product.image_url,
+            'quantity': quantity,
+            'price': product.price,
+            'price_at_added': price_at_added,
+            'price_changed': price_changed,
+            'price_difference': round(product.price - price_at_added, 2) if price_changed else 0.0,
+            'line_total': line_total,
+            'is_available': bool(product.is_active),
+            'available_quantity': available,
+            'stock_shortfall': shortfall
+        })
+    
+    return {
+        'cart': items_data,
+        'summary': {
+            'item_count': len(items_data),
+            'total_quantity': total_quantity,
+            'subtotal': round(subtotal, 2),
+            'has_price_changes': has_price_changes,
+            'has_stock_issues': has_stock_issues
+        }
+    }
+
+# Helper function to build the priced cart payload with a single joined query
+def build_cart_response(cart):
+    rows = db.session.query(CartItem, Product).join(
+        Product, CartItem.product_id == Product.id
+    ).filter(CartItem.cart_id == cart.id).order_by(CartItem.id).all()
+    return price_cart_lines(
+        ((item.id, item.quantity, item.price_at_added, product) for item, product in rows),
+        holder=cart_holder(cart.id)
+    )
+
+# Helper function to apply a cart sync payload to the current {product_id: quantity} map.
+# Returns (desired, error_message).
+def resolve_desired_items(current, data):
+    if 'items' in data:
+        if not isinstance(data['items'], list):
+            return None, 'items must be a list'
+        desired = {}
+        for entry in data['items']:
+            product_id = entry.get('product_id') if isinstance(entry, dict) else None
+            quantity = entry.get('quantity', 1) if isinstance(entry, dict) else None
+            if not isinstance(product_id, int) or not is_valid_quantity(quantity):
+                return None, 'Each item needs an integer product_id and a positive integer quantity'
+            if product_id in desired:
+                return None, f'Duplicate product_id {product_id}'
+            desired[product_id] = quantity
+        return desired, None
+    
+    if not isinstance(data.get('ops'), list):
+        return None, 'ops must be a list'
+    desired = dict(current)
+    for entry in data['ops']:
+        op = entry.get('op') if isinstance(entry, dict) else None
+        product_id = entry.get('product_id') if isinstance(entry, dict) else None
+        if op not in ['add', 'set', 'remove'] or not isinstance(product_id, int):
+            return None, 'Each op needs op (add, set or remove) and an integer product_id'
+        if op == 'remove':
+            desired.pop(product_id, None)
+            continue
+        quantity = entry.get('quantity', 1)
+        if not is_valid_quantity(quantity):
+            return None, 'Quantity must be a positive integer'
+        desired[product_id] = desired.get(product_id, 0) + quantity if op == 'add' else quantity
+    return desired, None
+
+# Helper function to validate a requested quantity
+def is_valid_quantity(quantity):
+    return isinstance(quantity, int) and not isinstance(quantity, bool) and quantity >= 1
+
 # Debug endpoint to check token format
 @cart_bp.route('/debug-token', methods=['GET'])
 @jwt_required()
@@ -85,20 +212,102 @@ def get_cart():
     
     if not cart:
         # If no cart, return empty list (user may not have added items yet)
-        return jsonify({'cart': [], 'message': 'Cart is empty'}), HTTP_200_OK
+        return jsonify({
+            'cart': [],
+            'summary': {
+                'item_count': 0,
+                'total_quantity': 0,
+                'subtotal': 0.0,
+                'has_price_changes': False,
+                'has_stock_issues': False
+            },
+            'message': 'Cart is empty'
+        }), HTTP_200_OK
+    
+    return jsonify(build_cart_response(cart)), HTTP_200_OK
+
+# Sync the whole cart in one request (customer or admin)
+# Accepts either the full desired state: {"items": [{"product_id": 1, "quantity": 2}, ...]}
+# or a list of operations: {"ops": [{"op": "add" | "set" | "remove", "product_id": 1, "quantity": 2}, ...]}
+@cart_bp.route('', methods=['PUT'])
+@jwt_required()
+def sync_cart():
+    user_id, user_role = get_user_info()
     
-    # Prepare cart items data for response
-    items_data = []
-    for item in cart.items:
-        items_data.append({
-            'cart_item_id': item.id,
-            'product_id': item.product_id,
-            'product_name': item.product.name if item.product else None,
-            'quantity': item.quantity,
-            'price': item.price if hasattr(item, 'price') else None
-        })
+    if not user_id or not user_role:
+        return jsonify({'error': 'User identity missing'}), HTTP_401_UNAUTHORIZED
     
-    return jsonify({'cart': items_data}), HTTP_200_OK
+    if user_role not in ['customer', 'admin', 'superadmin']:
+        return jsonify({'error': 'Invalid user role'}), HTTP_401_UNAUTHORIZED
+    
+    data = request.get_json(silent=True)
+    if not data or ('items' not in data and 'ops' not in data):
+        return jsonify({'error': 'items or ops is required'}), HTTP_400_BAD_REQUEST
+    
+    try:
+        cart = get_user_cart(user_id, user_role, create=True)
+        
+        # Load every stored item once and diff against it
+        existing = {item.product_id: item for item in CartItem.query.filter_by(cart_id=cart.id).all()}
+        desired, error = resolve_desired_items(
+            {product_id: item.quantity for product_id, item in existing.items()}, data
+        )
+        if error:
+            db.session.rollback()
+            return jsonify({'error': error}), HTTP_400_BAD_REQUEST
+        
+        to_remove = [product_id for product_id in existing if product_id not in desired]
+        to_add = [product_id for product_id in desired if product_id not in existing]
+        to_update = [product_id for product_id in desired
+                     if product_id in existing and existing[product_id].quantity != desired[product_id]]
+        
+        # Validate all new products with one query
+        products = {}
+        if to_add:
+            products = {p.id: p for p in Product.query.filter(Product.id.in_(to_add)).all()}
+            missing = [product_id for product_id in to_add
+                       if product_id not in products or not products[product_id].is_active]
+            if missing:
+                db.session.rollback()
+                return jsonify({'error': 'Product not found', 'product_ids': missing}), HTTP_404_NOT_FOUND
+        
+        # Hold stock for everything added or increased; fails the whole sync on a shortage
+        holder = cart_holder(cart.id)
+        reserve(holder, {product_id: desired[product_id] for product_id in to_add + to_update})
+        release(holder, to_remove)
+        
+        # Rows are already loaded, so the session batches these into one DELETE
+        for product_id in to_remove:
+            db.session.delete(existing[product_id])
+        
+        for product_id in to_update:
+            existing[product_id].quantity = desired[product_id]
+        
+        db.session.add_all([
+            CartItem(
+                cart_id=cart.id,
+                product_id=product_id,
+                quantity=desired[product_id],
+                price_at_added=products[product_id].price
+            ) for product_id in to_add
+        ])
+        
+        db.session.commit()  # Apply inserts, updates and deletes together
+        
+        response = build_cart_response(cart)
+        response['changes'] = {
+            'added': len(to_add),
+            'updated': len(to_update),
+            'removed': len(to_remove)
+        }
+        return jsonify(response), HTTP_200_OK
+    except InsufficientStockError as e:
+        db.session.rollback()
+        return jsonify({'error': 'Insufficient stock', 'shortages': e.to_dict()}), HTTP_409_CONFLICT
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Cart sync error: {str(e)}")
+        return jsonify({'error': 'Failed to sync cart'}), HTTP_500_INTERNAL_SERVER_ERROR
 
 # Add item to cart (customer or admin can add)
 @cart_bp.route('/items', methods=['POST'])
@@ -115,6 +324,8 @@ def add_to_cart():
     
     product_id = data['product_id']
     quantity = data.get('quantity', 1)
+    if not is_valid_quantity(quantity):
+        return jsonify({'error': 'Quantity must be a positive integer'}), HTTP_400_BAD_REQUEST
     
     # Validate product existence
     product = Product.query.get(product_id)
@@ -122,23 +333,20 @@ def add_to_cart():
         return jsonify({'error': 'Product not found'}), HTTP_404_NOT_FOUND
     
     # Find or create the cart for this user
-    if user_role == 'customer':
-        cart = Cart.query.filter_by(customer_id=user_id).first()
-        if not cart:
-            cart = Cart(customer_id=user_id)
-            db.session.add(cart)
-            db.session.flush()  # Flush to get cart.id before adding items
-    elif user_role in ['admin', 'superadmin']:
-        cart = Cart.query.filter_by(admin_id=user_id).first()
-        if not cart:
-            cart = Cart(admin_id=user_id)
-            db.session.add(cart)
-            db.session.flush()  # Flush to get cart.id before adding items
-    else:
+    cart = get_user_cart(user_id, user_role, create=True)
+    if not cart:
         return jsonify({'error': 'Invalid user role'}), HTTP_401_UNAUTHORIZED
     
     # Check if item already exists in cart to update quantity
     existing_item = CartItem.query.filter_by(cart_id=cart.id, product_id=product_id).first()
+    
+    # Hold the stock for the new total quantity
+    try:
+        reserve(cart_holder(cart.id), {product_id: quantity + (existing_item.quantity if existing_item else 0)})
+    except InsufficientStockError as e:
+        db.session.rollback()
+        return jsonify({'error': 'Insufficient stock', 'shortages': e.to_dict()}), HTTP_409_CONFLICT
+    
     if existing_item:
         existing_item.quantity += quantity  # Increase quantity
     else:
@@ -146,7 +354,8 @@ def add_to_cart():
         new_item = CartItem(
             cart_id=cart.id,
             product_id=product_id,
-            quantity=quantity
+            quantity=quantity,
+            price_at_added=product.price
         )
         db.session.add(new_item)
     
@@ -155,7 +364,7 @@ def add_to_cart():
         return jsonify({'message': 'Item added to cart successfully'}), HTTP_201_CREATED
     except Exception as e:
         db.session.rollback()  # Rollback in case of error
-        print("Add to cart error:", str(e))
+        current_app.logger.error(f"Add to cart error: {str(e)}")
         return jsonify({'error': 'Failed to add item to cart'}), HTTP_500_INTERNAL_SERVER_ERROR
 
 # Update quantity of a cart item
@@ -189,13 +398,19 @@ def update_cart_item(item_id):
     if not isinstance(quantity, int) or quantity < 1:
         return jsonify({'error': 'Quantity must be a positive integer'}), HTTP_400_BAD_REQUEST
     
+    try:
+        reserve(cart_holder(item.cart_id), {item.product_id: quantity})
+    except InsufficientStockError as e:
+        db.session.rollback()
+        return jsonify({'error': 'Insufficient stock', 'shortages': e.to_dict()}), HTTP_409_CONFLICT
+    
     item.quantity = quantity
     try:
         db.session.commit()
         return jsonify({'message': 'Cart item updated successfully'}), HTTP_200_OK
     except Exception as e:
         db.session.rollback()
-        print("Update cart item error:", str(e))
+        current_app.logger.error(f"Update cart item error: {str(e)}")
         return jsonify({'error': 'Failed to update cart item'}), HTTP_500_INTERNAL_SERVER_ERROR
 
 # Delete an item from cart
@@ -222,14 +437,199 @@ def delete_cart_item(item_id):
         return jsonify({'error': 'Invalid user role'}), HTTP_401_UNAUTHORIZED
     
     try:
+        release(cart_holder(item.cart_id), [item.product_id])
         db.session.delete(item)
         db.session.commit()
         return jsonify({'message': 'Cart item deleted successfully'}), HTTP_200_OK
     except Exception as e:
         db.session.rollback()
-        print("Delete cart item error:", str(e))
+        current_app.logger.error(f"Delete cart item error: {str(e)}")
         return jsonify({'error': 'Failed to delete cart item'}), HTTP_500_INTERNAL_SERVER_ERROR
 
+# Guest carts
+# Guests are identified by a signed cookie holding a random token. Items live in
+# guest_carts as a compact JSON map until the guest logs in (see merge_guest_cart)
+# or the cart expires and is removed by the background sweeper.
+def get_guest_serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='guest-cart')
+
+def get_guest_cart_ttl():
+    return timedelta(days=current_app.config.get('GUEST_CART_TTL_DAYS', 7))
+
+# Helper function to load the guest cart referenced by the request cookie
+def get_guest_cart():
+    cookie = request.cookies.get(current_app.config.get('GUEST_CART_COOKIE_NAME', 'fd_guest_cart'))
+    if not cookie:
+        return None
+    try:
+        token = get_guest_serializer().loads(cookie)
+    except BadSignature:
+        return None
+    return GuestCart.query.filter(
+        GuestCart.token == token,
+        GuestCart.expires_at > datetime.utcnow()
+    ).first()
+
+def set_guest_cookie(response, guest_cart):
+    response.set_cookie(
+        current_app.config.get('GUEST_CART_COOKIE_NAME', 'fd_guest_cart'),
+        get_guest_serializer().dumps(guest_cart.token),
+        max_age=int(get_guest_cart_ttl().total_seconds()),
+        httponly=True,
+        secure=current_app.config.get('SESSION_COOKIE_SECURE', False),
+        samesite='Lax'
+    )
+    return response
+
+def clear_guest_cookie(response):
+    response.delete_cookie(current_app.config.get('GUEST_CART_COOKIE_NAME', 'fd_guest_cart'))
+    return response
+
+# Helper function to price a guest cart's {product_id: quantity} map with one query
+def build_guest_cart_response(items, guest_cart=None):
+    products = {}
+    if items:
+        products = {p.id: p for p in Product.query.filter(Product.id.in_(list(items))).all()}
+    return price_cart_lines(
+        ((None, quantity, None, products[product_id])
+         for product_id, quantity in items.items() if product_id in products),
+        holder=guest_holder(guest_cart.id) if guest_cart else None
+    )
+
+# Merge the request's guest cart into a customer's cart. Must be called inside the
+# caller's transaction; the caller commits. Returns the number of lines merged.
+def merge_guest_cart(customer_id):
+    guest_cart = get_guest_cart()
+    if not guest_cart:
+        return 0
+    
+    guest_items = guest_cart.get_items()
+    
+    # Deleting the row first makes the merge happen at most once, even if the
+    # same cookie is used by two concurrent logins
+    deleted = GuestCart.query.filter_by(id=guest_cart.id).delete(synchronize_session=False)
+    db.session.expunge(guest_cart)
+    release(guest_holder(guest_cart.id))
+    if not deleted or not guest_items:
+        return 0
+    
+    products = {
+        p.id: p for p in Product.query.filter(
+            Product.id.in_(list(guest_items)),
+            Product.is_active == True
+        ).all()
+    }
+    cart = get_user_cart(customer_id, 'customer', create=True)
+    existing = {
+        item.product_id: item for item in CartItem.query.filter(
+            CartItem.cart_id == cart.id,
+            CartItem.product_id.in_(list(products))
+        ).all()
+    } if products else {}
+    
+    merged = {}
+    for product_id, quantity in guest_items.items():
+        product = products.get(product_id)
+        if not product:
+            continue
+        if product_id in existing:
+            existing[product_id].quantity += quantity
+            merged[product_id] = existing[product_id].quantity
+        else:
+            db.session.add(CartItem(
+                cart_id=cart.id,
+                product_id=product_id,
+                quantity=quantity,
+                price_at_added=product.price
+            ))
+            merged[product_id] = quantity
+    
+    # Carry the holds over; anything no longer in stock shows up as a shortfall on the cart
+    reserve(cart_holder(cart.id), merged, strict=False)
+    return len(merged)
+
+# Get the guest cart (no authentication)
+@cart_bp.route('/guest', methods=['GET'])
+def get_guest_cart_items():
+    try:
+        guest_cart = get_guest_cart()
+        return jsonify(build_guest_cart_response(guest_cart.get_items() if guest_cart else {}, guest_cart)), HTTP_200_OK
+    except Exception as e:
+        current_app.logger.error(f"Get guest cart error: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve cart'}), HTTP_500_INTERNAL_SERVER_ERROR
+
+# Sync the guest cart; accepts the same items/ops payload as PUT /api/v1/carts
+@cart_bp.route('/guest', methods=['PUT'])
+def sync_guest_cart():
+    data = request.get_json(silent=True)
+    if not data or ('items' not in data and 'ops' not in data):
+        return jsonify({'error': 'items or ops is required'}), HTTP_400_BAD_REQUEST
+    
+    try:
+        guest_cart = get_guest_cart()
+        desired, error = resolve_desired_items(guest_cart.get_items() if guest_cart else {}, data)
+        if error:
+            return jsonify({'error': error}), HTTP_400_BAD_REQUEST
+        
+        max_items = current_app.config.get('GUEST_CART_MAX_ITEMS', 100)
+        if len(desired) > max_items:
+            return jsonify({'error': f'A guest cart can hold at most {max_items} products'}), HTTP_400_BAD_REQUEST
+        
+        previous = guest_cart.get_items() if guest_cart else {}
+        
+        if desired:
+            active_ids = {
+                row.id for row in db.session.query(Product.id).filter(
+                    Product.id.in_(list(desired)),
+                    Product.is_active == True
+                ).all()
+            }
+            missing = [product_id for product_id in desired if product_id not in active_ids]
+            if missing:
+                return jsonify({'error': 'Product not found', 'product_ids': missing}), HTTP_404_NOT_FOUND
+        
+        if not guest_cart:
+            guest_cart = GuestCart(token=secrets.token_urlsafe(32), expires_at=datetime.utcnow())
+            db.session.add(guest_cart)
+            db.session.flush()  # Flush to get guest_cart.id for the stock holds
+        
+        holder = guest_holder(guest_cart.id)
+        reserve(holder, {
+            product_id: quantity for product_id, quantity in desired.items()
+            if previous.get(product_id) != quantity
+        })
+        release(holder, [product_id for product_id in previous if product_id not in desired])
+        
+        guest_cart.set_items(desired)
+        guest_cart.touch(get_guest_cart_ttl())
+        db.session.commit()
+        
+        response = jsonify(build_guest_cart_response(desired, guest_cart))
+        return set_guest_cookie(response, guest_cart), HTTP_200_OK
+    except InsufficientStockError as e:
+        db.session.rollback()
+        return jsonify({'error': 'Insufficient stock', 'shortages': e.to_dict()}), HTTP_409_CONFLICT
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Guest cart sync error: {str(e)}")
+        return jsonify({'error': 'Failed to sync cart'}), HTTP_500_INTERNAL_SERVER_ERROR
+
+# Discard the guest cart
+@cart_bp.route('/guest', methods=['DELETE'])
+def delete_guest_cart():
+    try:
+        guest_cart = get_guest_cart()
+        if guest_cart:
+            release(guest_holder(guest_cart.id))
+            db.session.delete(guest_cart)
+            db.session.commit()
+        response = jsonify({'message': 'Cart cleared'})
+        return clear_guest_cookie(response), HTTP_200_OK
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Delete guest cart error: {str(e)}")
+        return jsonify({'error': 'Failed to clear cart'}), HTTP_500_INTERNAL_SERVER_ERROR
+
 # Checkout - Create order from cart and clear cart
 @cart_bp.route('/checkout', methods=['POST'])
 @jwt_required()
@@ -248,54 +648,48 @@ def checkout():
     if not cart or not cart.items:
         return jsonify({'error': 'Cart is empty'}), HTTP_400_BAD_REQUEST
     
-    # Prepare order items from cart items
-    order_items = []
-    total_amount = 0.0
-    
+    # Sum quantities per product; duplicate lines for one product are sold together
+    quantities = {}
     for cart_item in cart.items:
-        product = Product.query.get(cart_item.product_id)
-        if not product:
-            continue  # Skip if product doesn't exist
-        
-        # Calculate price (use current product price)
-        price = product.price
-        item_total = price * cart_item.quantity
-        total_amount += item_total
-        
-        # Create order item
-        order_item = OrderItem(
-            product_id=cart_item.product_id,
-            quantity=cart_item.quantity,
-            price=price
-        )
-        order_items.append(order_item)
-    
-    if not order_items:
-        return jsonify({'error': 'No valid products in cart'}), HTTP_400_BAD_REQUEST
-    
-    # Create a new order
-    new_order = Order(
-        customer_id=user_id,
-        order_date=datetime.utcnow(),
-        total_amount=total_amount,
-        status='Pending'
-    )
+        quantities[cart_item.product_id] = quantities.get(cart_item.product_id, 0) + cart_item.quantity
     
     try:
-        # Add order to database
+        # Create the order first so the stock movements can reference it
+        new_order = Order(
+            customer_id=user_id,
+            order_date=datetime.utcnow(),
+            total_amount=0.0,
+            status='Pending'
+        )
         db.session.add(new_order)
         db.session.flush()  # Get order ID
         
-        # Add order items to database
-        for order_item in order_items:
-            order_item.order_id = new_order.id
-            db.session.add(order_item)
+        # Lock the products, check them against other shoppers' holds and take the stock
+        products = {product.id: product for product in sell(
+            quantities, holder=cart_holder(cart.id), reference=order_reference(new_order.id)
+        )}
+        
+        # Add order items (use current product price)
+        total_amount = 0.0
+        for product_id, quantity in quantities.items():
+            price = products[product_id].price
+            total_amount += price * quantity
+            db.session.add(OrderItem(
+                order_id=new_order.id,
+                product_id=product_id,
+                quantity=quantity,
+                price=price
+            ))
+        new_order.total_amount = total_amount
+        record_status(new_order.id, None, PENDING, 1, changed_by=f'customer:{user_id}')
+        record_order_placed(new_order)
         
         # Clear the cart by deleting all cart items
         CartItem.query.filter_by(cart_id=cart.id).delete()
         
         # Commit all changes
         db.session.commit()
+        metrics.checkouts_total.inc(source='cart')
         
         # Return success response with order details
         return jsonify({
@@ -316,7 +710,10 @@ def checkout():
             }
         }), HTTP_201_CREATED
     
+    except InsufficientStockError as e:
+        db.session.rollback()
+        return jsonify({'error': 'Insufficient stock', 'shortages': e.to_dict()}), HTTP_409_CONFLICT
     except Exception as e:
         db.session.rollback()
-        print("Checkout error:", str(e))
+        current_app.logger.error(f"Checkout error: {str(e)}")
         return jsonify({'error': 'Failed to place order'}), HTTP_500_INTERNAL_SERVER_ERROR
\ No newline at end of file
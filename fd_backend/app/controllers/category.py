@@ -0,0 +1,208 @@
+from flask import Blueprint, request, jsonify, current_app
+from app.models.category import Category
+from app.models.product import Product
+from app.extensions import db, cache
+from app.cache import PRODUCTS, CATEGORIES
+from app.categories import category_tree, unique_slug, slugify
+from app.controllers.product import is_admin
+from flask_jwt_extended import jwt_required
+from sqlalchemy import update
+from app.status_codes import (
+    HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND, HTTP_401_UNAUTHORIZED, HTTP_409_CONFLICT, HTTP_500_INTERNAL_SERVER_ERROR
+)
+
+category_bp = Blueprint('category', __name__, url_prefix='/api/v1/categories')
+
+def parent_error(category_id, parent_id):
+    """Reason parent_id cannot be the parent of category_id, or None"""
+    if parent_id is None:
+        return None
+    _, by_id = category_tree()
+    if parent_id not in by_id:
+        return 'Parent category not found'
+    # Walk up from the new parent; meeting the category itself would make a cycle
+    current = parent_id
+    while current is not None:
+        if current == category_id:
+            return 'A category cannot be placed under itself or its subcategories'
+        current = by_id[current]['parent_id'] if current in by_id else None
+    return None
+
+@category_bp.route('', methods=['GET', 'OPTIONS'])
+def get_categories():
+    """
+    Get the category tree with product counts.
+    Pass ?flat=true for a flat list ordered for display.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    try:
+        roots, by_id = category_tree()
+        if request.args.get('flat', '').lower() in ('true', '1', 'yes'):
+            categories = [
+                {key: value for key, value in node.items() if key != 'children'}
+                for node in sorted(by_id.values(), key=lambda node: (node['display_order'], node['name']))
+            ]
+        else:
+            categories = roots
+        
+        return jsonify({
+            'categories': categories,
+            'count': len(by_id)
+        }), HTTP_200_OK
+    except Exception as e:
+        current_app.logger.error(f"Error retrieving categories: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve categories'}), HTTP_500_INTERNAL_SERVER_ERROR
+
+@category_bp.route('', methods=['POST'])
+@jwt_required()
+def create_category():
+    """
+    Create a category: {"name", "parent_id", "display_order"}.
+    """
+    if not is_admin():
+        return jsonify({'error': 'Admin access required'}), HTTP_401_UNAUTHORIZED
+    
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Request must be JSON'}), HTTP_400_BAD_REQUEST
+    
+    name = str(data.get('name') or '').strip()
+    if not name or len(name) > 100:
+        return jsonify({'error': 'name is required and must be at most 100 characters'}), HTTP_400_BAD_REQUEST
+    
+    try:
+        parent_id = data.get('parent_id')
+        error = parent_error(None, parent_id)
+        if error:
+            return jsonify({'error': error}), HTTP_400_BAD_REQUEST
+        if Category.query.filter(db.func.lower(Category.name) == name.lower()).first():
+            return jsonify({'error': f'Category {name} already exists'}), HTTP_409_CONFLICT
+        
+        category = Category(
+            name=name,
+            slug=unique_slug(data.get('slug') or name),
+            parent_id=parent_id,
+            display_order=int(data.get('display_order', 0))
+        )
+        db.session.add(category)
+        db.session.commit()
+        
+        cache.invalidate(CATEGORIES)
+        
+        return jsonify({
+            'message': 'Category created successfully',
+            'category': category.to_dict()
+        }), HTTP_201_CREATED
+    except (TypeError, ValueError):
+        db.session.rollback()
+        return jsonify({'error': 'display_order must be an integer'}), HTTP_400_BAD_REQUEST
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Category creation error: {str(e)}")
+        return jsonify({'error': 'Failed to create category'}), HTTP_500_INTERNAL_SERVER_ERROR
+
+@category_bp.route('/<int:category_id>', methods=['PUT', 'OPTIONS'])
+@jwt_required()
+def update_category(category_id):
+    """
+    Rename, move or reorder a category. Renaming updates the category name
+    shown on its products.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    if not is_admin():
+        return jsonify({'error': 'Admin access required'}), HTTP_401_UNAUTHORIZED
+    
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Request must be JSON'}), HTTP_400_BAD_REQUEST
+    
+    try:
+        category = Category.query.get(category_id)
+        if not category:
+            return jsonify({'error': 'Category not found'}), HTTP_404_NOT_FOUND
+        
+        if 'parent_id' in data:
+            error = parent_error(category.id, data['parent_id'])
+            if error:
+                return jsonify({'error': error}), HTTP_400_BAD_REQUEST
+            category.parent_id = data['parent_id']
+        
+        if 'display_order' in data:
+            category.display_order = int(data['display_order'])
+        
+        if 'name' in data:
+            name = str(data.get('name') or '').strip()
+            if not name or len(name) > 100:
+                return jsonify({'error': 'name is required and must be at most 100 characters'}), HTTP_400_BAD_REQUEST
+            if Category.query.filter(db.func.lower(Category.name) == name.lower(), Category.id != category.id).first():
+                return jsonify({'error': f'Category {name} already exists'}), HTTP_409_CONFLICT
+            if name != category.name:
+                category.name = name
+                # Products carry the name for display and for the string-based endpoints
+                db.session.execute(
+                    update(Product)
+                    .where(Product.category_id == category.id)
+                    .values(category=name)
+                    .execution_options(synchronize_session=False)
+                )
+        
+        if data.get('slug') and slugify(data['slug']) != category.slug:
+            category.slug = unique_slug(data['slug'], exclude_id=category.id)
+        
+        db.session.commit()
+        
+        cache.invalidate(CATEGORIES, PRODUCTS)
+        
+        return jsonify({
+            'message': 'Category updated successfully',
+            'category': category.to_dict()
+        }), HTTP_200_OK
+    except (TypeError, ValueError):
+        db.session.rollback()
+        return jsonify({'error': 'display_order must be an integer'}), HTTP_400_BAD_REQUEST
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error updating category: {str(e)}")
+        return jsonify({'error': 'Failed to update category'}), HTTP_500_INTERNAL_SERVER_ERROR
+
+@category_bp.route('/<int:category_id>', methods=['DELETE'])
+@jwt_required()
+def delete_category(category_id):
+    """
+    Delete a category that has no products. Its subcategories move up to its parent.
+    """
+    if not is_admin():
+        return jsonify({'error': 'Admin access required'}), HTTP_401_UNAUTHORIZED
+    
+    try:
+        category = Category.query.get(category_id)
+        if not category:
+            return jsonify({'error': 'Category not found'}), HTTP_404_NOT_FOUND
+        
+        if db.session.query(Product.id).filter(Product.category_id == category.id).first():
+            return jsonify({'error': 'Category still has products'}), HTTP_409_CONFLICT
+        
+        db.session.execute(
+            update(Category)
+            .where(Category.parent_id == category.id)
+            .values(parent_id=category.parent_id)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.delete(category)
+        db.session.commit()
+        
+        cache.invalidate(CATEGORIES)
+        
+        return jsonify({
+            'message': 'Category deleted successfully',
+            'category_id': category_id
+        }), HTTP_200_OK
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error deleting category: {str(e)}")
+        return jsonify({'error': 'Failed to delete category'}), HTTP_500_INTERNAL_SERVER_ERROR
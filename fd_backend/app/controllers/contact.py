@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_cors import cross_origin
 from app.models import ContactInfo
-from app.extensions import db
+from app.extensions import db, cache
+from app.cache import CONTACT
+from app.site_content import contact_info
+from app.static_export import schedule_static_export
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, decode_token
 from app.status_codes import (
     HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST, HTTP_401_UNAUTHORIZED,
@@ -27,17 +30,11 @@ def is_admin():
 @cross_origin(origin='http://localhost:3000', headers=['Content-Type', 'Authorization'])
 def get_contact():
     try:
-        contact = ContactInfo.query.first()
+        contact = contact_info()
         if not contact:
             return jsonify({'error': 'Contact info not found'}), HTTP_404_NOT_FOUND
         
-        return jsonify({
-            'phone': contact.phone,
-            'email': contact.email,
-            'location': contact.location,
-            'map_link': contact.map_link,
-            'social_media_links': contact.get_social_links()
-        }), HTTP_200_OK
+        return jsonify(contact), HTTP_200_OK
     except Exception as e:
         current_app.logger.error(f"Error retrieving contact info: {str(e)}")
         return jsonify({'error': 'Failed to retrieve contact info'}), HTTP_500_INTERNAL_SERVER_ERROR
@@ -84,6 +81,8 @@ def update_contact():
             
         db.session.add(contact)
         db.session.commit()
+        cache.invalidate(CONTACT)
+        schedule_static_export()
         
         return jsonify({
             'message': 'Contact info updated successfully',
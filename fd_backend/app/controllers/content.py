@@ -1,11 +1,17 @@
 from flask import Blueprint, jsonify, request, current_app
-from app.models.content import BestSeller, HealthTip, QuickTip, CompanyInfo, TeamMember, CompanyStat
+from app.models.content import BestSeller, HealthTip, CompanyInfo, TeamMember, CompanyStat
 from app.models.product import Product
-from app.extensions import db
+from app.extensions import db, cache, background_tasks
+from app.cache import HEALTH_TIPS, CONTENT, PRODUCTS
+from app.health_tips import list_health_tips, search_health_tips, health_tip_categories, paginate
+from app.site_content import (
+    best_sellers, company_info, team_members, company_stats, quick_tips, content_bundle, SECTIONS
+)
+from app.static_export import export_static, schedule_static_export
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.admin_user import AdminUser
 from app.status_codes import (
-    HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST,
+    HTTP_200_OK, HTTP_201_CREATED, HTTP_202_ACCEPTED, HTTP_400_BAD_REQUEST,
     HTTP_404_NOT_FOUND, HTTP_401_UNAUTHORIZED, HTTP_500_INTERNAL_SERVER_ERROR
 )
 
@@ -37,12 +43,31 @@ def is_admin():
     
     return False
 
+# Everything the home and about pages show, in one request
+@content_bp.route('/bundle', methods=['GET'])
+def get_content_bundle():
+    """
+    The requested sections (comma-separated `sections`, default all), each
+    the body its own endpoint returns, with a version per section.
+    """
+    try:
+        names = [name.strip() for name in request.args.get('sections', '').split(',') if name.strip()]
+        unknown = [name for name in names if name not in SECTIONS]
+        if unknown:
+            return jsonify({
+                'error': f"Unknown sections: {', '.join(unknown)}. Available: {', '.join(SECTIONS)}"
+            }), HTTP_400_BAD_REQUEST
+        
+        return jsonify(content_bundle(list(dict.fromkeys(names)))), HTTP_200_OK
+    except Exception as e:
+        current_app.logger.error(f"Error fetching content bundle: {str(e)}")
+        return jsonify({'error': 'Failed to fetch content bundle'}), HTTP_500_INTERNAL_SERVER_ERROR
+
 # Home Page Content
 @content_bp.route('/home/best-sellers', methods=['GET'])
 def get_best_sellers():
     try:
-        best_sellers = BestSeller.query.join(Product).order_by(BestSeller.display_order).all()
-        return jsonify([bs.to_dict() for bs in best_sellers])
+        return jsonify(best_sellers())
     except Exception as e:
         current_app.logger.error(f"Error fetching best sellers: {str(e)}")
         return jsonify({'error': 'Failed to fetch best sellers'}), HTTP_500_INTERNAL_SERVER_ERROR
@@ -51,8 +76,7 @@ def get_best_sellers():
 @content_bp.route('/about/company-info', methods=['GET'])
 def get_company_info():
     try:
-        info = CompanyInfo.query.all()
-        return jsonify({item.key: item.value for item in info})
+        return jsonify(company_info())
     except Exception as e:
         current_app.logger.error(f"Error fetching company info: {str(e)}")
         return jsonify({'error': 'Failed to fetch company info'}), HTTP_500_INTERNAL_SERVER_ERROR
@@ -60,8 +84,7 @@ def get_company_info():
 @content_bp.route('/about/team-members', methods=['GET'])
 def get_team_members():
     try:
-        members = TeamMember.query.order_by(TeamMember.display_order).all()
-        return jsonify([member.to_dict() for member in members])
+        return jsonify(team_members())
     except Exception as e:
         current_app.logger.error(f"Error fetching team members: {str(e)}")
         return jsonify({'error': 'Failed to fetch team members'}), HTTP_500_INTERNAL_SERVER_ERROR
@@ -69,8 +92,7 @@ def get_team_members():
 @content_bp.route('/about/stats', methods=['GET'])
 def get_company_stats():
     try:
-        stats = CompanyStat.query.order_by(CompanyStat.display_order).all()
-        return jsonify([stat.to_dict() for stat in stats])
+        return jsonify(company_stats())
     except Exception as e:
         current_app.logger.error(f"Error fetching company stats: {str(e)}")
         return jsonify({'error': 'Failed to fetch company stats'}), HTTP_500_INTERNAL_SERVER_ERROR
@@ -78,40 +100,67 @@ def get_company_stats():
 # Health Tips Page Content
 @content_bp.route('/health-tips', methods=['GET'])
 def get_health_tips():
+    """
+    Health tips, newest first, optionally in one category and matching the
+    words in `search`. With page or per_page the response is one page with
+    the total; without, it is the full list as before.
+    """
     try:
         category = request.args.get('category', 'all')
         search = request.args.get('search', '')
+        category = None if category == 'all' else category
         
-        query = HealthTip.query
+        if search.strip():
+            tips = search_health_tips(search, category)
+        else:
+            tips = list_health_tips(category)
         
-        if category != 'all':
-            query = query.filter(HealthTip.category == category)
+        if 'page' not in request.args and 'per_page' not in request.args:
+            return jsonify(tips)
         
-        if search:
-            term = f"%{search}%"
-            query = query.filter(
-                db.or_(
-                    HealthTip.title.ilike(term),
-                    HealthTip.description.ilike(term)
-                )
-            )
-        
-        tips = query.order_by(HealthTip.created_at.desc()).all()
-        return jsonify([tip.to_dict() for tip in tips])
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = request.args.get('per_page', current_app.config.get('HEALTH_TIPS_PER_PAGE', 12), type=int)
+        per_page = max(1, min(per_page, current_app.config.get('HEALTH_TIPS_MAX_PER_PAGE', 100)))
+        return jsonify(paginate(tips, page=page, per_page=per_page))
     except Exception as e:
         current_app.logger.error(f"Error fetching health tips: {str(e)}")
         return jsonify({'error': 'Failed to fetch health tips'}), HTTP_500_INTERNAL_SERVER_ERROR
 
+@content_bp.route('/health-tips/categories', methods=['GET'])
+def get_health_tip_categories():
+    try:
+        return jsonify(health_tip_categories())
+    except Exception as e:
+        current_app.logger.error(f"Error fetching health tip categories: {str(e)}")
+        return jsonify({'error': 'Failed to fetch health tip categories'}), HTTP_500_INTERNAL_SERVER_ERROR
+
 @content_bp.route('/quick-tips', methods=['GET'])
 def get_quick_tips():
     try:
-        tips = QuickTip.query.order_by(QuickTip.created_at.desc()).all()
-        return jsonify([tip.to_dict() for tip in tips])
+        return jsonify(quick_tips())
     except Exception as e:
         current_app.logger.error(f"Error fetching quick tips: {str(e)}")
         return jsonify({'error': 'Failed to fetch quick tips'}), HTTP_500_INTERNAL_SERVER_ERROR
 
 # Admin endpoints for managing content
+@content_bp.route('/admin/export-static', methods=['POST'])
+@jwt_required()
+def trigger_static_export():
+    """Regenerate the static JSON export in the background; force rewrites every file"""
+    if not is_admin():
+        return jsonify({'error': 'Unauthorized access'}), HTTP_401_UNAUTHORIZED
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        background_tasks.submit(export_static, force=bool(data.get('force')))
+        return jsonify({
+            'message': 'Static export started',
+            'output_dir': current_app.config.get('STATIC_EXPORT_DIR')
+        }), HTTP_202_ACCEPTED
+    except Exception as e:
+        current_app.logger.error(f"Error starting static export: {str(e)}")
+        return jsonify({'error': 'Failed to start static export'}), HTTP_500_INTERNAL_SERVER_ERROR
+
 @content_bp.route('/admin/best-sellers', methods=['POST'])
 @jwt_required()
 def add_best_seller():
@@ -138,6 +187,9 @@ def add_best_seller():
         best_seller = BestSeller(product_id=product_id, display_order=display_order)
         db.session.add(best_seller)
         db.session.commit()
+        # Product listings show is_best_seller
+        cache.invalidate(CONTENT, PRODUCTS)
+        schedule_static_export()
         
         return jsonify(best_seller.to_dict()), HTTP_201_CREATED
     except Exception as e:
@@ -169,6 +221,8 @@ def add_health_tip():
         
         db.session.add(tip)
         db.session.commit()
+        cache.invalidate(HEALTH_TIPS)
+        schedule_static_export()
         
         return jsonify(tip.to_dict()), HTTP_201_CREATED
     except Exception as e:
@@ -201,6 +255,8 @@ def update_health_tip(tip_id):
             tip.category = data['category']
         
         db.session.commit()
+        cache.invalidate(HEALTH_TIPS)
+        schedule_static_export()
         return jsonify(tip.to_dict())
     except Exception as e:
         db.session.rollback()
@@ -220,6 +276,8 @@ def delete_health_tip(tip_id):
         
         db.session.delete(tip)
         db.session.commit()
+        cache.invalidate(HEALTH_TIPS)
+        schedule_static_export()
         
         return jsonify({'message': 'Health tip deleted successfully'})
     except Exception as e:
@@ -244,11 +302,15 @@ def add_company_info():
         if existing:
             existing.value = data['value']
             db.session.commit()
+            cache.invalidate(CONTENT)
+            schedule_static_export()
             return jsonify(existing.to_dict())
         
         info = CompanyInfo(key=data['key'], value=data['value'])
         db.session.add(info)
         db.session.commit()
+        cache.invalidate(CONTENT)
+        schedule_static_export()
         
         return jsonify(info.to_dict()), HTTP_201_CREATED
     except Exception as e:
@@ -282,6 +344,8 @@ def add_team_member():
         
         db.session.add(member)
         db.session.commit()
+        cache.invalidate(CONTENT)
+        schedule_static_export()
         
         return jsonify(member.to_dict()), HTTP_201_CREATED
     except Exception as e:
@@ -318,6 +382,8 @@ def update_team_member(member_id):
             member.display_order = data['display_order']
         
         db.session.commit()
+        cache.invalidate(CONTENT)
+        schedule_static_export()
         return jsonify(member.to_dict())
     except Exception as e:
         db.session.rollback()
@@ -337,6 +403,8 @@ def delete_team_member(member_id):
         
         db.session.delete(member)
         db.session.commit()
+        cache.invalidate(CONTENT)
+        schedule_static_export()
         
         return jsonify({'message': 'Team member deleted successfully'})
     except Exception as e:
@@ -364,6 +432,8 @@ def add_company_stat():
         
         db.session.add(stat)
         db.session.commit()
+        cache.invalidate(CONTENT)
+        schedule_static_export()
         
         return jsonify(stat.to_dict()), HTTP_201_CREATED
     except Exception as e:
@@ -392,6 +462,8 @@ def update_company_stat(stat_id):
             stat.display_order = data['display_order']
         
         db.session.commit()
+        cache.invalidate(CONTENT)
+        schedule_static_export()
         return jsonify(stat.to_dict())
     except Exception as e:
         db.session.rollback()
@@ -411,6 +483,8 @@ def delete_company_stat(stat_id):
         
         db.session.delete(stat)
         db.session.commit()
+        cache.invalidate(CONTENT)
+        schedule_static_export()
         
         return jsonify({'message': 'Company stat deleted successfully'})
     except Exception as e:
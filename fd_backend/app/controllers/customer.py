@@ -1,12 +1,14 @@
-from flask import Blueprint, request, jsonify
-from app.models.customer import Customer
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from app.models.customer import Customer, CustomerErasure
 from app.extensions import db
+from app.customers import search_customers as find_customers, customer_summary
+from app.privacy import export_customer_data, request_erasure, ERASE_DELETE, ERASURE_MODES
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_mail import Message
 from app import mail
 from app.status_codes import (
-    HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST,
+    HTTP_200_OK, HTTP_201_CREATED, HTTP_202_ACCEPTED, HTTP_400_BAD_REQUEST,
     HTTP_404_NOT_FOUND, HTTP_401_UNAUTHORIZED, HTTP_500_INTERNAL_SERVER_ERROR
 )
 from datetime import datetime, timedelta
@@ -45,6 +47,23 @@ def is_superadmin():
 def is_admin_or_superadmin():
     return is_admin() or is_superadmin()
 
+# Helper function to read the keyset pagination and status filters shared by listing and search
+def get_listing_args(default_limit):
+    args = {}
+    for field in ('is_active', 'email_verified'):
+        value = request.args.get(field)
+        if value is not None:
+            if value.lower() in ['true', '1', 'yes', 'on']:
+                args[field] = True
+            elif value.lower() in ['false', '0', 'no', 'off']:
+                args[field] = False
+            else:
+                raise ValueError(f'Invalid boolean value for {field}')
+    args['before_id'] = request.args.get('before_id', type=int)
+    max_limit = current_app.config.get('CUSTOMER_PAGE_SIZE_MAX', 500)
+    args['limit'] = max(1, min(request.args.get('limit', default_limit, type=int), max_limit))
+    return args
+
 # Helper function to extract customer ID from JWT token
 def get_current_customer_id():
     identity = get_jwt_identity()
@@ -70,7 +89,13 @@ def get_all_customers():
         }), HTTP_401_UNAUTHORIZED
     
     try:
-        customers = Customer.query.all()
+        args = get_listing_args(current_app.config.get('CUSTOMER_PAGE_SIZE', 100))
+    except ValueError as e:
+        return jsonify({'error': str(e), 'code': 'invalid_boolean'}), HTTP_400_BAD_REQUEST
+    
+    try:
+        # Keyset pagination: pass next_cursor back as before_id
+        customers, next_cursor = find_customers(**args)
         customers_data = []
         
         for customer in customers:
@@ -93,7 +118,9 @@ def get_all_customers():
             'message': f'Retrieved {len(customers_data)} customers',
             'data': {
                 'customers': customers_data,
-                'count': len(customers_data)
+                'count': len(customers_data),
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
             }
         }), HTTP_200_OK
     except Exception as e:
@@ -147,6 +174,79 @@ def get_customer(customer_id):
             'details': str(e)
         }), HTTP_500_INTERNAL_SERVER_ERROR
 
+# Customer summary: profile, order and feedback stats and recent orders in one call
+# Pass live=true to aggregate the orders table instead of reading customer_stats
+@customer_bp.route('/<int:customer_id>/summary', methods=['GET'])
+@jwt_required()
+def get_customer_summary(customer_id):
+    current_customer_id = get_current_customer_id()
+    is_current_user = is_customer() and current_customer_id == customer_id
+    
+    if not (is_admin_or_superadmin() or is_current_user):
+        return jsonify({
+            'error': 'Access denied. You can only view your own summary.',
+            'code': 'insufficient_privileges'
+        }), HTTP_401_UNAUTHORIZED
+    
+    live = request.args.get('live', 'false').lower() in ['true', '1', 'yes', 'on']
+    recent_limit = current_app.config.get('CUSTOMER_SUMMARY_RECENT_ORDERS', 5)
+    recent_limit = max(0, min(request.args.get('recent_orders', recent_limit, type=int), 50))
+    
+    try:
+        summary = customer_summary(customer_id, recent_orders=recent_limit, live=live)
+        if summary is None:
+            return jsonify({
+                'error': 'Customer not found',
+                'code': 'customer_not_found'
+            }), HTTP_404_NOT_FOUND
+        
+        customer = summary['customer']
+        order_stats = summary['orders']
+        return jsonify({
+            'message': 'Customer summary retrieved successfully',
+            'data': {
+                'customer': {
+                    'id': customer.id,
+                    'name': customer.name,
+                    'email': customer.email,
+                    'phone': customer.phone,
+                    'address': customer.address,
+                    'email_verified': customer.email_verified,
+                    'is_active': customer.is_active,
+                    'last_login': customer.last_login.isoformat() if customer.last_login else None,
+                    'created_at': customer.created_at.isoformat()
+                },
+                'orders': {
+                    'count': order_stats['count'],
+                    'cancelled_count': order_stats['cancelled_count'],
+                    'lifetime_value': order_stats['lifetime_value'],
+                    'average_order_value': order_stats['average_order_value'],
+                    'first_order_at': order_stats['first_order_at'].isoformat() if order_stats['first_order_at'] else None,
+                    'last_order_at': order_stats['last_order_at'].isoformat() if order_stats['last_order_at'] else None
+                },
+                'feedback': summary['feedback'],
+                'recent_orders': [{
+                    'order_id': order.id,
+                    'order_date': order.order_date.isoformat(),
+                    'total_amount': order.total_amount,
+                    'status': order.status,
+                    'version': order.version,
+                    'items': [{
+                        'product_id': item.product_id,
+                        'quantity': item.quantity,
+                        'price': item.price
+                    } for item in order.items]
+                } for order in summary['recent_orders']],
+                'source': summary['source']
+            }
+        }), HTTP_200_OK
+    except Exception as e:
+        current_app.logger.error(f"Customer summary error: {str(e)}")
+        return jsonify({
+            'error': 'Failed to retrieve customer summary',
+            'details': str(e)
+        }), HTTP_500_INTERNAL_SERVER_ERROR
+
 # Update customer by admin/superadmin
 @customer_bp.route('/<int:customer_id>', methods=['PUT', 'PATCH'])
 @jwt_required()
@@ -233,12 +333,25 @@ def update_customer_by_admin(customer_id):
 @customer_bp.route('/<int:customer_id>', methods=['DELETE'])
 @jwt_required()
 def delete_customer(customer_id):
+    """
+    Erase a customer in the background: ?mode=delete (default) removes the
+    customer with their orders, feedback and cart; ?mode=anonymize keeps the
+    orders and ratings but scrubs everything identifying. The customer is
+    deactivated at once; poll the returned job for progress.
+    """
     if not is_admin_or_superadmin():
         return jsonify({
             'error': 'Admin or superadmin access required',
             'code': 'insufficient_privileges'
         }), HTTP_401_UNAUTHORIZED
     
+    mode = request.args.get('mode', ERASE_DELETE)
+    if mode not in ERASURE_MODES:
+        return jsonify({
+            'error': f'mode must be one of: {", ".join(ERASURE_MODES)}',
+            'code': 'invalid_mode'
+        }), HTTP_400_BAD_REQUEST
+    
     try:
         customer = Customer.query.get(customer_id)
         if not customer:
@@ -248,24 +361,73 @@ def delete_customer(customer_id):
             }), HTTP_404_NOT_FOUND
         
         customer_name = customer.name
-        
-        db.session.delete(customer)
-        db.session.commit()
+        job, created = request_erasure(customer, mode=mode, requested_by=f'admin:{get_jwt_identity()}')
         
         return jsonify({
-            'message': f'Customer {customer_name} has been permanently deleted',
+            'message': f'Erasure of customer {customer_name} has been {"queued" if created else "already requested"}',
             'data': {
-                'deleted_customer_id': customer_id,
-                'deleted_customer_name': customer_name
+                'customer_id': customer_id,
+                'job': job.to_dict()
             }
-        }), HTTP_200_OK
+        }), HTTP_202_ACCEPTED
     except Exception as e:
         db.session.rollback()
+        current_app.logger.error(f"Customer erasure request error: {str(e)}")
         return jsonify({
             'error': 'Failed to delete customer due to a server error',
             'details': str(e)
         }), HTTP_500_INTERNAL_SERVER_ERROR
 
+# Erasure job progress - admin or superadmin only
+@customer_bp.route('/erasures/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_erasure(job_id):
+    if not is_admin_or_superadmin():
+        return jsonify({
+            'error': 'Admin or superadmin access required',
+            'code': 'insufficient_privileges'
+        }), HTTP_401_UNAUTHORIZED
+    
+    job = db.session.get(CustomerErasure, job_id)
+    if not job:
+        return jsonify({
+            'error': 'Erasure job not found',
+            'code': 'job_not_found'
+        }), HTTP_404_NOT_FOUND
+    
+    return jsonify({
+        'message': 'Erasure job retrieved successfully',
+        'data': job.to_dict()
+    }), HTTP_200_OK
+
+# Export all of a customer's data as a ZIP - admin, superadmin, or the customer themselves
+@customer_bp.route('/<int:customer_id>/export', methods=['GET'])
+@jwt_required()
+def export_customer(customer_id):
+    current_customer_id = get_current_customer_id()
+    is_current_user = is_customer() and current_customer_id == customer_id
+    
+    if not (is_admin_or_superadmin() or is_current_user):
+        return jsonify({
+            'error': 'Access denied. You can only export your own data.',
+            'code': 'insufficient_privileges'
+        }), HTTP_401_UNAUTHORIZED
+    
+    customer = Customer.query.get(customer_id)
+    if not customer:
+        return jsonify({
+            'error': 'Customer not found',
+            'code': 'customer_not_found'
+        }), HTTP_404_NOT_FOUND
+    
+    chunk_size = current_app.config.get('CUSTOMER_EXPORT_CHUNK_SIZE', 500)
+    filename = f"customer-{customer_id}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.zip"
+    return Response(
+        stream_with_context(export_customer_data(customer, chunk_size=chunk_size)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 # Search customers - admin or superadmin only
 @customer_bp.route('/search', methods=['GET'])
 @jwt_required()
@@ -284,13 +446,13 @@ def search_customers():
         }), HTTP_400_BAD_REQUEST
     
     try:
-        customers = Customer.query.filter(
-            db.or_(
-                Customer.name.contains(query),
-                Customer.email.contains(query),
-                Customer.phone.contains(query)
-            )
-        ).all()
+        args = get_listing_args(current_app.config.get('CUSTOMER_SEARCH_PAGE_SIZE', 25))
+    except ValueError as e:
+        return jsonify({'error': str(e), 'code': 'invalid_boolean'}), HTTP_400_BAD_REQUEST
+    
+    try:
+        # Phone numbers, emails and names each use their own index
+        customers, next_cursor = find_customers(query, **args)
         
         customers_data = []
         for customer in customers:
@@ -299,6 +461,7 @@ def search_customers():
                 'name': customer.name,
                 'email': customer.email,
                 'phone': customer.phone,
+                'email_verified': customer.email_verified,
                 'is_active': customer.is_active,
                 'created_at': customer.created_at.isoformat()
             })
@@ -308,7 +471,9 @@ def search_customers():
             'data': {
                 'customers': customers_data,
                 'count': len(customers_data),
-                'query': query
+                'query': query,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
             }
         }), HTTP_200_OK
     except Exception as e:
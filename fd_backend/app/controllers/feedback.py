@@ -1,13 +1,15 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app.models.feedback import Feedback
 from app.models.customer import Customer
-from app.extensions import db
+from app.extensions import db, background_tasks
+from app.inbox import list_feedback, feedback_stats, select_feedback, bulk_respond, send_response_emails
+from app.sentiment import analyze_feedback
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.status_codes import (
     HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST, HTTP_401_UNAUTHORIZED,
     HTTP_404_NOT_FOUND, HTTP_500_INTERNAL_SERVER_ERROR
 )
-from datetime import datetime
+from datetime import datetime, timedelta
 
 feedback_bp = Blueprint('feedback', __name__, url_prefix='/api/v1/feedback')
 
@@ -95,8 +97,106 @@ def get_customer_id():
     
     return None
 
+# Helper function to parse a since/until bound; a bare "until" date includes that whole day
+def parse_date_bound(field, value, label=None):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{label or field} must be a date (YYYY-MM-DD) or ISO datetime')
+    if field == 'until' and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+# Helper function to read the inbox filters from the query string
+def get_inbox_filters():
+    filters = {}
+    statuses = request.args.get('status')
+    if statuses:
+        filters['statuses'] = [status.strip() for status in statuses.split(',') if status.strip()]
+    for field in ('rating', 'min_rating', 'max_rating', 'customer_id', 'min_urgency'):
+        value = request.args.get(field)
+        if value is not None:
+            try:
+                filters[field] = int(value)
+            except ValueError:
+                raise ValueError(f'{field} must be an integer')
+    if 'rating' in filters:
+        filters['min_rating'] = filters['max_rating'] = filters.pop('rating')
+    for field in ('since', 'until'):
+        value = request.args.get(field)
+        if value:
+            filters[field] = parse_date_bound(field, value)
+    filters['q'] = request.args.get('q', '').strip() or None
+    filters['sentiment'] = request.args.get('sentiment') or None
+    filters['topic'] = request.args.get('topic') or None
+    return filters
+
+# Helper function to validate the "filter" object of a bulk request into inbox filters.
+# Only the inbox filter keys are accepted, so a misspelt key cannot widen the selection.
+BULK_FILTER_INTS = ('rating', 'min_rating', 'max_rating', 'customer_id', 'min_urgency')
+BULK_FILTER_STRINGS = ('q', 'sentiment', 'topic')
+
+def get_bulk_filters(data):
+    unknown = sorted(set(data) - {'status', 'since', 'until', *BULK_FILTER_INTS, *BULK_FILTER_STRINGS})
+    if unknown:
+        raise ValueError(f"Unknown filter key(s): {', '.join(unknown)}")
+    filters = {}
+    statuses = data.get('status')
+    if statuses is not None:
+        if isinstance(statuses, str):
+            statuses = statuses.split(',')
+        if not isinstance(statuses, list) or not all(isinstance(status, str) for status in statuses):
+            raise ValueError('filter.status must be a string or a list of strings')
+        statuses = [status.strip() for status in statuses if status.strip()]
+        if statuses:
+            filters['statuses'] = statuses
+    for field in BULK_FILTER_INTS:
+        value = data.get(field)
+        if value is not None:
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise ValueError(f'filter.{field} must be an integer')
+            filters[field] = value
+    if 'rating' in filters:
+        filters['min_rating'] = filters['max_rating'] = filters.pop('rating')
+    for field in ('since', 'until'):
+        value = data.get(field)
+        if value is not None:
+            filters[field] = parse_date_bound(field, value, label=f'filter.{field}')
+    for field in BULK_FILTER_STRINGS:
+        value = data.get(field)
+        if value is not None:
+            if not isinstance(value, str):
+                raise ValueError(f'filter.{field} must be a string')
+            if value.strip():
+                filters[field] = value.strip()
+    if not filters:
+        raise ValueError('filter selects no criteria')
+    return filters
+
+# Helper function to read keyset pagination and sort arguments
+def get_page_args(sortable=False):
+    default_limit = current_app.config.get('FEEDBACK_PAGE_SIZE', 50)
+    max_limit = current_app.config.get('FEEDBACK_PAGE_SIZE_MAX', 200)
+    args = {
+        'before_id': request.args.get('before_id', type=int),
+        'limit': max(1, min(request.args.get('limit', default_limit, type=int), max_limit))
+    }
+    if sortable:
+        args['sort'] = request.args.get('sort', 'newest')
+        if args['sort'] not in ('newest', 'urgency'):
+            raise ValueError('sort must be newest or urgency')
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                urgency, last_id = cursor.split(':')
+                args['after'] = (int(urgency), int(last_id))
+            except ValueError:
+                raise ValueError('cursor must be a next_cursor from a previous page')
+    return args
+
 # Submit feedback (customer only)
 @feedback_bp.route('/', methods=['POST'], strict_slashes=False)
+@jwt_required()
 def submit_feedback():
     # Check if the user is authenticated
     auth_header = request.headers.get('Authorization')
@@ -140,6 +240,9 @@ def submit_feedback():
         
         db.session.add(feedback)
         db.session.commit()
+        if current_app.config.get('FEEDBACK_ANALYSIS_ENABLED', True):
+            # Sentiment, topics and urgency are filled in off the request path
+            background_tasks.submit(analyze_feedback, [feedback.id])
         return jsonify({'message': 'Feedback submitted successfully'}), HTTP_201_CREATED
     except Exception as e:
         db.session.rollback()
@@ -158,26 +261,33 @@ def get_my_feedback():
         return jsonify({'error': 'Customer ID not found in token'}), HTTP_401_UNAUTHORIZED
     
     try:
-        feedbacks = Feedback.query.filter_by(customer_id=customer_id).all()
+        # Keyset pagination: pass next_cursor back as before_id
+        feedbacks, next_cursor = list_feedback({'customer_id': customer_id}, **get_page_args())
         
-        if not feedbacks:
-            return jsonify({'message': 'No feedback found'}), HTTP_404_NOT_FOUND
-        
-        return jsonify({'feedbacks': [
-            {
-                'id': fb.id,
-                'title': fb.title,
-                'message': fb.feedback_message,
-                'rating': fb.rating,
-                'response': fb.response,
-                'status': fb.status,
-                'submitted_at': fb.created_at.strftime('%Y-%m-%d %H:%M')
-            } for fb in feedbacks
-        ]}), HTTP_200_OK
+        return jsonify({
+            'feedbacks': [
+                {
+                    'id': fb.id,
+                    'title': fb.title,
+                    'message': fb.feedback_message,
+                    'rating': fb.rating,
+                    'response': fb.response,
+                    'status': fb.status,
+                    'submitted_at': fb.created_at.strftime('%Y-%m-%d %H:%M')
+                } for fb in feedbacks
+            ],
+            'count': len(feedbacks),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        }), HTTP_200_OK
     except Exception as e:
+        current_app.logger.error(f"Error retrieving customer feedback: {str(e)}")
         return jsonify({'error': 'Failed to retrieve feedback'}), HTTP_500_INTERNAL_SERVER_ERROR
 
-# Admin: View all feedback
+# Admin: Feedback inbox, newest first, or most urgent first with sort=urgency
+# Filters: status (comma-separated), rating, min_rating, max_rating, since, until, customer_id, q (word search),
+# sentiment, topic, min_urgency
+# Keyset pagination: pass next_cursor back as before_id (newest) or cursor (urgency)
 @feedback_bp.route('/', methods=['GET'], strict_slashes=False)
 @jwt_required()
 def get_all_feedback():
@@ -185,26 +295,56 @@ def get_all_feedback():
         return jsonify({'error': 'Admin or superadmin access only'}), HTTP_401_UNAUTHORIZED
     
     try:
-        feedbacks = Feedback.query.all()
-        
-        if not feedbacks:
-            return jsonify({'message': 'No feedback found'}), HTTP_404_NOT_FOUND
+        filters = get_inbox_filters()
+        page_args = get_page_args(sortable=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
+    
+    try:
+        feedbacks, next_cursor = list_feedback(filters, **page_args)
         
-        return jsonify({'feedbacks': [
-            {
-                'id': fb.id,
-                'customer_id': fb.customer_id,
-                'title': fb.title,
-                'message': fb.feedback_message,
-                'rating': fb.rating,
-                'response': fb.response,
-                'status': fb.status,
-                'submitted_at': fb.created_at.strftime('%Y-%m-%d %H:%M')
-            } for fb in feedbacks
-        ]}), HTTP_200_OK
+        return jsonify({
+            'feedbacks': [
+                {
+                    'id': fb.id,
+                    'customer_id': fb.customer_id,
+                    'title': fb.title,
+                    'message': fb.feedback_message,
+                    'rating': fb.rating,
+                    'response': fb.response,
+                    'status': fb.status,
+                    'sentiment': fb.sentiment,
+                    'urgency': fb.urgency,
+                    'topics': [topic.topic for topic in fb.topics],
+                    'submitted_at': fb.created_at.strftime('%Y-%m-%d %H:%M')
+                } for fb in feedbacks
+            ],
+            'count': len(feedbacks),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        }), HTTP_200_OK
     except Exception as e:
+        current_app.logger.error(f"Error retrieving feedback: {str(e)}")
         return jsonify({'error': 'Failed to retrieve feedback'}), HTTP_500_INTERNAL_SERVER_ERROR
 
+# Admin: Rating and status counts for the feedback matching the inbox filters
+@feedback_bp.route('/stats', methods=['GET'], strict_slashes=False)
+@jwt_required()
+def get_feedback_stats():
+    if not is_admin():
+        return jsonify({'error': 'Admin or superadmin access only'}), HTTP_401_UNAUTHORIZED
+    
+    try:
+        filters = get_inbox_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
+    
+    try:
+        return jsonify(feedback_stats(filters)), HTTP_200_OK
+    except Exception as e:
+        current_app.logger.error(f"Error computing feedback stats: {str(e)}")
+        return jsonify({'error': 'Failed to compute feedback stats'}), HTTP_500_INTERNAL_SERVER_ERROR
+
 # Admin: View feedback by ID
 @feedback_bp.route('/<int:id>', methods=['GET'], strict_slashes=False)
 @jwt_required()
@@ -231,6 +371,68 @@ def get_feedback_by_id(id):
     except Exception as e:
         return jsonify({'error': 'Failed to retrieve feedback'}), HTTP_500_INTERNAL_SERVER_ERROR
 
+# Admin: Respond to many feedback at once
+# Select with "feedback_ids" and/or "filter" (the inbox filters: status, rating, min_rating, max_rating,
+# since, until, customer_id, q, sentiment, topic, min_urgency); "response" may use {customer_name},
+# {title} and {feedback_id}. Customers are emailed in one background batch unless "notify" is false.
+@feedback_bp.route('/bulk-respond', methods=['PUT'], strict_slashes=False)
+@jwt_required()
+def bulk_respond_to_feedback():
+    if not is_admin():
+        return jsonify({'error': 'Admin or superadmin access only'}), HTTP_401_UNAUTHORIZED
+    
+    data = request.get_json(silent=True) or {}
+    response = data.get('response')
+    status = data.get('status', 'reviewed')
+    feedback_ids = data.get('feedback_ids')
+    filters = data.get('filter')
+    
+    if not response or not isinstance(response, str):
+        return jsonify({'error': 'Response is required'}), HTTP_400_BAD_REQUEST
+    if not isinstance(status, str) or not status.strip():
+        return jsonify({'error': 'status must be a non-empty string'}), HTTP_400_BAD_REQUEST
+    if feedback_ids is None and not filters:
+        return jsonify({'error': 'Provide feedback_ids and/or filter'}), HTTP_400_BAD_REQUEST
+    if feedback_ids is not None and (
+        not isinstance(feedback_ids, list)
+        or not all(isinstance(i, int) and not isinstance(i, bool) for i in feedback_ids)
+    ):
+        return jsonify({'error': 'feedback_ids must be a list of integers'}), HTTP_400_BAD_REQUEST
+    if filters is not None and not isinstance(filters, dict):
+        return jsonify({'error': 'filter must be an object'}), HTTP_400_BAD_REQUEST
+    
+    if filters is not None:
+        try:
+            filters = get_bulk_filters(filters)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
+    
+    dry_run = bool(data.get('dry_run', False))
+    notify = bool(data.get('notify', True))
+    max_feedback = current_app.config.get('FEEDBACK_BULK_LIMIT', 5000)
+    
+    try:
+        selection = select_feedback(feedback_ids, filters)
+        matched = selection.count()
+        if matched > max_feedback:
+            return jsonify({
+                'error': f'Selection matches {matched} feedback; at most {max_feedback} can be updated at once'
+            }), HTTP_400_BAD_REQUEST
+        
+        report = bulk_respond(selection, response, status=status.strip(), dry_run=dry_run, notify=notify)
+        if dry_run:
+            return jsonify(report), HTTP_200_OK
+        db.session.commit()
+        
+        if notify and report['feedback_ids']:
+            background_tasks.submit(send_response_emails, report['feedback_ids'])
+        report['notifications_queued'] = notify and bool(report['feedback_ids'])
+        return jsonify(report), HTTP_200_OK
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Bulk feedback response error: {str(e)}")
+        return jsonify({'error': 'Failed to update feedback'}), HTTP_500_INTERNAL_SERVER_ERROR
+
 # Admin: Respond to feedback
 @feedback_bp.route('/<int:id>/respond', methods=['PUT'], strict_slashes=False)
 @jwt_required()
@@ -252,6 +454,8 @@ def respond_to_feedback(id):
             return jsonify({'error': 'Response is required'}), HTTP_400_BAD_REQUEST
         
         fb.response = response
+        # This route does not email the customer, so no notification is owed
+        fb.response_notified_at = datetime.utcnow()
         fb.status = status
         fb.updated_at = datetime.utcnow()
         db.session.commit()
@@ -0,0 +1,128 @@
+from flask import Blueprint, jsonify, current_app
+from app.extensions import db
+from sqlalchemy import text
+from datetime import datetime
+import os
+import socket
+import tempfile
+import threading
+import time
+
+health_bp = Blueprint('health', __name__)
+
+# Probe results cached per worker process: {name: (checked_at, result)}
+_probe_cache = {}
+_probe_lock = threading.Lock()
+_started_at = datetime.utcnow()
+
+def check_database():
+    """Run a trivial query against the database"""
+    db.session.execute(text('SELECT 1'))
+    return {'status': 'up'}
+
+def check_upload_dir():
+    """Verify the upload folder (UPLOAD_FOLDER) exists and is writable"""
+    upload_folder = current_app.config.get('UPLOAD_FOLDER') or os.path.join(current_app.root_path, 'static', 'uploads')
+    with tempfile.NamedTemporaryFile(dir=upload_folder, prefix='.health-'):
+        pass
+    return {'status': 'up', 'path': upload_folder}
+
+def check_smtp():
+    """Open (and immediately close) a TCP connection to the mail server"""
+    host = current_app.config.get('MAIL_SERVER')
+    port = current_app.config.get('MAIL_PORT')
+    timeout = current_app.config.get('HEALTH_SMTP_TIMEOUT', 2)
+    with socket.create_connection((host, port), timeout=timeout):
+        pass
+    return {'status': 'up', 'server': f'{host}:{port}'}
+
+def run_probe(name, probe):
+    """Run a probe, reusing its result while it is younger than HEALTH_CHECK_TTL seconds"""
+    ttl = current_app.config.get('HEALTH_CHECK_TTL', 10)
+    now = time.monotonic()
+
+    cached = _probe_cache.get(name)
+    if cached and now - cached[0] < ttl:
+        return cached[1]
+
+    with _probe_lock:
+        # Another thread may have refreshed the probe while we waited
+        cached = _probe_cache.get(name)
+        if cached and now - cached[0] < ttl:
+            return cached[1]
+
+        started = time.perf_counter()
+        try:
+            result = probe()
+        except Exception as e:
+            current_app.logger.error(f"Health probe {name} failed: {str(e)}")
+            result = {'status': 'down', 'error': str(e)}
+        result['latency_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        result['checked_at'] = datetime.utcnow().isoformat()
+
+        _probe_cache[name] = (time.monotonic(), result)
+        return result
+
+def get_pool_stats():
+    """Connection pool usage; read from the pool directly, so it is always current"""
+    pool = db.engine.pool
+    if not hasattr(pool, 'checkedout') or not hasattr(pool, 'size'):
+        return {'status': 'up', 'pool': type(pool).__name__}
+
+    size = pool.size()
+    checked_out = pool.checkedout()
+    capacity = size + max(getattr(pool, '_max_overflow', 0), 0)
+    saturation = checked_out / capacity if capacity else 0.0
+    threshold = current_app.config.get('HEALTH_POOL_SATURATION_THRESHOLD', 0.9)
+
+    return {
+        'status': 'saturated' if saturation >= threshold else 'up',
+        'pool': type(pool).__name__,
+        'size': size,
+        'checked_out': checked_out,
+        'overflow': pool.overflow(),
+        'capacity': capacity,
+        'saturation': round(saturation, 3)
+    }
+
+# Liveness: the process is up and able to serve requests. Never touches dependencies.
+@health_bp.route('/health/live', methods=['GET'])
+def liveness():
+    return jsonify({
+        'status': 'alive',
+        'pid': os.getpid(),
+        'uptime_seconds': int((datetime.utcnow() - _started_at).total_seconds())
+    }), 200
+
+# Readiness: dependencies are reachable. Probe results are cached for HEALTH_CHECK_TTL seconds.
+@health_bp.route('/health/ready', methods=['GET'])
+def readiness():
+    checks = {
+        'database': run_probe('database', check_database),
+        'uploads': run_probe('uploads', check_upload_dir)
+    }
+    if current_app.config.get('HEALTH_CHECK_SMTP', True):
+        checks['smtp'] = run_probe('smtp', check_smtp)
+    checks['pool'] = get_pool_stats()
+
+    # Mail and pool pressure degrade the service; database or disk failures make it unready
+    critical_down = any(checks[name]['status'] == 'down' for name in ('database', 'uploads'))
+    degraded = any(check['status'] != 'up' for check in checks.values())
+
+    if critical_down:
+        status, code = 'unhealthy', 503
+    elif degraded:
+        status, code = 'degraded', 200
+    else:
+        status, code = 'healthy', 200
+
+    return jsonify({
+        'status': status,
+        'database': 'connected' if checks['database']['status'] == 'up' else 'disconnected',
+        'checks': checks
+    }), code
+
+# Kept for existing load balancer configuration
+@health_bp.route('/health', methods=['GET'])
+def health_check():
+    return readiness()
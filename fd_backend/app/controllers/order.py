@@ -1,12 +1,17 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app.models.order import Order, OrderItem
 from app.models.customer import Customer
 from app.models.product import Product
-from app.extensions import db
+from app.extensions import db, metrics
+from app.inventory import sell, order_reference, InsufficientStockError
+from app.orders import (
+    CANCELLED, PENDING, ORDER_STATUSES, normalize_status, allowed_transitions, record_status,
+    record_order_placed, transition_order, bulk_transition, InvalidTransitionError, StaleOrderError
+)
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.status_codes import (
     HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST,
-    HTTP_404_NOT_FOUND, HTTP_401_UNAUTHORIZED, HTTP_500_INTERNAL_SERVER_ERROR
+    HTTP_404_NOT_FOUND, HTTP_401_UNAUTHORIZED, HTTP_409_CONFLICT, HTTP_500_INTERNAL_SERVER_ERROR
 )
 
 order_bp = Blueprint('order', __name__, url_prefix='/api/v1/orders')
@@ -121,46 +126,60 @@ def create_order():
     if customer_id is None:
         return jsonify({'error': 'Customer ID not found in token'}), HTTP_401_UNAUTHORIZED
     
-    data = request.get_json()
-    if not data or 'items' not in data or not data['items']:
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get('items'):
         return jsonify({'error': 'Order items are required'}), HTTP_400_BAD_REQUEST
+    if not isinstance(data['items'], list) or not all(isinstance(item, dict) for item in data['items']):
+        return jsonify({'error': 'items must be a list of {product_id, quantity} objects'}), HTTP_400_BAD_REQUEST
+    
+    # Sum quantities per product so each product is checked and sold once
+    quantities = {}
+    for item in data['items']:
+        product_id = item.get('product_id')
+        if not isinstance(product_id, int) or isinstance(product_id, bool):
+            return jsonify({'error': 'product_id must be an integer'}), HTTP_400_BAD_REQUEST
+        quantity = item.get('quantity', 1)
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+            return jsonify({'error': 'Quantity must be a positive integer'}), HTTP_400_BAD_REQUEST
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
     
     try:
-        total_amount = 0.0
-        order_items = []
-        
-        for item in data['items']:
-            product_id = item.get('product_id')
-            quantity = item.get('quantity', 1)
-            
-            product = Product.query.get(product_id)
-            if not product:
+        existing_ids = {row.id for row in db.session.query(Product.id).filter(Product.id.in_(list(quantities))).all()}
+        for product_id in quantities:
+            if product_id not in existing_ids:
                 return jsonify({'error': f'Product with id {product_id} not found'}), HTTP_404_NOT_FOUND
-            
-            item_price = product.price * quantity
-            total_amount += item_price
-            
-            order_item = OrderItem(
-                product_id=product.id,
-                quantity=quantity,
-                price=product.price
-            )
-            order_items.append(order_item)
         
         new_order = Order(
             customer_id=customer_id,
-            total_amount=total_amount,
+            total_amount=0.0,
             status='Pending'
         )
         
         db.session.add(new_order)
         db.session.flush()
         
-        for oi in order_items:
-            oi.order_id = new_order.id
-            db.session.add(oi)
+        # Lock the products and take the stock; fails without side effects if any line is short
+        products = {product.id: product for product in sell(quantities, reference=order_reference(new_order.id))}
+        
+        total_amount = 0.0
+        for product_id, quantity in quantities.items():
+            product = products[product_id]
+            
+            item_price = product.price * quantity
+            total_amount += item_price
+            
+            db.session.add(OrderItem(
+                order_id=new_order.id,
+                product_id=product.id,
+                quantity=quantity,
+                price=product.price
+            ))
+        new_order.total_amount = total_amount
+        record_status(new_order.id, None, PENDING, 1, changed_by=f'customer:{customer_id}')
+        record_order_placed(new_order)
         
         db.session.commit()
+        metrics.checkouts_total.inc(source='order')
         
         return jsonify({
             'message': 'Order placed successfully, pending commitment fee confirmation',
@@ -168,9 +187,12 @@ def create_order():
             'total_amount': total_amount,
             'status': new_order.status
         }), HTTP_201_CREATED
+    except InsufficientStockError as e:
+        db.session.rollback()
+        return jsonify({'error': 'Insufficient stock', 'shortages': e.to_dict()}), HTTP_409_CONFLICT
     except Exception as e:
         db.session.rollback()
-        print("Order creation error:", str(e))
+        current_app.logger.error(f"Order creation error: {str(e)}")
         return jsonify({'error': 'Failed to place order'}), HTTP_500_INTERNAL_SERVER_ERROR
 
 # Get orders for the logged-in user (customers see their orders, admins see all)
@@ -204,6 +226,7 @@ def get_orders():
                 'order_date': order.order_date.isoformat(),
                 'total_amount': order.total_amount,
                 'status': order.status,
+                'version': order.version,
                 'items': items
             })
         
@@ -212,6 +235,7 @@ def get_orders():
         return jsonify({'error': 'Failed to retrieve orders'}), HTTP_500_INTERNAL_SERVER_ERROR
 
 # Update order status (admin only, e.g., to mark delivered)
+# Pass "version" from a previous read to fail with 409 if the order changed since
 @order_bp.route('/<int:order_id>/status', methods=['PATCH'])
 @jwt_required()
 def update_order_status(order_id):
@@ -227,21 +251,113 @@ def update_order_status(order_id):
         if not data or 'status' not in data:
             return jsonify({'error': 'Status field is required'}), HTTP_400_BAD_REQUEST
         
-        old_status = order.status
-        order.status = data['status']
+        new_status = normalize_status(data['status'])
+        if not new_status:
+            return jsonify({
+                'error': 'Invalid status',
+                'valid_statuses': list(ORDER_STATUSES)
+            }), HTTP_400_BAD_REQUEST
+        
+        expected_version = data.get('version')
+        if expected_version is not None and (not isinstance(expected_version, int) or isinstance(expected_version, bool)):
+            return jsonify({'error': 'version must be an integer'}), HTTP_400_BAD_REQUEST
         
+        old_status = transition_order(
+            order, new_status,
+            changed_by=f'admin:{get_jwt_identity()}',
+            note=data.get('note'),
+            expected_version=expected_version
+        )
         db.session.commit()
         return jsonify({
             'message': 'Order status updated successfully',
             'order_id': order_id,
             'old_status': old_status,
-            'new_status': order.status
+            'new_status': order.status,
+            'version': order.version
         }), HTTP_200_OK
+    except InvalidTransitionError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), **e.to_dict()}), HTTP_409_CONFLICT
+    except StaleOrderError as e:
+        db.session.rollback()
+        return jsonify({'error': 'Order was modified by someone else; reload and retry', **e.to_dict()}), HTTP_409_CONFLICT
     except Exception as e:
         db.session.rollback()
-        print("Order status update error:", str(e))
+        current_app.logger.error(f"Order status update error: {str(e)}")
         return jsonify({'error': 'Failed to update order status'}), HTTP_500_INTERNAL_SERVER_ERROR
 
+# Move many orders to one status in a single request (admin only)
+@order_bp.route('/status', methods=['PATCH'])
+@jwt_required()
+def bulk_update_order_status():
+    if not is_admin():
+        return jsonify({'error': 'Admin access required'}), HTTP_401_UNAUTHORIZED
+    
+    data = request.get_json()
+    if not data or 'status' not in data or not data.get('order_ids'):
+        return jsonify({'error': 'order_ids and status are required'}), HTTP_400_BAD_REQUEST
+    
+    new_status = normalize_status(data['status'])
+    if not new_status:
+        return jsonify({
+            'error': 'Invalid status',
+            'valid_statuses': list(ORDER_STATUSES)
+        }), HTTP_400_BAD_REQUEST
+    
+    order_ids = data['order_ids']
+    max_orders = current_app.config.get('ORDER_BULK_STATUS_LIMIT', 1000)
+    if not isinstance(order_ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in order_ids):
+        return jsonify({'error': 'order_ids must be a list of integers'}), HTTP_400_BAD_REQUEST
+    if len(order_ids) > max_orders:
+        return jsonify({'error': f'At most {max_orders} orders can be updated at once'}), HTTP_400_BAD_REQUEST
+    
+    try:
+        updated, skipped, missing = bulk_transition(
+            order_ids, new_status,
+            changed_by=f'admin:{get_jwt_identity()}',
+            note=data.get('note')
+        )
+        db.session.commit()
+        return jsonify({
+            'message': f'{len(updated)} orders updated to {new_status}',
+            'status': new_status,
+            'updated': updated,
+            'skipped': skipped,
+            'not_found': missing
+        }), HTTP_200_OK
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Bulk order status update error: {str(e)}")
+        return jsonify({'error': 'Failed to update order statuses'}), HTTP_500_INTERNAL_SERVER_ERROR
+
+# Status history of an order
+@order_bp.route('/<int:order_id>/history', methods=['GET'])
+@jwt_required()
+def get_order_history(order_id):
+    try:
+        order = Order.query.get(order_id)
+        if not order:
+            return jsonify({'error': 'Order not found'}), HTTP_404_NOT_FOUND
+        
+        if is_admin():
+            pass  # Admin can access any order
+        elif is_customer():
+            if get_customer_id() != order.customer_id:
+                return jsonify({'error': 'Unauthorized to access this order'}), HTTP_401_UNAUTHORIZED
+        else:
+            return jsonify({'error': 'Unauthorized access'}), HTTP_401_UNAUTHORIZED
+        
+        return jsonify({
+            'order_id': order.id,
+            'status': order.status,
+            'version': order.version,
+            'history': [entry.to_dict() for entry in order.status_history]
+        }), HTTP_200_OK
+    except Exception as e:
+        current_app.logger.error(f"Order history error: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve order history'}), HTTP_500_INTERNAL_SERVER_ERROR
+
 # Get a single order by ID
 @order_bp.route('/<int:order_id>', methods=['GET'])
 @jwt_required()
@@ -274,6 +390,8 @@ def get_order(order_id):
                 'order_date': order.order_date.isoformat(),
                 'total_amount': order.total_amount,
                 'status': order.status,
+                'version': order.version,
+                'allowed_transitions': list(allowed_transitions(order.status)),
                 'items': items
             }
         }), HTTP_200_OK
@@ -301,10 +419,11 @@ def cancel_order(order_id):
             return jsonify({'error': 'Unauthorized to cancel this order'}), HTTP_401_UNAUTHORIZED
         
         # Check if order can be cancelled (only if status is 'Pending')
-        if order.status.lower() != 'pending':
+        if normalize_status(order.status) != PENDING:
             return jsonify({'error': 'Order can only be cancelled if status is Pending'}), HTTP_400_BAD_REQUEST
         
-        order.status = 'Cancelled'
+        # Fails if an admin moved the order on since it was read; stock is returned on success
+        transition_order(order, CANCELLED, changed_by=f'customer:{customer_id}')
         db.session.commit()
         
         return jsonify({
@@ -312,7 +431,10 @@ def cancel_order(order_id):
             'order_id': order_id,
             'status': order.status
         }), HTTP_200_OK
+    except StaleOrderError as e:
+        db.session.rollback()
+        return jsonify({'error': 'Order was modified; it can no longer be cancelled', **e.to_dict()}), HTTP_409_CONFLICT
     except Exception as e:
         db.session.rollback()
-        print("Order cancellation error:", str(e))
+        current_app.logger.error(f"Order cancellation error: {str(e)}")
         return jsonify({'error': 'Failed to cancel order'}), HTTP_500_INTERNAL_SERVER_ERROR
\ No newline at end of file
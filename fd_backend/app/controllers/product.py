@@ -1,13 +1,26 @@
-from flask import Blueprint, request, jsonify, current_app, send_from_directory
-from app.models.product import Product
+from flask import Blueprint, request, jsonify, current_app, send_from_directory, Response, stream_with_context
+from app.models.product import Product, ProductVariant
 from app.models.content import BestSeller
-from app.extensions import db
+from app.extensions import db, cache
+from app.cache import PRODUCTS, CATEGORIES
+from app.suggest import sync_suggestions
+from app.categories import sync_product_categories, refresh_category_counts, find_category, subtree_ids
+from app.models.inventory import StockMovement, LowStockProduct
+from app.catalog import (
+    import_products, parse_csv, parse_ndjson, export_csv, export_ndjson, select_products, bulk_update_products,
+    listing_query, refresh_price_range, browse_products, price_buckets, featured_products, PRODUCT_SORTS
+)
+from app.inventory import (
+    apply_movements, set_stock, sync_low_stock, get_low_stock_threshold, InsufficientStockError
+)
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from app.status_codes import (
     HTTP_200_OK, HTTP_201_CREATED, HTTP_400_BAD_REQUEST,
-    HTTP_404_NOT_FOUND, HTTP_401_UNAUTHORIZED, HTTP_500_INTERNAL_SERVER_ERROR
+    HTTP_404_NOT_FOUND, HTTP_401_UNAUTHORIZED, HTTP_409_CONFLICT, HTTP_500_INTERNAL_SERVER_ERROR
 )
+import csv
 import os
+from datetime import datetime
 from werkzeug.utils import secure_filename
 
 from PIL import Image # Pillow is a popular image processing library. It is a fork of the original PIL (Python Imaging Library).
@@ -201,15 +214,80 @@ def get_public_products():
         return '', 200
         
     try:
-        products = Product.query.filter_by(is_active=True).all()
+        min_price = request.args.get('min_price', type=float)
+        max_price = request.args.get('max_price', type=float)
+        sort = request.args.get('sort')
+        if sort and sort not in PRODUCT_SORTS:
+            return jsonify({'error': f"sort must be one of: {', '.join(PRODUCT_SORTS)}"}), HTTP_400_BAD_REQUEST
+        
+        def load():
+            query = Product.query.filter_by(is_active=True)
+            # A product matches when any of its variants is priced inside the range
+            if min_price is not None:
+                query = query.filter(Product.max_price >= min_price)
+            if max_price is not None:
+                query = query.filter(Product.min_price <= max_price)
+            if sort:
+                query = query.order_by(*PRODUCT_SORTS[sort])
+            products = listing_query(query).all()
+            return [product.to_dict(include_variants=True) for product in products]
+        
+        products = cache.get_or_set(PRODUCTS, f'public:{min_price}:{max_price}:{sort}', load,
+                                    ttl=current_app.config.get('CACHE_PRODUCTS_TTL'))
         return jsonify({
-            'products': [product.to_dict() for product in products],
+            'products': products,
             'count': len(products)
         }), HTTP_200_OK
     except Exception as e:
         current_app.logger.error(f"Error retrieving products: {str(e)}")
         return jsonify({'error': 'Failed to retrieve products'}), HTTP_500_INTERNAL_SERVER_ERROR
 
+@product_bp.route('/browse', methods=['GET', 'OPTIONS'])
+def browse_catalog():
+    """
+    Browse active products with facet counts.
+    Filters: category (slugs or names, comma-separated), price (bucket keys
+    such as 5-10, comma-separated), featured, in_stock. Also sort, page, per_page.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    try:
+        filters = {}
+        
+        if request.args.get('category'):
+            category_ids = set()
+            for value in request.args['category'].split(','):
+                category = find_category(value)
+                if not category:
+                    return jsonify({'error': f'Unknown category: {value}'}), HTTP_400_BAD_REQUEST
+                category_ids.update(subtree_ids(category))
+            filters['category'] = category_ids
+        
+        if request.args.get('price'):
+            keys = [key for key, _, _ in price_buckets()]
+            selected = {value.strip() for value in request.args['price'].split(',') if value.strip()}
+            if selected - set(keys):
+                return jsonify({'error': f"price must be among: {', '.join(keys)}"}), HTTP_400_BAD_REQUEST
+            filters['price'] = selected
+        
+        for field in ('featured', 'in_stock'):
+            if request.args.get(field) is not None:
+                filters[field] = parse_boolean(request.args[field])
+        
+        sort = request.args.get('sort')
+        if sort and sort not in PRODUCT_SORTS:
+            return jsonify({'error': f"sort must be one of: {', '.join(PRODUCT_SORTS)}"}), HTTP_400_BAD_REQUEST
+        
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = request.args.get('per_page', 24, type=int)
+        per_page = max(1, min(per_page, current_app.config.get('BROWSE_MAX_PER_PAGE', 100)))
+        
+        return jsonify(browse_products(filters, sort=sort, page=page, per_page=per_page)), HTTP_200_OK
+    except Exception as e:
+        current_app.logger.error(f"Error browsing products: {str(e)}")
+        return jsonify({'error': 'Failed to browse products'}), HTTP_500_INTERNAL_SERVER_ERROR
+
 @product_bp.route('', methods=['GET', 'OPTIONS'])
 @jwt_required()
 def get_all_products():
@@ -220,9 +298,9 @@ def get_all_products():
         return '', 200
         
     try:
-        products = Product.query.all()
+        products = listing_query().all()
         return jsonify({
-            'products': [product.to_dict() for product in products],
+            'products': [product.to_dict(include_variants=True) for product in products],
             'count': len(products)
         }), HTTP_200_OK
     except Exception as e:
@@ -238,13 +316,18 @@ def get_product(product_id):
         return '', 200
         
     try:
-        product = Product.query.get(product_id)
+        def load():
+            product = listing_query().filter(Product.id == product_id).first()
+            return product.to_dict(include_variants=True) if product else None
+        
+        product = cache.get_or_set(PRODUCTS, f'product:{product_id}', load,
+                                   ttl=current_app.config.get('CACHE_PRODUCTS_TTL'))
         
         if not product:
             return jsonify({'error': 'Product not found'}), HTTP_404_NOT_FOUND
         
         return jsonify({
-            'product': product.to_dict()
+            'product': product
         }), HTTP_200_OK
     except Exception as e:
         current_app.logger.error(f"Error retrieving product: {str(e)}")
@@ -274,6 +357,7 @@ def create_product():
         description = request.form.get('description')
         price = float(request.form['price'])
         category = request.form['category']
+        sku = (request.form.get('sku') or '').strip() or None
         stock_quantity = int(request.form.get('stock_quantity', 0))
         is_active = parse_boolean(request.form.get('is_active', 'True'))
         is_featured = parse_boolean(request.form.get('is_featured', 'False'))
@@ -288,23 +372,34 @@ def create_product():
         if stock_quantity < 0:
             return jsonify({'error': 'Stock quantity cannot be negative'}), HTTP_400_BAD_REQUEST
         
+        if sku and Product.query.filter_by(sku=sku).first():
+            return jsonify({'error': f'A product with SKU {sku} already exists'}), HTTP_409_CONFLICT
+        
         # Handle file upload
         file = request.files.get('image')
         image_url = handle_file_upload(file)
         
         # Create new Product object
         new_product = Product(
+            sku=sku,
             name=name,
             description=description,
             price=price,
             category=category,
-            stock_quantity=stock_quantity,
+            stock_quantity=0,
             image_url=image_url,
             is_active=is_active,
             is_featured=is_featured
         )
         
         db.session.add(new_product)
+        db.session.flush()  # Get product ID
+        
+        # Initial stock enters through the ledger as a receipt
+        apply_movements(StockMovement.RECEIPT, {new_product.id: stock_quantity},
+                        note='Initial stock', created_by=f'admin:{get_jwt_identity()}')
+        refresh_price_range([new_product.id])
+        sync_product_categories([new_product.id])
         db.session.commit()
         
         # If marked as best seller, create BestSeller entry
@@ -318,6 +413,8 @@ def create_product():
             db.session.add(best_seller)
             db.session.commit()
         
+        cache.invalidate(PRODUCTS, CATEGORIES)
+        
         return jsonify({
             'message': 'Product added successfully',
             'product': new_product.to_dict()
@@ -355,6 +452,7 @@ def update_product(product_id):
             description = data.get('description', product.description)
             price = data.get('price', product.price)
             category = data.get('category', product.category)
+            sku = data.get('sku', product.sku)
             stock_quantity = data.get('stock_quantity', product.stock_quantity)
             image_url = data.get('image_url', product.image_url)
             is_active = parse_boolean(data.get('is_active', product.is_active))
@@ -364,6 +462,7 @@ def update_product(product_id):
             description = request.form.get('description', product.description)
             price = request.form.get('price', product.price)
             category = request.form.get('category', product.category)
+            sku = request.form.get('sku', product.sku)
             stock_quantity = request.form.get('stock_quantity', product.stock_quantity)
             image_url = request.form.get('image_url', product.image_url)
             is_active = parse_boolean(request.form.get('is_active', product.is_active))
@@ -381,16 +480,32 @@ def update_product(product_id):
         except (ValueError, TypeError):
             return jsonify({'error': 'Invalid price or stock quantity'}), HTTP_400_BAD_REQUEST
         
+        if stock_quantity < 0:
+            return jsonify({'error': 'Stock quantity cannot be negative'}), HTTP_400_BAD_REQUEST
+        
+        sku = (sku or '').strip() or None
+        if sku and sku != product.sku and Product.query.filter(Product.sku == sku, Product.id != product.id).first():
+            return jsonify({'error': f'A product with SKU {sku} already exists'}), HTTP_409_CONFLICT
+        
         # Update product attributes
+        product.sku = sku
         product.name = name
         product.description = description
         product.price = price
         product.category = category
-        product.stock_quantity = stock_quantity
         product.image_url = image_url
         product.is_active = is_active
         product.is_featured = is_featured
         
+        # Stock changes go through the ledger as an adjustment
+        if stock_quantity != product.stock_quantity:
+            set_stock(product.id, stock_quantity, note='Product edit', created_by=f'admin:{get_jwt_identity()}')
+        else:
+            sync_low_stock([product.id])
+        
+        db.session.flush()
+        refresh_price_range([product.id])
+        sync_product_categories([product.id])
         db.session.commit()
         
         # Update BestSeller entry if needed
@@ -411,6 +526,8 @@ def update_product(product_id):
             
             db.session.commit()
         
+        cache.invalidate(PRODUCTS, CATEGORIES)
+        
         return jsonify({
             'message': 'Product updated successfully',
             'product': product.to_dict()
@@ -450,9 +567,14 @@ def delete_product(product_id):
         if best_seller:
             db.session.delete(best_seller)
         
+        category_id = product.category_id
         db.session.delete(product)
+        db.session.flush()
+        refresh_category_counts([category_id])
         db.session.commit()
         
+        cache.invalidate(PRODUCTS, CATEGORIES)
+        
         return jsonify({
             'message': 'Product deleted successfully',
             'product_id': product_id
@@ -477,15 +599,15 @@ def search_products():
             return jsonify({'error': 'Search query is required'}), HTTP_400_BAD_REQUEST
         
         # Search in name and category (case-insensitive)
-        products = Product.query.filter(
+        products = listing_query(Product.query.filter(
             db.or_(
                 Product.name.ilike(f'%{query}%'),
                 Product.category.ilike(f'%{query}%')
             )
-        ).all()
+        )).all()
         
         return jsonify({
-            'products': [product.to_dict() for product in products],
+            'products': [product.to_dict(include_variants=True) for product in products],
             'count': len(products),
             'query': query
         }), HTTP_200_OK
@@ -493,6 +615,30 @@ def search_products():
         current_app.logger.error(f"Error searching products: {str(e)}")
         return jsonify({'error': 'Failed to search products'}), HTTP_500_INTERNAL_SERVER_ERROR
 
+@product_bp.route('/suggest', methods=['GET', 'OPTIONS'])
+def suggest_products():
+    """
+    Typeahead suggestions for the search box: ids and names of active
+    products with words starting with the words of ?q=, at most ?limit= (10).
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    try:
+        query = request.args.get('q', '')
+        limit = max(1, min(request.args.get('limit', 10, type=int), 20))
+        
+        suggestions = sync_suggestions().search(query, limit=limit)
+        
+        return jsonify({
+            'suggestions': suggestions,
+            'count': len(suggestions),
+            'query': query
+        }), HTTP_200_OK
+    except Exception as e:
+        current_app.logger.error(f"Error suggesting products: {str(e)}")
+        return jsonify({'error': 'Failed to suggest products'}), HTTP_500_INTERNAL_SERVER_ERROR
+
 @product_bp.route('/category/<category_name>', methods=['GET', 'OPTIONS'])
 def get_products_by_category(category_name):
     """
@@ -502,13 +648,24 @@ def get_products_by_category(category_name):
         return '', 200
         
     try:
-        # Get products by category (case-insensitive)
-        products = Product.query.filter(
-            Product.category.ilike(category_name)
-        ).all()
+        # Accepts a slug or a name; subcategories are included
+        category = find_category(category_name)
+        if not category:
+            products = []
+        else:
+            category_ids = subtree_ids(category)
+            
+            def load():
+                products = listing_query(Product.query.filter(
+                    Product.category_id.in_(category_ids)
+                )).all()
+                return [product.to_dict(include_variants=True) for product in products]
+            
+            products = cache.get_or_set(PRODUCTS, f"category:{category['id']}", load,
+                                        ttl=current_app.config.get('CACHE_PRODUCTS_TTL'))
         
         return jsonify({
-            'products': [product.to_dict() for product in products],
+            'products': products,
             'category': category_name,
             'count': len(products)
         }), HTTP_200_OK
@@ -520,7 +677,9 @@ def get_products_by_category(category_name):
 @jwt_required()
 def update_product_stock(product_id):
     """
-    Update the stock quantity of a product.
+    Update the stock quantity of a product, either to an absolute
+    stock_quantity or by a relative delta. Every change is recorded
+    in the stock ledger.
     """
     if request.method == 'OPTIONS':
         return '', 200
@@ -539,38 +698,407 @@ def update_product_stock(product_id):
         
         data = request.get_json()
         stock_quantity = data.get('stock_quantity')
+        delta = data.get('delta')
+        note = data.get('note')
+        created_by = f'admin:{get_jwt_identity()}'
+        
+        if stock_quantity is None and delta is None:
+            return jsonify({'error': 'stock_quantity or delta is required'}), HTTP_400_BAD_REQUEST
+        
+        if delta is not None:
+            # Relative change, e.g. a delivery or a write-off; safe under concurrent edits
+            try:
+                delta = int(delta)
+            except (ValueError, TypeError):
+                return jsonify({'error': 'delta must be a valid integer'}), HTTP_400_BAD_REQUEST
+            
+            movement_type = data.get('movement_type', StockMovement.RECEIPT if delta > 0 else StockMovement.ADJUSTMENT)
+            if movement_type not in (StockMovement.RECEIPT, StockMovement.ADJUSTMENT):
+                return jsonify({'error': 'movement_type must be receipt or adjustment'}), HTTP_400_BAD_REQUEST
+            
+            apply_movements(movement_type, {product_id: delta}, note=note, created_by=created_by)
+            db.session.commit()
+            db.session.refresh(product)
+            new_quantity = product.stock_quantity
+            old_quantity = new_quantity - delta
+        else:
+            # Ensure stock_quantity is a non-negative integer
+            try:
+                stock_quantity = int(stock_quantity)
+                if stock_quantity < 0:
+                    return jsonify({'error': 'stock_quantity must be non-negative'}), HTTP_400_BAD_REQUEST
+            except (ValueError, TypeError):
+                return jsonify({'error': 'stock_quantity must be a valid integer'}), HTTP_400_BAD_REQUEST
+            
+            # Recorded as an adjustment of the difference, computed under a row lock
+            old_quantity, new_quantity = set_stock(product_id, stock_quantity, note=note, created_by=created_by)
+            db.session.commit()
         
-        if stock_quantity is None:
-            return jsonify({'error': 'stock_quantity is required'}), HTTP_400_BAD_REQUEST
-        
-        # Ensure stock_quantity is a non-negative integer
-        try:
-            stock_quantity = int(stock_quantity)
-            if stock_quantity < 0:
-                return jsonify({'error': 'stock_quantity must be non-negative'}), HTTP_400_BAD_REQUEST
-        except (ValueError, TypeError):
-            return jsonify({'error': 'stock_quantity must be a valid integer'}), HTTP_400_BAD_REQUEST
-        
-        old_quantity = product.stock_quantity
-        product.stock_quantity = stock_quantity
-        db.session.commit()
+        cache.invalidate(PRODUCTS)
         
         return jsonify({
             'message': 'Stock updated successfully',
             'product_id': product_id,
             'old_quantity': old_quantity,
-            'new_quantity': stock_quantity
+            'new_quantity': new_quantity
         }), HTTP_200_OK
+    except InsufficientStockError as e:
+        db.session.rollback()
+        return jsonify({'error': 'Stock cannot go below zero', 'shortages': e.to_dict()}), HTTP_409_CONFLICT
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error updating product stock: {str(e)}")
         return jsonify({'error': 'Failed to update product stock'}), HTTP_500_INTERNAL_SERVER_ERROR
 
+@product_bp.route('/<int:product_id>/stock/movements', methods=['GET', 'OPTIONS'])
+@jwt_required()
+def get_stock_movements(product_id):
+    """
+    Get the stock ledger of a product, newest first.
+    Paginate with ?limit= and ?before_id= (the id of the last movement seen).
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    if not is_admin():
+        return jsonify({'error': 'Admin access required'}), HTTP_401_UNAUTHORIZED
+    
+    try:
+        product = Product.query.get(product_id)
+        if not product:
+            return jsonify({'error': 'Product not found'}), HTTP_404_NOT_FOUND
+        
+        limit = min(request.args.get('limit', 50, type=int), 200)
+        before_id = request.args.get('before_id', type=int)
+        
+        query = StockMovement.query.filter(StockMovement.product_id == product_id)
+        if before_id:
+            query = query.filter(StockMovement.id < before_id)
+        movements = query.order_by(StockMovement.id.desc()).limit(limit).all()
+        
+        return jsonify({
+            'product_id': product_id,
+            'stock_quantity': product.stock_quantity,
+            'movements': [movement.to_dict() for movement in movements],
+            'next_before_id': movements[-1].id if len(movements) == limit else None
+        }), HTTP_200_OK
+    except Exception as e:
+        current_app.logger.error(f"Error retrieving stock movements: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve stock movements'}), HTTP_500_INTERNAL_SERVER_ERROR
+
+def parse_variant_data(data, variant=None):
+    """
+    Validate variant fields from a JSON body; fields missing on update keep
+    their current values. Returns (values, error).
+    """
+    values = {}
+    for field in ('sku', 'name'):
+        if field in data or variant is None:
+            value = str(data.get(field) or '').strip()
+            if not value:
+                return None, f'{field} is required'
+            if len(value) > (64 if field == 'sku' else 100):
+                return None, f'{field} is too long'
+            values[field] = value
+    try:
+        if 'price' in data or variant is None:
+            values['price'] = float(data.get('price'))
+            if values['price'] <= 0:
+                return None, 'Price must be greater than 0'
+        if 'stock_quantity' in data:
+            values['stock_quantity'] = int(data['stock_quantity'])
+            if values['stock_quantity'] < 0:
+                return None, 'Stock quantity cannot be negative'
+        if 'sort_order' in data:
+            values['sort_order'] = int(data['sort_order'])
+    except (TypeError, ValueError):
+        return None, 'Invalid price, stock quantity or sort order'
+    if 'is_active' in data:
+        values['is_active'] = parse_boolean(data['is_active'])
+    return values, None
+
+@product_bp.route('/<int:product_id>/variants', methods=['GET', 'OPTIONS'])
+def get_product_variants(product_id):
+    """
+    Get the sizes/packs of a product.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    try:
+        def load():
+            product = listing_query().filter(Product.id == product_id).first()
+            return product.to_dict(include_variants=True) if product else None
+        
+        product = cache.get_or_set(PRODUCTS, f'product:{product_id}', load,
+                                   ttl=current_app.config.get('CACHE_PRODUCTS_TTL'))
+        if not product:
+            return jsonify({'error': 'Product not found'}), HTTP_404_NOT_FOUND
+        
+        return jsonify({
+            'product_id': product_id,
+            'variants': product['variants'],
+            'min_price': product['min_price'],
+            'max_price': product['max_price']
+        }), HTTP_200_OK
+    except Exception as e:
+        current_app.logger.error(f"Error retrieving product variants: {str(e)}")
+        return jsonify({'error': 'Failed to retrieve product variants'}), HTTP_500_INTERNAL_SERVER_ERROR
+
+@product_bp.route('/<int:product_id>/variants', methods=['POST'])
+@jwt_required()
+def create_product_variant(product_id):
+    """
+    Add a variant: {"sku", "name", "price", "stock_quantity", "is_active", "sort_order"}.
+    """
+    if not is_admin():
+        return jsonify({'error': 'Admin access required'}), HTTP_401_UNAUTHORIZED
+    
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Request must be JSON'}), HTTP_400_BAD_REQUEST
+    
+    try:
+        product = Product.query.get(product_id)
+        if not product:
+            return jsonify({'error': 'Product not found'}), HTTP_404_NOT_FOUND
+        
+        values, error = parse_variant_data(data)
+        if error:
+            return jsonify({'error': error}), HTTP_400_BAD_REQUEST
+        if ProductVariant.query.filter_by(sku=values['sku']).first():
+            return jsonify({'error': f"A variant with SKU {values['sku']} already exists"}), HTTP_409_CONFLICT
+        
+        variant = ProductVariant(product_id=product.id, **values)
+        db.session.add(variant)
+        db.session.flush()
+        refresh_price_range([product.id])
+        db.session.commit()
+        
+        cache.invalidate(PRODUCTS)
+        
+        return jsonify({
+            'message': 'Variant added successfully',
+            'variant': variant.to_dict()
+        }), HTTP_201_CREATED
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Variant creation error: {str(e)}")
+        return jsonify({'error': 'Failed to add variant'}), HTTP_500_INTERNAL_SERVER_ERROR
+
+@product_bp.route('/<int:product_id>/variants/<int:variant_id>', methods=['PUT', 'DELETE', 'OPTIONS'])
+@jwt_required()
+def update_product_variant(product_id, variant_id):
+    """
+    Update (PUT) or remove (DELETE) a variant.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    if not is_admin():
+        return jsonify({'error': 'Admin access required'}), HTTP_401_UNAUTHORIZED
+    
+    try:
+        variant = ProductVariant.query.filter_by(id=variant_id, product_id=product_id).first()
+        if not variant:
+            return jsonify({'error': 'Variant not found'}), HTTP_404_NOT_FOUND
+        
+        if request.method == 'DELETE':
+            db.session.delete(variant)
+            message = 'Variant deleted successfully'
+        else:
+            data = request.get_json(silent=True)
+            if not data:
+                return jsonify({'error': 'Request must be JSON'}), HTTP_400_BAD_REQUEST
+            values, error = parse_variant_data(data, variant)
+            if error:
+                return jsonify({'error': error}), HTTP_400_BAD_REQUEST
+            sku = values.get('sku')
+            if sku and sku != variant.sku and ProductVariant.query.filter(
+                    ProductVariant.sku == sku, ProductVariant.id != variant.id).first():
+                return jsonify({'error': f'A variant with SKU {sku} already exists'}), HTTP_409_CONFLICT
+            for field, value in values.items():
+                setattr(variant, field, value)
+            message = 'Variant updated successfully'
+        
+        db.session.flush()
+        refresh_price_range([product_id])
+        db.session.commit()
+        
+        cache.invalidate(PRODUCTS)
+        
+        response = {'message': message, 'variant_id': variant_id}
+        if request.method == 'PUT':
+            response['variant'] = variant.to_dict()
+        return jsonify(response), HTTP_200_OK
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error updating variant: {str(e)}")
+        return jsonify({'error': 'Failed to update variant'}), HTTP_500_INTERNAL_SERVER_ERROR
+
+@product_bp.route('/import', methods=['POST', 'OPTIONS'])
+@jwt_required()
+def import_product_catalog():
+    """
+    Bulk create or update products by SKU from CSV or NDJSON.
+    The file is sent as the raw request body (Content-Type text/csv or
+    application/x-ndjson) or as multipart field "file"; ?format= overrides
+    the detected format. ?dry_run=true only validates.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    if not is_admin():
+        return jsonify({'error': 'Admin access required'}), HTTP_401_UNAUTHORIZED
+    
+    upload = request.files.get('file')
+    if upload:
+        stream = upload.stream
+        content_type = upload.mimetype or ''
+        filename = (upload.filename or '').lower()
+    else:
+        stream = request.stream
+        content_type = request.mimetype or ''
+        filename = ''
+    
+    file_format = request.args.get('format')
+    if not file_format:
+        if 'csv' in content_type or filename.endswith('.csv'):
+            file_format = 'csv'
+        elif 'ndjson' in content_type or 'jsonl' in content_type or filename.endswith(('.ndjson', '.jsonl')):
+            file_format = 'ndjson'
+    if file_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Send CSV (text/csv) or NDJSON (application/x-ndjson), or pass ?format='}), HTTP_400_BAD_REQUEST
+    
+    chunk_size = max(1, min(request.args.get('chunk_size', 1000, type=int), 5000))
+    dry_run = parse_boolean(request.args.get('dry_run', 'false'))
+    
+    try:
+        rows = parse_csv(stream) if file_format == 'csv' else parse_ndjson(stream)
+        report = import_products(
+            rows, chunk_size=chunk_size, dry_run=dry_run,
+            created_by=f'admin:{get_jwt_identity()}'
+        )
+        if not dry_run:
+            cache.invalidate(PRODUCTS, CATEGORIES)
+        current_app.logger.info(
+            f"Product import: {report['rows']} rows in {report['elapsed_seconds']}s "
+            f"({report['rows_per_second']} rows/sec), {report['failed']} failed"
+        )
+        return jsonify(report), HTTP_200_OK
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        return jsonify({'error': f'Could not read file: {str(e)}'}), HTTP_400_BAD_REQUEST
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error importing products: {str(e)}")
+        return jsonify({'error': 'Failed to import products'}), HTTP_500_INTERNAL_SERVER_ERROR
+
+@product_bp.route('/export', methods=['GET', 'OPTIONS'])
+@jwt_required()
+def export_product_catalog():
+    """
+    Stream the whole catalog as CSV (default) or NDJSON (?format=ndjson).
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    if not is_admin():
+        return jsonify({'error': 'Admin access required'}), HTTP_401_UNAUTHORIZED
+    
+    file_format = request.args.get('format', 'csv')
+    if file_format == 'csv':
+        generator, mimetype = export_csv(), 'text/csv'
+    elif file_format == 'ndjson':
+        generator, mimetype = export_ndjson(), 'application/x-ndjson'
+    else:
+        return jsonify({'error': 'format must be csv or ndjson'}), HTTP_400_BAD_REQUEST
+    
+    filename = f"products-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{file_format}"
+    return Response(
+        stream_with_context(generator),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@product_bp.route('/bulk', methods=['PATCH', 'OPTIONS'])
+@jwt_required()
+def bulk_update():
+    """
+    Change many products in one transaction.
+    Select with "product_ids" and/or "filter" ({"category", "is_active", "is_featured"});
+    change with "is_active", "is_featured", "price_change_percent" and "stock_delta".
+    Pass "dry_run": true to see what would match.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    if not is_admin():
+        return jsonify({'error': 'Admin access required'}), HTTP_401_UNAUTHORIZED
+    
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'Request must be JSON'}), HTTP_400_BAD_REQUEST
+    
+    product_ids = data.get('product_ids')
+    filters = data.get('filter') or {}
+    if product_ids is None and not filters:
+        return jsonify({'error': 'product_ids or filter is required'}), HTTP_400_BAD_REQUEST
+    if product_ids is not None and (
+            not isinstance(product_ids, list)
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in product_ids)):
+        return jsonify({'error': 'product_ids must be a list of integers'}), HTTP_400_BAD_REQUEST
+    if not isinstance(filters, dict) or set(filters) - {'category', 'is_active', 'is_featured'}:
+        return jsonify({'error': 'filter supports category, is_active and is_featured'}), HTTP_400_BAD_REQUEST
+    
+    try:
+        for field in ('is_active', 'is_featured'):
+            if filters.get(field) is not None:
+                filters[field] = parse_boolean(filters[field])
+        is_active = parse_boolean(data['is_active']) if data.get('is_active') is not None else None
+        is_featured = parse_boolean(data['is_featured']) if data.get('is_featured') is not None else None
+        price_change_percent = float(data['price_change_percent']) if data.get('price_change_percent') is not None else None
+        stock_delta = int(data['stock_delta']) if data.get('stock_delta') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid value in bulk update'}), HTTP_400_BAD_REQUEST
+    
+    if is_active is None and is_featured is None and not price_change_percent and not stock_delta:
+        return jsonify({'error': 'Nothing to change'}), HTTP_400_BAD_REQUEST
+    if price_change_percent is not None and not -100 < price_change_percent <= 1000:
+        return jsonify({'error': 'price_change_percent must be above -100 and at most 1000'}), HTTP_400_BAD_REQUEST
+    
+    try:
+        selection = select_products(product_ids, filters)
+        limit = current_app.config.get('PRODUCT_BULK_LIMIT', 5000)
+        if selection.count() > limit:
+            return jsonify({'error': f'At most {limit} products can be changed at once'}), HTTP_400_BAD_REQUEST
+        
+        report = bulk_update_products(
+            selection,
+            is_active=is_active,
+            is_featured=is_featured,
+            price_change_percent=price_change_percent,
+            stock_delta=stock_delta,
+            dry_run=parse_boolean(data.get('dry_run', False)),
+            created_by=f'admin:{get_jwt_identity()}'
+        )
+        db.session.commit()
+        if not report['dry_run'] and report['matched']:
+            cache.invalidate(PRODUCTS, CATEGORIES)
+        
+        return jsonify(report), HTTP_200_OK
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error in bulk product update: {str(e)}")
+        return jsonify({'error': 'Failed to update products'}), HTTP_500_INTERNAL_SERVER_ERROR
+
 @product_bp.route('/low-stock', methods=['GET', 'OPTIONS'])
 @jwt_required()
 def get_low_stock_products():
     """
     Get products with low stock (below threshold).
+    The default threshold is served from the materialized low-stock set;
+    other thresholds use the (is_active, stock_quantity) index.
     """
     if request.method == 'OPTIONS':
         return '', 200
@@ -579,13 +1107,18 @@ def get_low_stock_products():
         return jsonify({'error': 'Admin access required'}), HTTP_401_UNAUTHORIZED
     
     try:
-        # Get threshold from query parameter (default: 10)
-        threshold = request.args.get('threshold', 10, type=int)
+        default_threshold = get_low_stock_threshold()
+        threshold = request.args.get('threshold', default_threshold, type=int)
         
-        # Get products with stock below threshold
-        products = Product.query.filter(
-            Product.stock_quantity < threshold
-        ).order_by(Product.stock_quantity).all()
+        if threshold == default_threshold:
+            products = Product.query.join(
+                LowStockProduct, LowStockProduct.product_id == Product.id
+            ).order_by(LowStockProduct.stock_quantity).all()
+        else:
+            products = Product.query.filter(
+                Product.is_active == True,
+                Product.stock_quantity < threshold
+            ).order_by(Product.stock_quantity).all()
         
         return jsonify({
             'products': [product.to_dict() for product in products],
@@ -605,10 +1138,10 @@ def get_featured_products():
         return '', 200
         
     try:
-        products = Product.query.filter_by(is_featured=True).all()
+        products = featured_products()
         
         return jsonify({
-            'products': [product.to_dict() for product in products],
+            'products': products,
             'count': len(products)
         }), HTTP_200_OK
     except Exception as e:
@@ -637,6 +1170,8 @@ def toggle_featured(product_id):
         product.is_featured = not product.is_featured
         db.session.commit()
         
+        cache.invalidate(PRODUCTS)
+        
         return jsonify({
             'message': f'Product featured status updated to {product.is_featured}',
             'product_id': product_id,
@@ -686,6 +1221,8 @@ def toggle_best_seller(product_id):
         
         db.session.commit()
         
+        cache.invalidate(PRODUCTS)
+        
         return jsonify({
             'message': f'Product best seller status updated to {product.is_best_seller}',
             'product_id': product_id,
@@ -716,8 +1253,12 @@ def toggle_active(product_id):
         
         # Toggle active status
         product.is_active = not product.is_active
+        sync_low_stock([product.id])
+        sync_product_categories([product.id])
         db.session.commit()
         
+        cache.invalidate(PRODUCTS, CATEGORIES)
+        
         return jsonify({
             'message': f'Product active status updated to {product.is_active}',
             'product_id': product_id,
@@ -0,0 +1,226 @@
+# app/customers.py
+# Admin customer search. Each kind of query goes to its own index: phone
+# numbers to a prefix match on phone_normalized, emails to a prefix match on
+# email, and names to the FULLTEXT index on MySQL. Results are keyset
+# paginated on id, newest first.
+#
+# Also the customer summary: profile, order and feedback aggregates and
+# recent orders in a fixed number of statements.
+from app.extensions import db
+from app.models.customer import Customer, CustomerStats
+from app.models.feedback import Feedback
+from app.models.order import Order
+from app.orders import order_totals
+from flask import current_app, has_app_context
+from sqlalchemy import and_, bindparam, func, or_, update
+from sqlalchemy.orm import selectinload
+import re
+
+_digits = re.compile(r'\D')
+_words = re.compile(r'\w+', re.UNICODE)
+
+# InnoDB's default innodb_ft_min_token_size; shorter words are not in the FULLTEXT index
+FULLTEXT_MIN_WORD = 3
+
+
+def normalize_phone(phone, country_code=None):
+    """
+    Digits-only phone number with the country code, so '0700 123 456',
+    '+254 700 123456' and '00254700123456' are all '254700123456'.
+    """
+    if not phone:
+        return None
+    if country_code is None:
+        country_code = current_app.config.get('PHONE_DEFAULT_COUNTRY_CODE', '254') if has_app_context() else '254'
+    phone = str(phone).strip()
+    digits = _digits.sub('', phone)
+    if not digits:
+        return None
+    # '+' numbers already carry their country code
+    if not phone.startswith('+'):
+        if digits.startswith('00'):
+            digits = digits[2:]
+        elif digits.startswith('0'):
+            digits = country_code + digits[1:]
+    return digits[:20]
+
+
+def classify_query(query):
+    """'email', 'phone' or 'name', from what the admin typed"""
+    if '@' in query:
+        return 'email'
+    stripped = re.sub(r'[\s()+\-.]', '', query)
+    if stripped.isdigit() and len(stripped) >= 3:
+        return 'phone'
+    return 'name'
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _prefix(column, value):
+    """
+    column starts with value, written as a range so every database can use
+    the column's index (LIKE with ESCAPE cannot use one on SQLite)
+    """
+    upper = value[:-1] + chr(ord(value[-1]) + 1)
+    return and_(column >= value, column < upper)
+
+
+def _phone_condition(query):
+    normalized = normalize_phone(query)
+    prefixes = {normalized}
+    country_code = current_app.config.get('PHONE_DEFAULT_COUNTRY_CODE', '254')
+    digits = _digits.sub('', query)
+    if not query.strip().startswith(('+', '0')) and not digits.startswith(country_code):
+        # A local number typed without its leading 0
+        prefixes.add(country_code + digits)
+    return or_(*[_prefix(Customer.phone_normalized, prefix) for prefix in prefixes if prefix])
+
+
+def _name_condition(query):
+    words = _words.findall(query.lower())
+    if not words:
+        return None
+    if db.engine.dialect.name in ('mysql', 'mariadb') and all(len(word) >= FULLTEXT_MIN_WORD for word in words):
+        from sqlalchemy.dialects.mysql import match
+        return match(Customer.name, against=' '.join(f'+{word}*' for word in words)).in_boolean_mode()
+    # Other databases (and words too short for FULLTEXT): every word must start a word of the name
+    return and_(*[
+        or_(Customer.name.ilike(f'{_escape_like(word)}%', escape='\\'),
+            Customer.name.ilike(f'% {_escape_like(word)}%', escape='\\'))
+        for word in words
+    ])
+
+
+def search_customers(query=None, is_active=None, email_verified=None, before_id=None, limit=25):
+    """
+    One page of customers, newest first, optionally matching `query` and the
+    status filters. Pass the returned next_cursor as before_id for the next
+    page. Returns (customers, next_cursor).
+    """
+    base = Customer.query
+    if is_active is not None:
+        base = base.filter(Customer.is_active.is_(is_active))
+    if email_verified is not None:
+        base = base.filter(Customer.email_verified.is_(email_verified))
+    if before_id is not None:
+        base = base.filter(Customer.id < before_id)
+
+    query = (query or '').strip()
+    if not query:
+        conditions = [None]
+    else:
+        kind = classify_query(query)
+        if kind == 'email':
+            conditions = [_prefix(Customer.email, query.lower())]
+        elif kind == 'phone':
+            conditions = [_phone_condition(query)]
+        else:
+            # Names, and email addresses typed without the @
+            conditions = [_name_condition(query), _prefix(Customer.email, query.lower())]
+        conditions = [condition for condition in conditions if condition is not None]
+
+    # One indexed query per condition rather than an OR the planner cannot index, merged by id
+    found = {}
+    for condition in conditions:
+        branch = base if condition is None else base.filter(condition)
+        for customer in branch.order_by(Customer.id.desc()).limit(limit + 1).all():
+            found[customer.id] = customer
+    customers = sorted(found.values(), key=lambda customer: customer.id, reverse=True)
+
+    next_cursor = None
+    if len(customers) > limit:
+        customers = customers[:limit]
+        next_cursor = customers[-1].id
+    return customers, next_cursor
+
+
+def backfill_phone_numbers(chunk_size=1000):
+    """Fill phone_normalized for customers created before it existed"""
+    filled = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(Customer.id, Customer.phone).filter(
+            Customer.phone_normalized.is_(None), Customer.id > last_id
+        ).order_by(Customer.id).limit(chunk_size).all()
+        if not rows:
+            break
+        values = [
+            {'b_id': customer_id, 'b_phone': normalize_phone(phone)}
+            for customer_id, phone in rows if normalize_phone(phone)
+        ]
+        if values:
+            table = Customer.__table__
+            db.session.execute(
+                update(table)
+                .where(table.c.id == bindparam('b_id'))
+                .values(phone_normalized=bindparam('b_phone'), updated_at=table.c.updated_at),
+                values
+            )
+            filled += len(values)
+        db.session.commit()
+        last_id = rows[-1][0]
+    return filled
+
+
+def customer_summary(customer_id, recent_orders=5, live=False):
+    """
+    A customer with their order and feedback aggregates and most recent
+    orders, in three statements however long their history: the customer row
+    joined to their customer_stats row (or, with live=True, a grouped
+    aggregate over their orders) and a grouped aggregate over their feedback,
+    then the recent orders, then those orders' items.
+    Returns None if there is no such customer.
+    """
+    use_stats = not live and current_app.config.get('CUSTOMER_STATS_ENABLED', True)
+    orders = CustomerStats.__table__ if use_stats else order_totals([customer_id]).subquery()
+    feedback = db.session.query(
+        Feedback.customer_id.label('customer_id'),
+        func.count(Feedback.id).label('feedback_count'),
+        func.avg(Feedback.rating).label('average_rating')
+    ).filter(Feedback.customer_id == customer_id).group_by(Feedback.customer_id).subquery()
+
+    row = db.session.query(
+        Customer,
+        orders.c.order_count, orders.c.cancelled_count, orders.c.lifetime_value,
+        orders.c.first_order_at, orders.c.last_order_at,
+        feedback.c.feedback_count, feedback.c.average_rating
+    ).outerjoin(orders, orders.c.customer_id == Customer.id).outerjoin(
+        feedback, feedback.c.customer_id == Customer.id
+    ).filter(Customer.id == customer_id).first()
+    if row is None:
+        return None
+
+    totals = row
+    if use_stats and row.order_count is None:
+        # No stats row: either no orders, or orders placed before customer_stats was rebuilt
+        totals = order_totals([customer_id]).first() or row
+
+    recent = []
+    if recent_orders:
+        recent = Order.query.options(selectinload(Order.items)).filter(
+            Order.customer_id == customer_id
+        ).order_by(Order.order_date.desc(), Order.id.desc()).limit(recent_orders).all()
+
+    order_count = totals.order_count or 0
+    lifetime_value = float(totals.lifetime_value or 0.0)
+    placed = order_count - (totals.cancelled_count or 0)
+    return {
+        'customer': row[0],
+        'orders': {
+            'count': order_count,
+            'cancelled_count': totals.cancelled_count or 0,
+            'lifetime_value': round(lifetime_value, 2),
+            'average_order_value': round(lifetime_value / placed, 2) if placed else None,
+            'first_order_at': totals.first_order_at,
+            'last_order_at': totals.last_order_at
+        },
+        'feedback': {
+            'count': row.feedback_count or 0,
+            'average_rating': round(float(row.average_rating), 2) if row.average_rating is not None else None
+        },
+        'recent_orders': recent,
+        'source': 'customer_stats' if use_stats and totals is row else 'orders'
+    }
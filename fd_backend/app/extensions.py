@@ -3,10 +3,18 @@ from flask_migrate import Migrate
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
 from flask_mail import Mail
+from app.instrumentation import QueryInstrumentation
+from app.metrics import Metrics
+from app.tasks import BackgroundTasks
+from app.cache import Cache
 
 
 db = SQLAlchemy()
 migrate = Migrate()
 bcrypt = Bcrypt()
 jwt = JWTManager()
-mail = Mail()  
\ No newline at end of file
+mail = Mail()
+query_instrumentation = QueryInstrumentation()
+metrics = Metrics()
+background_tasks = BackgroundTasks()  
+cache = Cache()
@@ -0,0 +1,155 @@
+# app/health_tips.py
+# Health tips listing and search. Each category's tips (newest first) and the
+# per-category counts are cached in the health_tips namespace, which the admin
+# health tip routes invalidate. Search goes to an in-memory inverted index of
+# the words in every tip's title and description, rebuilt when the namespace
+# version moves on, instead of a LIKE '%term%' scan over the description text.
+from app.extensions import db, cache
+from app.cache import HEALTH_TIPS
+from app.models.content import HealthTip
+from app.suggest import normalize
+from flask import current_app
+from bisect import bisect_left
+from sqlalchemy import func
+import threading
+
+ALL_CATEGORIES = 'all'
+
+
+def _ttl():
+    return current_app.config.get('CACHE_CONTENT_TTL')
+
+
+class HealthTipIndex:
+    """
+    Inverted index from normalized words to health tip IDs. Words are kept in
+    a sorted array, so a query word matches every indexed word it is a prefix
+    of through two binary searches. Each tip keeps its position in the
+    listing (newest first), so results come back in the listing's order.
+    """
+
+    def __init__(self):
+        self._words = []
+        self._postings = {}  # word -> set of tip IDs
+        self._tips = {}  # tip_id -> (rank, category, tip dict)
+        self._lock = threading.RLock()
+        self.version = None
+
+    def __len__(self):
+        return len(self._tips)
+
+    def build(self, tips):
+        """Replace the whole index with HealthTip rows, newest first"""
+        postings = {}
+        records = {}
+        for rank, tip in enumerate(tips):
+            records[tip.id] = (rank, tip.category, tip.to_dict())
+            for word in set(normalize(f'{tip.title} {tip.description}').split()):
+                postings.setdefault(word, set()).add(tip.id)
+        with self._lock:
+            self._postings = postings
+            self._words = sorted(postings)
+            self._tips = records
+
+    def _prefix_ids(self, prefix):
+        start = bisect_left(self._words, prefix)
+        end = bisect_left(self._words, prefix + '\uffff', lo=start)
+        found = set()
+        for word in self._words[start:end]:
+            found |= self._postings[word]
+        return found
+
+    def search(self, query, category=None):
+        """Tips with a word starting with each word of `query`, newest first"""
+        terms = normalize(query).split()
+        if not terms:
+            return []
+        with self._lock:
+            # Narrowest term first, so the intersection shrinks as fast as possible
+            matches = sorted((self._prefix_ids(term) for term in set(terms)), key=len)
+            found = set.intersection(*matches)
+            records = [self._tips[tip_id] for tip_id in found]
+        if category is not None:
+            records = [record for record in records if record[1] == category]
+        records.sort(key=lambda record: record[0])
+        return [record[2] for record in records]
+
+
+health_tip_index = HealthTipIndex()
+
+
+def _ordered(query):
+    return query.order_by(HealthTip.created_at.desc(), HealthTip.id.desc())
+
+
+def sync_health_tip_index(index=None):
+    """
+    Rebuild the index when the health_tips namespace has moved on. There are
+    at most a few hundred tips and they change rarely, so a rebuild is a
+    single SELECT of all of them.
+    """
+    index = index if index is not None else health_tip_index
+    version = cache.version(HEALTH_TIPS)
+    if index.version is not None and index.version == version:
+        return index
+
+    with index._lock:
+        if index.version is not None and index.version == version:
+            return index
+        index.build(_ordered(HealthTip.query).all())
+        index.version = version
+        current_app.logger.debug(f"Health tip index rebuilt: {len(index)} tips")
+    return index
+
+
+def list_health_tips(category=None):
+    """Tips in `category` (every tip for None), newest first, cached until a tip changes"""
+    def load():
+        query = HealthTip.query
+        if category is not None:
+            query = query.filter(HealthTip.category == category)
+        return [tip.to_dict() for tip in _ordered(query).all()]
+
+    return cache.get_or_set(HEALTH_TIPS, f'category:{category or ALL_CATEGORIES}', load, ttl=_ttl())
+
+
+def search_health_tips(query, category=None):
+    """Tips matching every word of `query`, optionally in one category, newest first"""
+    phrase = ' '.join(normalize(query).split())
+    if not phrase:
+        return list_health_tips(category)
+
+    def load():
+        return sync_health_tip_index().search(phrase, category)
+
+    return cache.get_or_set(HEALTH_TIPS, f'search:{category or ALL_CATEGORIES}:{phrase}', load, ttl=_ttl())
+
+
+def health_tip_categories():
+    """
+    {'categories': [{'category', 'count'}], 'total'} for every category with
+    tips, by name, from one GROUP BY
+    """
+    def load():
+        rows = db.session.query(HealthTip.category, func.count(HealthTip.id)).group_by(
+            HealthTip.category
+        ).order_by(HealthTip.category).all()
+        return {
+            'categories': [{'category': category, 'count': count} for category, count in rows],
+            'total': sum(count for _, count in rows)
+        }
+
+    return cache.get_or_set(HEALTH_TIPS, 'categories', load, ttl=_ttl())
+
+
+def paginate(items, page=1, per_page=12):
+    """One page of an already ordered list, with the same page fields as the catalog's browse results"""
+    total = len(items)
+    start = (page - 1) * per_page
+    return {
+        'tips': items[start:start + per_page],
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page
+    }
@@ -0,0 +1,272 @@
+# app/inbox.py
+# Admin feedback inbox: filtered, keyset-paginated pages of feedback (newest
+# or most urgent first), word search over title and message, and rating
+# stats. Filters map onto the (status, id), (rating, id), (urgency, id) and
+# created_at indexes, and search uses the FULLTEXT index on MySQL.
+#
+# Also bulk responses: one templated response and status applied to many
+# feedback with set-based UPDATEs, and the customers' notification emails
+# sent afterwards in batches over a single SMTP connection. A periodic sweep
+# sends any email still owed after a worker stopped mid-batch.
+from app.extensions import db, mail
+from app.models.feedback import Feedback, FeedbackTopic
+from app.models.customer import Customer
+from app.customers import FULLTEXT_MIN_WORD
+from flask import current_app
+from flask_mail import Message
+from markupsafe import escape
+from sqlalchemy import and_, bindparam, func, or_, update
+from sqlalchemy.orm import selectinload
+from datetime import datetime, timedelta
+import re
+
+_words = re.compile(r'\w+', re.UNICODE)
+
+# Placeholders a bulk response template may use, filled in per feedback
+RESPONSE_PLACEHOLDERS = ('customer_name', 'title', 'feedback_id')
+_placeholder = re.compile(r'\{(' + '|'.join(RESPONSE_PLACEHOLDERS) + r')\}')
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _text_condition(query):
+    words = _words.findall((query or '').lower())
+    if not words:
+        return None
+    if db.engine.dialect.name in ('mysql', 'mariadb') and all(len(word) >= FULLTEXT_MIN_WORD for word in words):
+        from sqlalchemy.dialects.mysql import match
+        return match(Feedback.title, Feedback.feedback_message, against=' '.join(f'+{word}*' for word in words)).in_boolean_mode()
+    # Other databases (and words too short for FULLTEXT): every word somewhere in the title or message
+    return and_(*[
+        or_(Feedback.title.ilike(f'%{_escape_like(word)}%', escape='\\'),
+            Feedback.feedback_message.ilike(f'%{_escape_like(word)}%', escape='\\'))
+        for word in words
+    ])
+
+
+def filter_feedback(query, filters):
+    """
+    Apply inbox filters: statuses (list), min_rating, max_rating, since and
+    until (datetimes on created_at), customer_id, q (words to search for),
+    sentiment, topic and min_urgency.
+    """
+    filters = filters or {}
+    if filters.get('statuses'):
+        query = query.filter(Feedback.status.in_(filters['statuses']))
+    if filters.get('min_rating') is not None:
+        query = query.filter(Feedback.rating >= filters['min_rating'])
+    if filters.get('max_rating') is not None:
+        query = query.filter(Feedback.rating <= filters['max_rating'])
+    if filters.get('since') is not None:
+        query = query.filter(Feedback.created_at >= filters['since'])
+    if filters.get('until') is not None:
+        query = query.filter(Feedback.created_at < filters['until'])
+    if filters.get('customer_id') is not None:
+        query = query.filter(Feedback.customer_id == filters['customer_id'])
+    if filters.get('sentiment'):
+        query = query.filter(Feedback.sentiment == filters['sentiment'])
+    if filters.get('topic'):
+        query = query.filter(Feedback.id.in_(
+            db.session.query(FeedbackTopic.feedback_id).filter(FeedbackTopic.topic == filters['topic'])
+        ))
+    if filters.get('min_urgency') is not None:
+        query = query.filter(Feedback.urgency >= filters['min_urgency'])
+    if filters.get('q'):
+        condition = _text_condition(filters['q'])
+        if condition is not None:
+            query = query.filter(condition)
+    return query
+
+
+def list_feedback(filters=None, before_id=None, limit=50, sort='newest', after=None):
+    """
+    One page of feedback matching `filters`, newest first, or with
+    sort='urgency' most urgent first (analyzed feedback only). Pass the
+    returned next_cursor back as before_id, or for urgency as
+    after=(urgency, id). Returns (feedback, next_cursor).
+    """
+    query = filter_feedback(Feedback.query.options(selectinload(Feedback.topics)), filters)
+    if sort == 'urgency':
+        query = query.filter(Feedback.urgency.isnot(None))
+        if after is not None:
+            urgency, last_id = after
+            query = query.filter(or_(
+                Feedback.urgency < urgency,
+                and_(Feedback.urgency == urgency, Feedback.id < last_id)
+            ))
+        query = query.order_by(Feedback.urgency.desc(), Feedback.id.desc())
+    else:
+        if before_id is not None:
+            query = query.filter(Feedback.id < before_id)
+        query = query.order_by(Feedback.id.desc())
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f'{rows[-1].urgency}:{rows[-1].id}' if sort == 'urgency' else rows[-1].id
+    return rows, next_cursor
+
+
+def feedback_stats(filters=None):
+    """
+    Counts per status and rating for the feedback matching `filters`, from a
+    single GROUP BY status, rating, with the total and average rating.
+    """
+    query = filter_feedback(
+        db.session.query(Feedback.status, Feedback.rating, func.count(Feedback.id)), filters
+    ).group_by(Feedback.status, Feedback.rating)
+
+    by_status = {}
+    by_rating = {}
+    total = 0
+    rated = 0
+    rating_sum = 0
+    for status, rating, count in query.all():
+        total += count
+        by_status[status] = by_status.get(status, 0) + count
+        if rating is not None:
+            by_rating[rating] = by_rating.get(rating, 0) + count
+            rated += count
+            rating_sum += rating * count
+    return {
+        'total': total,
+        'rated': rated,
+        'average_rating': round(rating_sum / rated, 2) if rated else None,
+        'by_rating': {str(rating): by_rating[rating] for rating in sorted(by_rating)},
+        'by_status': by_status
+    }
+
+
+def select_feedback(feedback_ids=None, filters=None):
+    """Query of feedback IDs matching an explicit ID list and/or the inbox filters"""
+    query = db.session.query(Feedback.id)
+    if feedback_ids is not None:
+        query = query.filter(Feedback.id.in_(feedback_ids))
+    return filter_feedback(query, filters)
+
+
+def render_response(template, customer_name=None, title=None, feedback_id=None):
+    """Fill the {customer_name}, {title} and {feedback_id} placeholders; other braces are left alone"""
+    values = {
+        'customer_name': customer_name or 'there',
+        'title': title or 'your feedback',
+        'feedback_id': str(feedback_id) if feedback_id is not None else ''
+    }
+    return _placeholder.sub(lambda found: values[found.group(1)], template)
+
+
+def bulk_respond(selection, template, status='reviewed', dry_run=False, notify=True, chunk_size=1000):
+    """
+    Set the response and status of every selected feedback. A template
+    without placeholders is one UPDATE ... WHERE id IN (...) per chunk; one
+    with placeholders is rendered per row and written with an executemany
+    UPDATE per chunk. Unless notify is false the feedback is left owing an
+    email. Returns a report of what matched and changed. The caller commits.
+    """
+    feedback_ids = [row.id for row in selection.order_by(Feedback.id).all()]
+    report = {'matched': len(feedback_ids), 'updated': 0, 'feedback_ids': feedback_ids, 'dry_run': dry_run}
+    if dry_run or not feedback_ids:
+        if feedback_ids and _placeholder.search(template):
+            row = db.session.query(Feedback.id, Feedback.title, Customer.name).join(
+                Customer, Customer.id == Feedback.customer_id
+            ).filter(Feedback.id == feedback_ids[0]).first()
+            report['preview'] = render_response(template, row.name, row.title, row.id)
+        return report
+
+    now = datetime.utcnow()
+    notified_at = None if notify else now
+    table = Feedback.__table__
+    personalized = bool(_placeholder.search(template))
+    for start in range(0, len(feedback_ids), chunk_size):
+        chunk = feedback_ids[start:start + chunk_size]
+        if not personalized:
+            result = db.session.execute(
+                update(Feedback)
+                .where(Feedback.id.in_(chunk))
+                .values(response=template, status=status, response_notified_at=notified_at, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            report['updated'] += result.rowcount
+            continue
+        rows = db.session.query(Feedback.id, Feedback.title, Customer.name).join(
+            Customer, Customer.id == Feedback.customer_id
+        ).filter(Feedback.id.in_(chunk)).all()
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('b_id'))
+            .values(response=bindparam('b_response'), status=status, response_notified_at=notified_at, updated_at=now),
+            [{'b_id': feedback_id, 'b_response': render_response(template, name, title, feedback_id)}
+             for feedback_id, title, name in rows]
+        )
+        report['updated'] += len(rows)
+    return report
+
+
+def send_response_emails(feedback_ids, batch_size=None):
+    """
+    Email each customer the response to their feedback, for feedback not yet
+    notified. Messages go out over one SMTP connection per batch of
+    batch_size, and each feedback is marked notified as soon as its message
+    is sent, so a retry after a failure does not email anyone twice.
+    Returns the number sent.
+    """
+    batch_size = batch_size or current_app.config.get('FEEDBACK_EMAIL_BATCH_SIZE', 100)
+    table = Feedback.__table__
+    sent = 0
+    feedback_ids = sorted(set(feedback_ids))
+    for start in range(0, len(feedback_ids), batch_size):
+        rows = db.session.query(
+            Feedback.id, Feedback.title, Feedback.response, Feedback.status, Customer.name, Customer.email
+        ).join(Customer, Customer.id == Feedback.customer_id).filter(
+            Feedback.id.in_(feedback_ids[start:start + batch_size]),
+            Feedback.response.isnot(None),
+            Feedback.response_notified_at.is_(None)
+        ).order_by(Feedback.id).all()
+        if not rows:
+            continue
+
+        with mail.connect() as connection:
+            for feedback_id, title, response, status, name, email in rows:
+                if email:
+                    connection.send(Message(
+                        subject=f"Re: {title or 'Your feedback'}",
+                        recipients=[email],
+                        html=f"""
+                        <p>Hello {escape(name)},</p>
+                        <p>Thank you for your feedback. Our team has responded:</p>
+                        <blockquote>{escape(response)}</blockquote>
+                        <p>Status: {escape(status)}</p>
+                        <p>Best regards,<br>Fruit Design Team</p>
+                        """
+                    ))
+                    sent += 1
+                db.session.execute(
+                    update(table).where(table.c.id == feedback_id)
+                    .values(response_notified_at=datetime.utcnow(), updated_at=table.c.updated_at)
+                )
+                db.session.commit()
+    current_app.logger.info(f"Feedback responses emailed: {sent}")
+    return sent
+
+
+def sweep_response_emails(limit=None, delay=None):
+    """
+    Send the emails still owed for responses, e.g. when the worker that
+    queued them stopped mid-batch. Responses given in the last `delay`
+    seconds are left to the batch their request queued. Run periodically by
+    the background tasks. Returns the number sent.
+    """
+    limit = limit or current_app.config.get('FEEDBACK_EMAIL_SWEEP_LIMIT', 1000)
+    if delay is None:
+        delay = current_app.config.get('FEEDBACK_EMAIL_SWEEP_DELAY', 600)
+    feedback_ids = [row.id for row in db.session.query(Feedback.id).filter(
+        Feedback.response.isnot(None),
+        Feedback.response_notified_at.is_(None),
+        Feedback.updated_at < datetime.utcnow() - timedelta(seconds=delay)
+    ).order_by(Feedback.id).limit(limit).all()]
+    if not feedback_ids:
+        return 0
+    return send_response_emails(feedback_ids)
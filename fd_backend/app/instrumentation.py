@@ -0,0 +1,146 @@
+import heapq
+import json
+import logging
+import time
+from collections import Counter
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+
+def _compact_statement(statement, limit=500):
+    """Collapse whitespace in a SQL statement and truncate it for logging"""
+    compact = ' '.join(statement.split())
+    if len(compact) > limit:
+        compact = compact[:limit] + '...'
+    return compact
+
+
+class QueryInstrumentation:
+    """
+    Record per-request SQL statistics (query count, total DB time and the
+    slowest statements) by hooking SQLAlchemy cursor events.
+
+    Each response gets a Server-Timing header and a structured log line, and
+    any statement slower than SLOW_QUERY_THRESHOLD_MS is logged together with
+    the endpoint that issued it.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQL_INSTRUMENTATION_ENABLED', True)
+        app.config.setdefault('SLOW_QUERY_THRESHOLD_MS', 200)
+        app.config.setdefault('SQL_SLOWEST_STATEMENTS', 3)
+        app.config.setdefault('SQL_LOG_REQUESTS', True)
+
+        if not app.config['SQL_INSTRUMENTATION_ENABLED']:
+            return
+
+        # The engine only exists once Flask-SQLAlchemy has been initialised
+        from app.extensions import db
+        with app.app_context():
+            engine = db.engine
+
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    # SQLAlchemy event handlers
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Kept on the execution context, which is dropped with the statement
+        # even when it raises, rather than on the pooled connection
+        if context is not None:
+            context._query_start_time = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start_time = getattr(context, '_query_start_time', None)
+        if start_time is None:
+            return
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+        stats = g.get('sql_stats') if has_request_context() else None
+        if stats is not None:
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['statements'][statement] += 1
+
+            # Keep only the N slowest statements in a min-heap
+            entry = (elapsed_ms, stats['count'], statement)
+            if len(stats['slowest']) < stats['slowest_limit']:
+                heapq.heappush(stats['slowest'], entry)
+            else:
+                heapq.heappushpop(stats['slowest'], entry)
+
+        if has_app_context():
+            threshold = current_app.config.get('SLOW_QUERY_THRESHOLD_MS', 200)
+            log = current_app.logger
+        else:
+            threshold = 200
+            log = logger
+
+        if threshold is not None and elapsed_ms >= threshold:
+            log.warning(json.dumps({
+                'event': 'slow_query',
+                'duration_ms': round(elapsed_ms, 2),
+                'endpoint': request.endpoint if has_request_context() else None,
+                'path': request.path if has_request_context() else None,
+                'statement': _compact_statement(statement)
+            }))
+
+    # Flask request hooks
+    def _start_request(self):
+        g.sql_stats = {
+            'count': 0,
+            'total_ms': 0.0,
+            'slowest': [],
+            'slowest_limit': current_app.config.get('SQL_SLOWEST_STATEMENTS', 3),
+            'statements': Counter(),
+            'started_at': time.perf_counter()
+        }
+
+    def _finish_request(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+
+        request_ms = (time.perf_counter() - stats['started_at']) * 1000
+
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={stats["total_ms"]:.2f};desc="{stats["count"]} queries", app;dur={request_ms:.2f}'
+        )
+
+        if current_app.config.get('SQL_LOG_REQUESTS', True):
+            slowest = sorted(stats['slowest'], reverse=True)
+            repeated_statement, repeated_count = (None, 0)
+            if stats['statements']:
+                repeated_statement, repeated_count = stats['statements'].most_common(1)[0]
+
+            current_app.logger.info(json.dumps({
+                'event': 'request_sql',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'query_count': stats['count'],
+                'db_time_ms': round(stats['total_ms'], 2),
+                'request_time_ms': round(request_ms, 2),
+                'slowest': [
+                    {'duration_ms': round(ms, 2), 'statement': _compact_statement(statement)}
+                    for ms, _, statement in slowest
+                ],
+                # A statement repeated many times in one request usually means an N+1
+                'most_repeated': {
+                    'count': repeated_count,
+                    'statement': _compact_statement(repeated_statement)
+                } if repeated_count > 1 else None
+            }))
+
+        return response
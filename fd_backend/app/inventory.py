@@ -0,0 +1,656 @@
+# app/inventory.py
+# Stock reservations: carts hold stock for a limited time so two shoppers
+# cannot both be promised the last units of a product.
+# Stock ledger: every change to stock_quantity is applied as an atomic delta
+# and recorded in stock_movements, checkpointed by stock_snapshots.
+# Low stock: products crossing the threshold are tracked in low_stock_products
+# as stock changes, and admins are emailed from a background task. Products
+# going in or out of stock also drop the cached product listings, which show
+# availability (in_stock facet counts, the in_stock filter).
+from app.extensions import db, mail, background_tasks, cache
+from app.cache import PRODUCTS
+from app.models.product import Product
+from app.models.admin_user import AdminUser
+from app.models.inventory import StockReservation, StockMovement, StockSnapshot, LowStockProduct
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import bindparam, event, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+import json
+
+
+class InsufficientStockError(Exception):
+    """Raised when a reservation or sale asks for more stock than is available"""
+
+    def __init__(self, shortages):
+        # shortages: {product_id: {'requested': n, 'available': m}}
+        self.shortages = shortages
+        super().__init__(f"Insufficient stock for products {sorted(shortages)}")
+
+    def to_dict(self):
+        return [
+            {'product_id': product_id, **details}
+            for product_id, details in sorted(self.shortages.items())
+        ]
+
+
+def cart_holder(cart_id):
+    return f'cart:{cart_id}'
+
+
+def guest_holder(guest_cart_id):
+    return f'guest:{guest_cart_id}'
+
+
+def get_reservation_ttl():
+    return timedelta(minutes=current_app.config.get('RESERVATION_TTL_MINUTES', 15))
+
+
+def held_quantities(product_ids, exclude_holder=None):
+    """Sum of unexpired holds per product, in one grouped query"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+    query = db.session.query(
+        StockReservation.product_id,
+        func.sum(StockReservation.quantity)
+    ).filter(
+        StockReservation.product_id.in_(product_ids),
+        StockReservation.expires_at > datetime.utcnow()
+    )
+    if exclude_holder:
+        query = query.filter(StockReservation.holder != exclude_holder)
+    return {product_id: int(total or 0) for product_id, total in query.group_by(StockReservation.product_id).all()}
+
+
+def available_stock(products, exclude_holder=None):
+    """
+    Stock that can still be promised, keyed by product ID.
+    `products` are Product rows; pass exclude_holder to ignore a holder's own holds.
+    """
+    held = held_quantities([p.id for p in products], exclude_holder=exclude_holder)
+    return {p.id: max((p.stock_quantity or 0) - held.get(p.id, 0), 0) for p in products}
+
+
+def lock_products(product_ids):
+    """Load products with a row lock, in ID order to avoid deadlocks"""
+    return Product.query.filter(
+        Product.id.in_(list(product_ids))
+    ).order_by(Product.id).with_for_update().populate_existing().all()
+
+
+def reserve(holder, quantities, strict=True):
+    """
+    Set the holder's holds to exactly `quantities` ({product_id: quantity});
+    products missing from the map keep their existing hold. Locks the product
+    rows so concurrent reservations are serialised.
+
+    With strict=True an InsufficientStockError is raised if any product cannot
+    be fully held; with strict=False holds are capped at what is available.
+    The caller commits.
+    """
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return {}
+
+    products = lock_products(quantities)
+    available = available_stock(products, exclude_holder=holder)
+
+    shortages = {
+        product_id: {'requested': quantity, 'available': available.get(product_id, 0)}
+        for product_id, quantity in quantities.items()
+        if quantity > available.get(product_id, 0)
+    }
+    if shortages and strict:
+        raise InsufficientStockError(shortages)
+
+    existing = {
+        hold.product_id: hold for hold in StockReservation.query.filter(
+            StockReservation.holder == holder,
+            StockReservation.product_id.in_(list(quantities))
+        ).all()
+    }
+    expires_at = datetime.utcnow() + get_reservation_ttl()
+
+    held = {}
+    for product_id, quantity in quantities.items():
+        quantity = min(quantity, available.get(product_id, 0))
+        hold = existing.get(product_id)
+        if quantity <= 0:
+            if hold:
+                db.session.delete(hold)
+            continue
+        if hold:
+            hold.quantity = quantity
+            hold.expires_at = expires_at
+        else:
+            db.session.add(StockReservation(
+                product_id=product_id,
+                holder=holder,
+                quantity=quantity,
+                expires_at=expires_at
+            ))
+        held[product_id] = quantity
+    return held
+
+
+def release(holder, product_ids=None):
+    """Drop a holder's holds, optionally only for some products. The caller commits."""
+    query = StockReservation.query.filter(StockReservation.holder == holder)
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return 0
+        query = query.filter(StockReservation.product_id.in_(product_ids))
+    return query.delete(synchronize_session=False)
+
+
+def sell(quantities, holder=None, reference=None):
+    """
+    Take sold stock off the shelf: check availability against everybody else's
+    holds, record sale movements (guarded decrements of stock_quantity) and drop
+    the holder's holds. Raises InsufficientStockError without changing anything
+    when any line cannot be filled. The caller commits.
+    """
+    products = lock_products(quantities)
+    available = available_stock(products, exclude_holder=holder)
+
+    shortages = {
+        product_id: {'requested': quantity, 'available': available.get(product_id, 0)}
+        for product_id, quantity in quantities.items()
+        if quantity > available.get(product_id, 0)
+    }
+    if shortages:
+        raise InsufficientStockError(shortages)
+
+    apply_movements(
+        StockMovement.SALE,
+        {product_id: -quantity for product_id, quantity in quantities.items()},
+        reference=reference
+    )
+
+    if holder:
+        release(holder)
+    return products
+
+
+def purge_expired_reservations(batch_size=1000):
+    """Delete expired holds in id batches; returns the number removed"""
+    removed = 0
+    now = datetime.utcnow()
+    while True:
+        ids = [row.id for row in db.session.query(StockReservation.id).filter(
+            StockReservation.expires_at <= now
+        ).limit(batch_size).all()]
+        if not ids:
+            break
+        removed += StockReservation.query.filter(StockReservation.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        if len(ids) < batch_size:
+            break
+    return removed
+
+
+# Stock ledger
+
+def order_reference(order_id):
+    return f'order:{order_id}'
+
+
+def apply_movements(movement_type, deltas, reference=None, note=None, created_by=None):
+    """
+    Apply signed stock changes ({product_id: delta}) and append them to the ledger.
+
+    Each change is a single UPDATE ... SET stock_quantity = stock_quantity + :delta,
+    so concurrent writers never overwrite each other; decrements are guarded so
+    stock cannot go below zero (InsufficientStockError). The caller commits.
+    """
+    movements = []
+    for product_id, delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        statement = update(Product).where(Product.id == product_id)
+        if delta < 0:
+            statement = statement.where(Product.stock_quantity >= -delta)
+        result = db.session.execute(statement.values(stock_quantity=Product.stock_quantity + delta))
+        if result.rowcount != 1:
+            current = db.session.query(Product.stock_quantity).filter(Product.id == product_id).scalar()
+            raise InsufficientStockError({product_id: {'requested': -delta, 'available': current or 0}})
+
+        movement = StockMovement(
+            product_id=product_id,
+            movement_type=movement_type,
+            quantity=delta,
+            reference=reference,
+            note=note,
+            created_by=created_by
+        )
+        db.session.add(movement)
+        movements.append(movement)
+
+    # Watch for threshold crossings where stock changes, rather than scanning for them
+    sync_low_stock(list(deltas), deltas=deltas)
+    return movements
+
+
+def set_stock(product_id, quantity, note=None, created_by=None):
+    """
+    Set a product's stock to an absolute value as an adjustment movement.
+    The row is locked while the delta is worked out so a concurrent sale is
+    not overwritten. Returns (old_quantity, new_quantity), or None if the
+    product does not exist. The caller commits.
+    """
+    product = Product.query.filter(Product.id == product_id).with_for_update().populate_existing().first()
+    if not product:
+        return None
+    old_quantity = product.stock_quantity or 0
+    apply_movements(StockMovement.ADJUSTMENT, {product_id: quantity - old_quantity},
+                    note=note, created_by=created_by)
+    return old_quantity, quantity
+
+
+def set_stock_levels(levels, movement_type=StockMovement.ADJUSTMENT, note=None, created_by=None):
+    """
+    Set absolute stock for many products at once ({product_id: quantity}), as
+    used by bulk imports. The rows are locked in one query, changed products
+    are updated with one executemany UPDATE and their movements inserted in
+    one batch. Returns the number of products whose stock changed. The caller
+    commits.
+    """
+    if not levels:
+        return 0
+    current = dict(db.session.query(Product.id, Product.stock_quantity).filter(
+        Product.id.in_(list(levels))
+    ).order_by(Product.id).with_for_update().all())
+
+    changes = [
+        (product_id, quantity, quantity - (current[product_id] or 0))
+        for product_id, quantity in sorted(levels.items())
+        if product_id in current and quantity != (current[product_id] or 0)
+    ]
+    if not changes:
+        return 0
+
+    products = Product.__table__
+    db.session.execute(
+        products.update().where(products.c.id == bindparam('b_id')).values(stock_quantity=bindparam('b_quantity')),
+        [{'b_id': product_id, 'b_quantity': quantity} for product_id, quantity, _ in changes]
+    )
+    now = datetime.utcnow()
+    db.session.execute(insert(StockMovement), [
+        {
+            'product_id': product_id,
+            'movement_type': movement_type,
+            'quantity': delta,
+            'note': note,
+            'created_by': created_by,
+            'created_at': now
+        } for product_id, _, delta in changes
+    ])
+    sync_low_stock([product_id for product_id, _, _ in changes])
+    return len(changes)
+
+
+def adjust_stock_bulk(product_ids, delta, movement_type=StockMovement.ADJUSTMENT, note=None, created_by=None):
+    """
+    Add the same delta to many products in one statement. Products that would
+    go below zero are skipped. Returns (adjusted_ids, skipped_ids). The caller
+    commits.
+    """
+    rows = db.session.query(Product.id, Product.stock_quantity).filter(
+        Product.id.in_(list(product_ids))
+    ).order_by(Product.id).with_for_update().all()
+    adjusted = [product_id for product_id, quantity in rows if (quantity or 0) + delta >= 0]
+    skipped = [product_id for product_id, quantity in rows if (quantity or 0) + delta < 0]
+    if not adjusted or not delta:
+        return [], skipped
+
+    db.session.execute(
+        update(Product)
+        .where(Product.id.in_(adjusted))
+        .values(stock_quantity=Product.stock_quantity + delta)
+        .execution_options(synchronize_session=False)
+    )
+    now = datetime.utcnow()
+    db.session.execute(insert(StockMovement), [
+        {
+            'product_id': product_id,
+            'movement_type': movement_type,
+            'quantity': delta,
+            'note': note,
+            'created_by': created_by,
+            'created_at': now
+        } for product_id in adjusted
+    ])
+    sync_low_stock(adjusted)
+    return adjusted, skipped
+
+
+def restock_order(order_id, note=None, created_by=None):
+    """
+    Put the stock sold for an order back on the shelf. Only what the ledger
+    recorded as sold is returned, so orders placed before stock was tracked
+    (or already restocked) are left alone. The caller commits.
+    """
+    reference = order_reference(order_id)
+    net = db.session.query(
+        StockMovement.product_id,
+        func.sum(StockMovement.quantity)
+    ).filter(
+        StockMovement.reference == reference,
+        StockMovement.movement_type.in_([StockMovement.SALE, StockMovement.CANCELLATION])
+    ).group_by(StockMovement.product_id).all()
+
+    deltas = {product_id: -int(total) for product_id, total in net if total and total < 0}
+    return apply_movements(StockMovement.CANCELLATION, deltas, reference=reference,
+                           note=note, created_by=created_by)
+
+
+def record_opening_balances(batch_size=500):
+    """
+    Give every product without one an opening movement, so that the ledger sum
+    matches stock_quantity for stock that existed before the ledger did.
+    Returns the number of products initialised.
+    """
+    initialised = 0
+    last_id = 0
+    while True:
+        ids = [row.id for row in db.session.query(Product.id).filter(
+            Product.id > last_id,
+            ~db.session.query(StockMovement.id).filter(
+                StockMovement.product_id == Product.id,
+                StockMovement.movement_type == StockMovement.OPENING
+            ).exists()
+        ).order_by(Product.id).limit(batch_size).all()]
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        products = lock_products(ids)
+        # Re-check under the lock in case another worker initialised them meanwhile
+        opened = {row.product_id for row in db.session.query(StockMovement.product_id).filter(
+            StockMovement.product_id.in_(ids),
+            StockMovement.movement_type == StockMovement.OPENING
+        ).all()}
+        products = [product for product in products if product.id not in opened]
+        ledger = dict(db.session.query(
+            StockMovement.product_id, func.sum(StockMovement.quantity)
+        ).filter(StockMovement.product_id.in_(ids)).group_by(StockMovement.product_id).all())
+
+        for product in products:
+            db.session.add(StockMovement(
+                product_id=product.id,
+                movement_type=StockMovement.OPENING,
+                quantity=(product.stock_quantity or 0) - int(ledger.get(product.id) or 0),
+                note='Opening balance'
+            ))
+        db.session.commit()
+        initialised += len(products)
+        if len(ids) < batch_size:
+            break
+    return initialised
+
+
+def _ledger_tail(product_ids, created_before=None):
+    """
+    {product_id: (sum, max_id)} of movements past each product's snapshot,
+    in one grouped query for the whole chunk
+    """
+    query = db.session.query(
+        StockMovement.product_id,
+        func.sum(StockMovement.quantity),
+        func.max(StockMovement.id)
+    ).outerjoin(
+        StockSnapshot, StockSnapshot.product_id == StockMovement.product_id
+    ).filter(
+        StockMovement.product_id.in_(product_ids),
+        StockMovement.id > func.coalesce(StockSnapshot.last_movement_id, 0)
+    )
+    if created_before is not None:
+        query = query.filter(StockMovement.created_at <= created_before)
+    return {
+        product_id: (int(total or 0), max_id)
+        for product_id, total, max_id in query.group_by(StockMovement.product_id).all()
+    }
+
+
+def take_stock_snapshots(chunk_size=500):
+    """
+    Roll new ledger movements into stock_snapshots, one chunk of products per
+    transaction. Movements younger than STOCK_SNAPSHOT_SETTLE_SECONDS are left
+    for the next run, so a transaction that allocated a lower movement id but
+    committed later is never skipped. Each snapshot is advanced with a
+    compare-and-set on last_movement_id, so workers running the job at the
+    same time cannot apply the same movements twice. Returns the number of
+    snapshots updated.
+    """
+    settle = current_app.config.get('STOCK_SNAPSHOT_SETTLE_SECONDS', 60)
+    cutoff = datetime.utcnow() - timedelta(seconds=settle)
+    updated = 0
+    last_id = 0
+    while True:
+        ids = [row.id for row in db.session.query(Product.id).filter(
+            Product.id > last_id
+        ).order_by(Product.id).limit(chunk_size).all()]
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        tail = _ledger_tail(ids, created_before=cutoff)
+        if tail:
+            seen = dict(db.session.query(
+                StockSnapshot.product_id, StockSnapshot.last_movement_id
+            ).filter(StockSnapshot.product_id.in_(list(tail))).all())
+            for product_id, (total, max_id) in tail.items():
+                if product_id not in seen:
+                    db.session.add(StockSnapshot(product_id=product_id, quantity=total, last_movement_id=max_id))
+                    updated += 1
+                    continue
+                result = db.session.execute(
+                    update(StockSnapshot)
+                    .where(StockSnapshot.product_id == product_id,
+                           StockSnapshot.last_movement_id == seen[product_id])
+                    .values(quantity=StockSnapshot.quantity + total, last_movement_id=max_id)
+                    .execution_options(synchronize_session=False)
+                )
+                updated += result.rowcount
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Another worker created the same snapshots first; the chunk is retried next run
+                db.session.rollback()
+        if len(ids) < chunk_size:
+            break
+    return updated
+
+
+def reconcile_stock(chunk_size=500):
+    """
+    Verify stock_quantity against the ledger (snapshot plus newer movements)
+    in chunks of products, logging a stock_drift warning for each mismatch.
+    Returns a report with the discrepancies found.
+    """
+    record_opening_balances(batch_size=chunk_size)
+
+    checked = 0
+    discrepancies = []
+    last_id = 0
+    while True:
+        rows = db.session.query(
+            Product.id, Product.stock_quantity, StockSnapshot.quantity
+        ).outerjoin(
+            StockSnapshot, StockSnapshot.product_id == Product.id
+        ).filter(Product.id > last_id).order_by(Product.id).limit(chunk_size).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        tail = _ledger_tail([row[0] for row in rows])
+        for product_id, stock_quantity, snapshot_quantity in rows:
+            ledger_quantity = (snapshot_quantity or 0) + tail.get(product_id, (0, None))[0]
+            stock_quantity = stock_quantity or 0
+            if ledger_quantity != stock_quantity:
+                discrepancies.append({
+                    'product_id': product_id,
+                    'stock_quantity': stock_quantity,
+                    'ledger_quantity': ledger_quantity,
+                    'difference': stock_quantity - ledger_quantity
+                })
+        checked += len(rows)
+        # End the read transaction so each chunk sees current data
+        db.session.commit()
+        if len(rows) < chunk_size:
+            break
+
+    for discrepancy in discrepancies:
+        current_app.logger.warning(json.dumps({'event': 'stock_drift', **discrepancy}))
+    return {'products_checked': checked, 'discrepancies': discrepancies}
+
+
+# Low stock
+
+def get_low_stock_threshold():
+    return current_app.config.get('LOW_STOCK_THRESHOLD', 10)
+
+
+def sync_low_stock(product_ids, deltas=None):
+    """
+    Bring low_stock_products up to date for the given products. Products that
+    have just dropped below the threshold are queued for an admin alert, sent
+    once the transaction commits. Returns their IDs. The caller commits.
+
+    With deltas ({product_id: change just applied}), products that went in or
+    out of stock also bump the products cache version in the same transaction.
+    """
+    product_ids = list(set(product_ids))
+    if not product_ids:
+        return []
+    threshold = get_low_stock_threshold()
+
+    rows = db.session.query(Product.id, Product.stock_quantity, Product.is_active).filter(
+        Product.id.in_(product_ids)
+    ).all()
+    # Locking read, so a concurrent writer's flag is seen rather than inserted twice
+    flagged = {
+        entry.product_id: entry for entry in LowStockProduct.query.filter(
+            LowStockProduct.product_id.in_(product_ids)
+        ).with_for_update().all()
+    }
+
+    crossed = []
+    availability_changed = False
+    for product_id, stock_quantity, is_active in rows:
+        stock_quantity = stock_quantity or 0
+        if deltas and (stock_quantity > 0) != (stock_quantity - deltas.get(product_id, 0) > 0):
+            availability_changed = True
+        entry = flagged.get(product_id)
+        if is_active and stock_quantity < threshold:
+            if entry is None:
+                db.session.add(LowStockProduct(
+                    product_id=product_id,
+                    stock_quantity=stock_quantity,
+                    threshold=threshold
+                ))
+                crossed.append(product_id)
+            else:
+                entry.stock_quantity = stock_quantity
+                entry.threshold = threshold
+        elif entry is not None:
+            # Restocked or deactivated; a later drop alerts again
+            db.session.delete(entry)
+
+    if crossed:
+        db.session.info.setdefault('low_stock_crossed', set()).update(crossed)
+    if availability_changed and not db.session.info.get('products_cache_bumped'):
+        cache.bump(PRODUCTS)
+        db.session.info['products_cache_bumped'] = True
+    return crossed
+
+
+def rebuild_low_stock(chunk_size=500):
+    """
+    Re-derive low_stock_products from the products table, for stock changed
+    outside the application. Uses idx_product_active_stock. Returns the number
+    of products that newly crossed the threshold.
+    """
+    threshold = get_low_stock_threshold()
+    candidates = {row.id for row in db.session.query(Product.id).filter(
+        Product.is_active == True,
+        Product.stock_quantity < threshold
+    ).all()}
+    candidates.update(row.product_id for row in db.session.query(LowStockProduct.product_id).all())
+
+    candidates = sorted(candidates)
+    crossed = 0
+    for start in range(0, len(candidates), chunk_size):
+        crossed += len(sync_low_stock(candidates[start:start + chunk_size]))
+        db.session.commit()
+    return crossed
+
+
+def get_low_stock_recipients():
+    configured = current_app.config.get('LOW_STOCK_ALERT_RECIPIENTS')
+    if configured:
+        return [email.strip() for email in configured.split(',') if email.strip()]
+    return [row.email for row in db.session.query(AdminUser.email).filter(AdminUser.is_active == True).all()]
+
+
+def send_low_stock_alert(product_ids):
+    """Email the admins about products that ran low and have not been reported yet"""
+    entries = db.session.query(LowStockProduct, Product).join(
+        Product, Product.id == LowStockProduct.product_id
+    ).filter(
+        LowStockProduct.product_id.in_(product_ids),
+        LowStockProduct.notified_at.is_(None)
+    ).order_by(LowStockProduct.stock_quantity).all()
+    if not entries:
+        return 0
+
+    recipients = get_low_stock_recipients()
+    if not recipients:
+        current_app.logger.warning("Low stock alert not sent: no recipients")
+        return 0
+
+    rows = ''.join(
+        f"<tr><td>{product.name}</td><td>{entry.stock_quantity}</td></tr>"
+        for entry, product in entries
+    )
+    msg = Message(
+        subject=f"Low stock: {len(entries)} product(s) below {entries[0][0].threshold}",
+        recipients=recipients,
+        html=f"""
+        <p>The following products have dropped below the low stock threshold:</p>
+        <table>
+            <tr><th>Product</th><th>In stock</th></tr>
+            {rows}
+        </table>
+        <p>Fruit Design</p>
+        """
+    )
+    mail.send(msg)
+
+    now = datetime.utcnow()
+    for entry, _ in entries:
+        entry.notified_at = now
+    db.session.commit()
+    return len(entries)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _queue_low_stock_alerts(session):
+    product_ids = session.info.pop('low_stock_crossed', None)
+    if product_ids and current_app.config.get('LOW_STOCK_ALERTS_ENABLED', True):
+        background_tasks.submit(send_low_stock_alert, sorted(product_ids))
+
+
+@event.listens_for(db.session, 'after_commit')
+def _forget_products_version(session):
+    if session.info.pop('products_cache_bumped', None):
+        cache.forget(PRODUCTS)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_low_stock_alerts(session):
+    session.info.pop('low_stock_crossed', None)
+    session.info.pop('products_cache_bumped', None)
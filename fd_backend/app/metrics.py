@@ -0,0 +1,436 @@
+import glob
+import hmac
+import ipaddress
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, current_app, g, request
+
+try:
+    import fcntl
+except ImportError:  # Windows, where only the development server runs
+    fcntl = None
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Counters and histograms of exited workers, folded together so their files can be removed
+EXITED_FILE = 'exited_metrics.json'
+FOLD_LOCK_FILE = 'metrics.lock'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.extend(extra)
+    if not pairs:
+        return ''
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+class _Metric:
+    """Base class for a labelled metric family"""
+    type_name = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        with self.registry.lock:
+            return [[list(key), self._copy(value)] for key, value in self.values.items()]
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(registry, name, documentation, labelnames)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+                self.values[key] = state
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][index] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _copy(self, value):
+        return {'buckets': list(value['buckets']), 'sum': value['sum'], 'count': value['count']}
+
+
+class Metrics:
+    """
+    Request and business metrics exposed at /metrics in Prometheus text format.
+
+    When METRICS_DIR is set, every worker process periodically writes its
+    values to its own file in that directory and a scrape merges all files,
+    so the numbers cover every Passenger worker rather than the one that
+    happened to serve the scrape. A scrape folds the files of exited workers
+    into one file and removes them, so recycled workers do not pile up.
+
+    /metrics answers only clients in METRICS_ALLOWED_IPS or requests
+    carrying METRICS_TOKEN as a bearer token.
+    """
+
+    def __init__(self, app=None):
+        self.lock = threading.RLock()
+        self.metrics = []
+        self._last_flush = 0.0
+        self._process_key = None  # (pid, file name suffix), reset in forked children
+
+        # HTTP metrics
+        self.http_requests_total = Counter(
+            self, 'fruitdesign_http_requests_total', 'Total HTTP requests',
+            ('blueprint', 'endpoint', 'method', 'status'))
+        self.http_request_duration_seconds = Histogram(
+            self, 'fruitdesign_http_request_duration_seconds', 'HTTP request latency in seconds',
+            ('blueprint', 'endpoint', 'method'))
+        self.http_requests_in_flight = Gauge(
+            self, 'fruitdesign_http_requests_in_flight', 'HTTP requests currently being served',
+            ('blueprint',))
+
+        # Business metrics
+        self.checkouts_total = Counter(
+            self, 'fruitdesign_checkouts_total', 'Orders placed', ('source',))
+        self.logins_total = Counter(
+            self, 'fruitdesign_logins_total', 'Login attempts', ('result',))
+        self.bcrypt_duration_seconds = Histogram(
+            self, 'fruitdesign_bcrypt_duration_seconds', 'Time spent hashing or checking passwords',
+            ('operation',), buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0))
+        self.cache_requests_total = Counter(
+            self, 'fruitdesign_cache_requests_total', 'Cache lookups', ('namespace', 'result'))
+        self.feedback_analyzed_total = Counter(
+            self, 'fruitdesign_feedback_analyzed_total', 'Feedback messages tagged by the analysis stage',
+            ('sentiment',))
+        self.feedback_analysis_batch_seconds = Histogram(
+            self, 'fruitdesign_feedback_analysis_batch_seconds', 'Time to analyze and store one batch of feedback',
+            buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+
+        if app is not None:
+            self.init_app(app)
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_DIR', None)
+        app.config.setdefault('METRICS_FLUSH_INTERVAL', 5)
+        app.config.setdefault('METRICS_TOKEN', None)
+        app.config.setdefault('METRICS_ALLOWED_IPS', '127.0.0.1,::1')
+
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        metrics_dir = app.config['METRICS_DIR']
+        if metrics_dir:
+            try:
+                os.makedirs(metrics_dir, exist_ok=True)
+            except OSError as e:
+                app.logger.error(f"Error creating metrics directory {metrics_dir}: {e}")
+
+        app.before_request(self._start_request)
+        app.after_request(self._record_response)
+        app.teardown_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    # Request hooks
+    @staticmethod
+    def _route_labels():
+        return request.blueprint or 'app', request.endpoint or 'unmatched'
+
+    def _start_request(self):
+        blueprint, _ = self._route_labels()
+        g.metrics_started_at = time.perf_counter()
+        g.metrics_recorded = False
+        self.http_requests_in_flight.inc(blueprint=blueprint)
+
+    def _record_response(self, response):
+        self._observe_request(response.status_code)
+        return response
+
+    def _finish_request(self, exc):
+        if 'metrics_started_at' not in g:
+            return
+        if not g.metrics_recorded:
+            self._observe_request(500)
+        blueprint, _ = self._route_labels()
+        self.http_requests_in_flight.dec(blueprint=blueprint)
+        self.maybe_flush()
+
+    def _observe_request(self, status_code):
+        if 'metrics_started_at' not in g:
+            return
+        blueprint, endpoint = self._route_labels()
+        elapsed = time.perf_counter() - g.metrics_started_at
+        self.http_requests_total.inc(
+            blueprint=blueprint, endpoint=endpoint, method=request.method, status=status_code)
+        self.http_request_duration_seconds.observe(
+            elapsed, blueprint=blueprint, endpoint=endpoint, method=request.method)
+        g.metrics_recorded = True
+
+    # Multi-process aggregation
+    def _process_file(self, metrics_dir):
+        """
+        This process's file. Named by pid plus a random suffix chosen once per
+        process, so a worker that is given a dead worker's recycled pid does
+        not overwrite (and lose) the dead worker's counters.
+        """
+        pid = os.getpid()
+        if self._process_key is None or self._process_key[0] != pid:
+            self._process_key = (pid, f'{pid}_{secrets.token_hex(4)}')
+        return os.path.join(metrics_dir, f'metrics_{self._process_key[1]}.json')
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def maybe_flush(self, force=False):
+        metrics_dir = current_app.config.get('METRICS_DIR')
+        if not metrics_dir:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < current_app.config.get('METRICS_FLUSH_INTERVAL', 5):
+            return
+        self._last_flush = now
+
+        path = self._process_file(metrics_dir)
+        tmp_path = f'{path}.tmp'
+        try:
+            with open(tmp_path, 'w') as fh:
+                json.dump({'pid': os.getpid(), 'metrics': self.snapshot()}, fh)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            current_app.logger.error(f"Error writing metrics file {path}: {e}")
+
+    @staticmethod
+    def _pid_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    @staticmethod
+    def _merge(metric, values, samples):
+        """Add a snapshot's samples of `metric` into values ({label_tuple: value})"""
+        for labels, value in samples:
+            key = tuple(labels)
+            if metric.type_name == 'histogram':
+                current = values.setdefault(key, {'buckets': [0] * len(metric.buckets), 'sum': 0.0, 'count': 0})
+                current['buckets'] = [a + b for a, b in zip(current['buckets'], value['buckets'])]
+                current['sum'] += value['sum']
+                current['count'] += value['count']
+            else:
+                values[key] = values.get(key, 0.0) + value
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _fold_exited(self, metrics_dir):
+        """
+        Fold the counters and histograms of exited workers into EXITED_FILE
+        and remove their files. Gauges of exited workers are stale and are
+        dropped. Folded file names are recorded before the files are removed,
+        so a fold interrupted in between never counts a file twice.
+        """
+        exited_path = os.path.join(metrics_dir, EXITED_FILE)
+        lock_handle = None
+        try:
+            if fcntl is not None:
+                lock_handle = open(os.path.join(metrics_dir, FOLD_LOCK_FILE), 'a')
+                fcntl.flock(lock_handle, fcntl.LOCK_EX)
+
+            dead = []
+            for path in glob.glob(os.path.join(metrics_dir, 'metrics_*.json')):
+                data = self._read(path)
+                if data is not None and not self._pid_alive(data.get('pid', 0)):
+                    dead.append((path, data))
+
+            exited = self._read(exited_path) or {'pid': 0, 'metrics': {}, 'folded': []}
+            # Names whose files are gone need not be remembered any more
+            folded = [name for name in exited['folded'] if os.path.exists(os.path.join(metrics_dir, name))]
+            dead = [(path, data) for path, data in dead if os.path.basename(path) not in folded]
+            if not dead and len(folded) == len(exited['folded']):
+                return
+
+            for metric in self.metrics:
+                if metric.type_name == 'gauge':
+                    continue
+                values = {}
+                self._merge(metric, values, exited['metrics'].get(metric.name, []))
+                for _, data in dead:
+                    self._merge(metric, values, data['metrics'].get(metric.name, []))
+                exited['metrics'][metric.name] = [[list(key), value] for key, value in values.items()]
+            exited['folded'] = folded + [os.path.basename(path) for path, _ in dead]
+
+            tmp_path = f'{exited_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as fh:
+                json.dump(exited, fh)
+            os.replace(tmp_path, exited_path)
+            for path, _ in dead:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        except OSError as e:
+            current_app.logger.error(f"Error folding exited worker metrics in {metrics_dir}: {e}")
+        finally:
+            if lock_handle is not None:
+                lock_handle.close()
+
+    def collect(self):
+        """Return {metric_name: {label_tuple: value}} merged across worker processes"""
+        snapshots = [self.snapshot()]
+        metrics_dir = current_app.config.get('METRICS_DIR')
+        if metrics_dir:
+            self._fold_exited(metrics_dir)
+            own_file = self._process_file(metrics_dir)
+            exited = self._read(os.path.join(metrics_dir, EXITED_FILE))
+            for path in glob.glob(os.path.join(metrics_dir, 'metrics_*.json')):
+                if path == own_file:
+                    continue
+                data = self._read(path)
+                if data is None:
+                    continue
+                if exited and os.path.basename(path) in exited['folded']:
+                    # Already counted in the exited file; removed by the next fold
+                    continue
+                # Gauges of exited workers are stale; counters are kept so totals never go backwards
+                data['alive'] = self._pid_alive(data.get('pid', 0))
+                snapshots.append(data)
+            if exited:
+                exited['alive'] = False
+                snapshots.append(exited)
+
+        merged = {}
+        for metric in self.metrics:
+            values = {}
+            for snap_index, snap in enumerate(snapshots):
+                if snap_index == 0:
+                    samples = snap.get(metric.name, [])
+                else:
+                    if metric.type_name == 'gauge' and not snap['alive']:
+                        continue
+                    samples = snap['metrics'].get(metric.name, [])
+                self._merge(metric, values, samples)
+            merged[metric.name] = values
+        return merged
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        merged = self.collect()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            for key, value in sorted(merged[metric.name].items()):
+                if metric.type_name == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, value['buckets']):
+                        cumulative += count
+                        labels = _format_labels(metric.labelnames, key, [('le', _format_value(bound))])
+                        lines.append(f'{metric.name}_bucket{labels} {cumulative}')
+                    labels = _format_labels(metric.labelnames, key, [('le', '+Inf')])
+                    lines.append(f'{metric.name}_bucket{labels} {value["count"]}')
+                    labels = _format_labels(metric.labelnames, key)
+                    lines.append(f'{metric.name}_sum{labels} {_format_value(value["sum"])}')
+                    lines.append(f'{metric.name}_count{labels} {value["count"]}')
+                else:
+                    labels = _format_labels(metric.labelnames, key)
+                    lines.append(f'{metric.name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _allowed():
+        """Whether the request carries METRICS_TOKEN or comes from METRICS_ALLOWED_IPS"""
+        token = current_app.config.get('METRICS_TOKEN')
+        header = request.headers.get('Authorization', '')
+        if token and header.startswith('Bearer ') and hmac.compare_digest(header[7:].encode(), token.encode()):
+            return True
+        try:
+            address = ipaddress.ip_address(request.remote_addr or '')
+        except ValueError:
+            return False
+        for network in (current_app.config.get('METRICS_ALLOWED_IPS') or '').split(','):
+            try:
+                if network.strip() and address in ipaddress.ip_network(network.strip(), strict=False):
+                    return True
+            except ValueError:
+                current_app.logger.error(f"Invalid METRICS_ALLOWED_IPS entry: {network.strip()}")
+        return False
+
+    def metrics_view(self):
+        if not self._allowed():
+            abort(403)
+        self.maybe_flush(force=True)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
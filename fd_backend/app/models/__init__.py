@@ -1,9 +1,12 @@
 # # Importing all models to ensure they are registered with SQLAlchemy
 from app.extensions import db  # Importing the database extension
-from .customer import Customer
-from .order import Order, OrderItem
-from .product import Product
-from .feedback import Feedback
+from .customer import Customer, CustomerStats, CustomerErasure
+from .order import Order, OrderItem, OrderStatusHistory
+from .product import Product, ProductVariant
+from .category import Category
+from .feedback import Feedback, FeedbackTopic
 from .admin_user import AdminUser
 from .contact_info import ContactInfo
-from .cart import Cart, CartItem 
\ No newline at end of file
+from .cart import Cart, CartItem, GuestCart
+from .inventory import StockReservation, StockMovement, StockSnapshot, LowStockProduct
+from .cache_namespace import CacheNamespace
\ No newline at end of file
@@ -0,0 +1,12 @@
+from app.extensions import db
+from datetime import datetime
+
+class CacheNamespace(db.Model):
+    """Version counter per cache namespace, shared by all worker processes"""
+    __tablename__ = 'cache_namespaces'
+    namespace = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CacheNamespace {self.namespace} v{self.version}>'
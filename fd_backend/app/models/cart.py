@@ -1,5 +1,6 @@
 from app.extensions import db
 from datetime import datetime
+import json
 
 class Cart(db.Model):
     __tablename__ = 'carts'
@@ -17,6 +18,7 @@ class Cart(db.Model):
     
     __table_args__ = (
         db.Index('idx_cart_active', 'is_active'),
+        db.Index('idx_cart_customer', 'customer_id'),
     )
     
     def __repr__(self):
@@ -39,4 +41,49 @@ class CartItem(db.Model):
     )
     
     def __repr__(self):
-        return f'<CartItem {self.id} for Product {self.product_id}>'
\ No newline at end of file
+        return f'<CartItem {self.id} for Product {self.product_id}>'
+
+class GuestCart(db.Model):
+    __tablename__ = 'guest_carts'
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(64), unique=True, nullable=False)
+    # Compact JSON map of product_id -> quantity, e.g. {"3":2,"7":1}
+    items = db.Column(db.Text, nullable=False, default='{}')
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_guest_cart_expires', 'expires_at'),
+    )
+    
+    def get_items(self):
+        try:
+            return {int(product_id): quantity for product_id, quantity in json.loads(self.items or '{}').items()}
+        except (TypeError, ValueError):
+            return {}
+    
+    def set_items(self, items_dict):
+        self.items = json.dumps({str(product_id): quantity for product_id, quantity in items_dict.items()}, separators=(',', ':'))
+    
+    def touch(self, ttl):
+        """Extend the expiry by ttl (a timedelta) from now"""
+        self.expires_at = datetime.utcnow() + ttl
+    
+    @classmethod
+    def purge_expired(cls, batch_size=1000):
+        """Delete expired guest carts in id batches; returns the number removed"""
+        removed = 0
+        now = datetime.utcnow()
+        while True:
+            ids = [row.id for row in db.session.query(cls.id).filter(cls.expires_at < now).limit(batch_size).all()]
+            if not ids:
+                break
+            removed += cls.query.filter(cls.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            if len(ids) < batch_size:
+                break
+        return removed
+    
+    def __repr__(self):
+        return f'<GuestCart {self.id}>'
@@ -0,0 +1,32 @@
+from app.extensions import db
+from datetime import datetime
+
+class Category(db.Model):
+    __tablename__ = 'categories'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    slug = db.Column(db.String(120), unique=True, nullable=False)
+    parent_id = db.Column(db.Integer, db.ForeignKey('categories.id', ondelete='SET NULL'), nullable=True)
+    # Active products filed directly under this category, kept by categories.refresh_category_counts
+    product_count = db.Column(db.Integer, default=0, nullable=False)
+    display_order = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    parent = db.relationship('Category', remote_side=[id], backref='children')
+    
+    __table_args__ = (
+        db.Index('idx_category_parent', 'parent_id'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'slug': self.slug,
+            'parent_id': self.parent_id,
+            'product_count': self.product_count,
+            'display_order': self.display_order
+        }
+    
+    def __repr__(self):
+        return f'<Category {self.slug}>'
@@ -1,13 +1,17 @@
 # app/models/customer.py
 from app.extensions import db
+from sqlalchemy.orm import validates
 from datetime import datetime
 import bcrypt  # Import bcrypt directly
+import json
 
 class Customer(db.Model):
     __tablename__ = 'customers'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(255), nullable=False)
     phone = db.Column(db.String(20), nullable=False)
+    # Digits only with the country code, e.g. 254700123456; set from phone for prefix search
+    phone_normalized = db.Column(db.String(20), nullable=True)
     email = db.Column(db.String(120), unique=True, nullable=True)
     address = db.Column(db.String(255), nullable=True)
     password = db.Column(db.String(255), nullable=False)
@@ -22,12 +26,23 @@ class Customer(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     feedbacks = db.relationship('Feedback', back_populates='customer', cascade='all, delete-orphan')
     orders = db.relationship('Order', back_populates='customer', cascade='all, delete-orphan')
+    stats = db.relationship('CustomerStats', uselist=False, cascade='all, delete-orphan', passive_deletes=True)
     
     __table_args__ = (
         db.Index('idx_customer_email', 'email'),
         db.Index('idx_customer_active', 'is_active'),
+        db.Index('idx_customer_phone_normalized', 'phone_normalized'),
+        db.Index('idx_customer_status', 'is_active', 'email_verified', 'id'),
+        # Word search on names; a FULLTEXT index on MySQL, a plain index elsewhere
+        db.Index('ft_customer_name', 'name', mysql_prefix='FULLTEXT'),
     )
     
+    @validates('phone')
+    def validate_phone(self, key, phone):
+        from app.customers import normalize_phone
+        self.phone_normalized = normalize_phone(phone)
+        return phone
+    
     def set_password(self, password):
         """Hash password with bcrypt"""
         try:
@@ -72,4 +87,75 @@ class Customer(db.Model):
             'last_login': self.last_login.strftime('%Y-%m-%d %H:%M:%S') if self.last_login else None,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
             'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+class CustomerStats(db.Model):
+    """Per-customer order aggregates, kept current as orders are placed and cancelled"""
+    __tablename__ = 'customer_stats'
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.id', ondelete='CASCADE'), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    cancelled_count = db.Column(db.Integer, nullable=False, default=0)
+    # Sum of order totals, excluding cancelled orders
+    lifetime_value = db.Column(db.Float, nullable=False, default=0.0)
+    first_order_at = db.Column(db.DateTime, nullable=True)
+    last_order_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CustomerStats {self.customer_id}>'
+    
+    def to_dict(self):
+        return {
+            'order_count': self.order_count,
+            'cancelled_count': self.cancelled_count,
+            'lifetime_value': round(self.lifetime_value or 0.0, 2),
+            'first_order_at': self.first_order_at.isoformat() if self.first_order_at else None,
+            'last_order_at': self.last_order_at.isoformat() if self.last_order_at else None
+        }
+
+class CustomerErasure(db.Model):
+    """A background job erasing a customer's data, with its progress"""
+    __tablename__ = 'customer_erasures'
+    id = db.Column(db.Integer, primary_key=True)
+    # Not a foreign key: the customer row is gone when a delete finishes
+    customer_id = db.Column(db.Integer, nullable=False)
+    mode = db.Column(db.String(20), nullable=False, default='delete')  # delete or anonymize
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    step = db.Column(db.String(50), nullable=True)
+    # JSON map of table -> rows deleted or anonymized so far
+    progress = db.Column(db.Text, nullable=False, default='{}')
+    error = db.Column(db.Text, nullable=True)
+    requested_by = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_customer_erasure_customer', 'customer_id'),
+        db.Index('idx_customer_erasure_status', 'status', 'updated_at'),
+    )
+    
+    def __repr__(self):
+        return f'<CustomerErasure {self.id} for Customer {self.customer_id}>'
+    
+    def get_progress(self):
+        try:
+            return json.loads(self.progress or '{}')
+        except (TypeError, ValueError):
+            return {}
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'customer_id': self.customer_id,
+            'mode': self.mode,
+            'status': self.status,
+            'step': self.step,
+            'progress': self.get_progress(),
+            'error': self.error,
+            'requested_by': self.requested_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
         }
\ No newline at end of file
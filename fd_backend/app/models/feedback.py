@@ -9,14 +9,35 @@ class Feedback(db.Model):
     feedback_message = db.Column(db.Text, nullable=False)
     rating = db.Column(db.Integer, nullable=True)
     response = db.Column(db.Text, nullable=True)
+    # When the customer was emailed the current response (or when it was given without
+    # an email); NULL while an email is owed
+    response_notified_at = db.Column(db.DateTime, nullable=True)
     status = db.Column(db.String(50), default='new')
+    # Filled by the background analysis in app/sentiment.py; analyzed_at is NULL until then
+    sentiment_score = db.Column(db.Float, nullable=True)  # -1 (negative) to 1 (positive)
+    sentiment = db.Column(db.String(10), nullable=True)  # negative, neutral or positive
+    urgency = db.Column(db.Integer, nullable=True)  # 0-100, higher needs attention sooner
+    analyzed_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     customer = db.relationship('Customer', back_populates='feedbacks')
+    topics = db.relationship('FeedbackTopic', cascade='all, delete-orphan', passive_deletes=True,
+                             order_by='FeedbackTopic.topic')
     
     __table_args__ = (
         db.Index('idx_feedback_customer', 'customer_id'),
         db.Index('idx_feedback_status', 'status'),
+        # Inbox pages (newest first) within a status or rating, and the rating stats per status
+        db.Index('idx_feedback_status_id', 'status', 'id'),
+        db.Index('idx_feedback_rating_id', 'rating', 'id'),
+        db.Index('idx_feedback_status_rating', 'status', 'rating'),
+        db.Index('idx_feedback_created', 'created_at'),
+        # Triage order, and the analysis backlog
+        db.Index('idx_feedback_urgency_id', 'urgency', 'id'),
+        db.Index('idx_feedback_sentiment_id', 'sentiment', 'id'),
+        db.Index('idx_feedback_analyzed', 'analyzed_at', 'id'),
+        # Word search on title and message; a FULLTEXT index on MySQL, a plain index elsewhere
+        db.Index('ft_feedback_text', 'title', 'feedback_message', mysql_prefix='FULLTEXT'),
     )
     
     def __repr__(self):
@@ -31,6 +52,24 @@ class Feedback(db.Model):
             'rating': self.rating,
             'response': self.response,
             'status': self.status,
+            'sentiment': self.sentiment,
+            'sentiment_score': self.sentiment_score,
+            'urgency': self.urgency,
+            'topics': [topic.topic for topic in self.topics],
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
             'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-        }
\ No newline at end of file
+        }
+
+
+class FeedbackTopic(db.Model):
+    """A topic (e.g. 'delivery', 'taste', 'price') detected in a feedback message"""
+    __tablename__ = 'feedback_topics'
+    feedback_id = db.Column(db.Integer, db.ForeignKey('feedback.id', ondelete='CASCADE'), primary_key=True)
+    topic = db.Column(db.String(50), primary_key=True)
+    
+    __table_args__ = (
+        db.Index('idx_feedback_topic', 'topic', 'feedback_id'),
+    )
+    
+    def __repr__(self):
+        return f'<FeedbackTopic {self.topic} for Feedback {self.feedback_id}>'
@@ -0,0 +1,93 @@
+from app.extensions import db
+from datetime import datetime
+
+class StockReservation(db.Model):
+    __tablename__ = 'stock_reservations'
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    # Who holds the stock, e.g. 'cart:12' or 'guest:34'
+    holder = db.Column(db.String(64), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        # Covers the SUM(quantity) of active holds per product
+        db.Index('idx_reservation_product_expires', 'product_id', 'expires_at', 'quantity'),
+        db.UniqueConstraint('holder', 'product_id', name='uq_reservation_holder_product'),
+        db.Index('idx_reservation_expires', 'expires_at'),
+    )
+    
+    def __repr__(self):
+        return f'<StockReservation {self.holder} x{self.quantity} of Product {self.product_id}>'
+
+
+class StockMovement(db.Model):
+    """Append-only ledger row; stock_quantity is the running sum of these deltas"""
+    __tablename__ = 'stock_movements'
+    RECEIPT = 'receipt'
+    SALE = 'sale'
+    CANCELLATION = 'cancellation'
+    ADJUSTMENT = 'adjustment'
+    OPENING = 'opening'
+    TYPES = (RECEIPT, SALE, CANCELLATION, ADJUSTMENT, OPENING)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    movement_type = db.Column(db.String(20), nullable=False)
+    # Signed change to stock_quantity: sales are negative, receipts and cancellations positive
+    quantity = db.Column(db.Integer, nullable=False)
+    # What caused the movement, e.g. 'order:12'
+    reference = db.Column(db.String(64), nullable=True)
+    note = db.Column(db.String(255), nullable=True)
+    created_by = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Covers per-product history and SUM(quantity) past a snapshot's last_movement_id
+        db.Index('idx_movement_product_id', 'product_id', 'id', 'quantity'),
+        db.Index('idx_movement_reference', 'reference'),
+    )
+    
+    def __repr__(self):
+        return f'<StockMovement {self.movement_type} {self.quantity:+d} of Product {self.product_id}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'movement_type': self.movement_type,
+            'quantity': self.quantity,
+            'reference': self.reference,
+            'note': self.note,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class StockSnapshot(db.Model):
+    """Checkpoint of the ledger: stock as of last_movement_id"""
+    __tablename__ = 'stock_snapshots'
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    last_movement_id = db.Column(db.Integer, nullable=False, default=0)
+    taken_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<StockSnapshot Product {self.product_id}: {self.quantity} @ {self.last_movement_id}>'
+
+class LowStockProduct(db.Model):
+    """Materialized set of active products below the low-stock threshold"""
+    __tablename__ = 'low_stock_products'
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    stock_quantity = db.Column(db.Integer, nullable=False)
+    threshold = db.Column(db.Integer, nullable=False)
+    flagged_at = db.Column(db.DateTime, default=datetime.utcnow)
+    notified_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.Index('idx_low_stock_quantity', 'stock_quantity'),
+    )
+    
+    def __repr__(self):
+        return f'<LowStockProduct {self.product_id}: {self.stock_quantity} < {self.threshold}>'
@@ -15,6 +15,7 @@ class OrderItem(db.Model):
     
     __table_args__ = (
         db.Index('idx_order_item_product', 'product_id'),
+        db.Index('idx_order_item_order', 'order_id'),
     )
     
     @property 
@@ -33,6 +34,8 @@ class Order(db.Model):
     order_date = db.Column(db.DateTime, default=datetime.utcnow)
     total_amount = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(50), default='Pending')
+    # Bumped on every status change; writers compare-and-swap on it
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     commitment_fee_paid = db.Column(db.Boolean, default=False)
     payment_date = db.Column(db.DateTime, nullable=True)
     delivery_date = db.Column(db.DateTime, nullable=True)
@@ -41,12 +44,47 @@ class Order(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     customer = db.relationship('Customer', back_populates='orders')
     items = db.relationship('OrderItem', back_populates='order', cascade='all, delete-orphan')
+    status_history = db.relationship('OrderStatusHistory', back_populates='order', cascade='all, delete-orphan',
+                                     order_by='OrderStatusHistory.id')
     
     __table_args__ = (
         db.Index('idx_order_customer', 'customer_id'),
+        # A customer's most recent orders
+        db.Index('idx_order_customer_date', 'customer_id', 'order_date'),
         db.Index('idx_order_status', 'status'),
         db.Index('idx_order_date', 'order_date'),
     )
     
     def __repr__(self):
-        return f'<Order {self.id} by Customer {self.customer_id}>'
\ No newline at end of file
+        return f'<Order {self.id} by Customer {self.customer_id}>'
+
+class OrderStatusHistory(db.Model):
+    """Append-only log of order status changes"""
+    __tablename__ = 'order_status_history'
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id', ondelete='CASCADE'), nullable=False)
+    from_status = db.Column(db.String(50), nullable=True)
+    to_status = db.Column(db.String(50), nullable=False)
+    # Order version after the change
+    version = db.Column(db.Integer, nullable=False)
+    changed_by = db.Column(db.String(64), nullable=True)
+    note = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    order = db.relationship('Order', back_populates='status_history')
+    
+    __table_args__ = (
+        db.Index('idx_order_status_history_order', 'order_id', 'id'),
+    )
+    
+    def __repr__(self):
+        return f'<OrderStatusHistory Order {self.order_id}: {self.from_status} -> {self.to_status}>'
+    
+    def to_dict(self):
+        return {
+            'from_status': self.from_status,
+            'to_status': self.to_status,
+            'version': self.version,
+            'changed_by': self.changed_by,
+            'note': self.note,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
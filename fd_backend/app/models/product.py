@@ -4,10 +4,17 @@ from datetime import datetime
 class Product(db.Model):
     __tablename__ = 'products'
     id = db.Column(db.Integer, primary_key=True)
+    # Stock keeping unit; the natural key used by bulk import
+    sku = db.Column(db.String(64), unique=True, nullable=True)
     name = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text, nullable=True)
     price = db.Column(db.Float, nullable=False)
+    # Cheapest and dearest active variant (or price when there are none), kept by catalog.refresh_price_range
+    min_price = db.Column(db.Float, nullable=True)
+    max_price = db.Column(db.Float, nullable=True)
+    # Display name of the category; category_id is what filters and counts use
     category = db.Column(db.String(100), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True)
     stock_quantity = db.Column(db.Integer, default=0)
     image_url = db.Column(db.String(255), nullable=True)
     is_active = db.Column(db.Boolean, default=True)
@@ -17,11 +24,19 @@ class Product(db.Model):
     order_items = db.relationship('OrderItem', back_populates='product', cascade='all, delete-orphan')
     cart_items = db.relationship('CartItem', back_populates='product', cascade='all, delete-orphan')
     best_seller_info = db.relationship('BestSeller', back_populates='product', uselist=False, cascade='all, delete-orphan')
+    variants = db.relationship('ProductVariant', back_populates='product', cascade='all, delete-orphan',
+                               order_by='(ProductVariant.sort_order, ProductVariant.id)')
     
     __table_args__ = (
         db.Index('idx_product_category', 'category'),
+        db.Index('idx_product_category_active', 'category_id', 'is_active'),
         db.Index('idx_product_active', 'is_active'),
         db.Index('idx_product_featured', 'is_featured'),
+        # Low-stock lookups: WHERE is_active AND stock_quantity < :threshold ORDER BY stock_quantity
+        db.Index('idx_product_active_stock', 'is_active', 'stock_quantity'),
+        # Price range filters and sorting on listings
+        db.Index('idx_product_active_min_price', 'is_active', 'min_price'),
+        db.Index('idx_product_active_max_price', 'is_active', 'max_price'),
     )
     
     @property
@@ -31,13 +46,17 @@ class Product(db.Model):
     def __repr__(self):
         return f'<Product {self.name}>'
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_variants=False):
+        data = {
             'id': self.id,
+            'sku': self.sku,
             'name': self.name,
             'description': self.description,
             'price': self.price,
+            'min_price': self.min_price if self.min_price is not None else self.price,
+            'max_price': self.max_price if self.max_price is not None else self.price,
             'category': self.category,
+            'category_id': self.category_id,
             'stock_quantity': self.stock_quantity,
             'image_url': self.image_url,
             'is_active': self.is_active,
@@ -45,4 +64,43 @@ class Product(db.Model):
             'is_best_seller': self.is_best_seller,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
             'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        if include_variants:
+            data['variants'] = [variant.to_dict() for variant in self.variants]
+        return data
+
+
+class ProductVariant(db.Model):
+    """A purchasable size or pack of a product (e.g. 250ml, 500ml, 1L) with its own SKU, price and stock"""
+    __tablename__ = 'product_variants'
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    sku = db.Column(db.String(64), unique=True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    stock_quantity = db.Column(db.Integer, default=0)
+    is_active = db.Column(db.Boolean, default=True)
+    sort_order = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    product = db.relationship('Product', back_populates='variants')
+    
+    __table_args__ = (
+        # Batched variant loads and the min/max price aggregate per product
+        db.Index('idx_variant_product_active_price', 'product_id', 'is_active', 'price'),
+    )
+    
+    def __repr__(self):
+        return f'<ProductVariant {self.sku}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'sku': self.sku,
+            'name': self.name,
+            'price': self.price,
+            'stock_quantity': self.stock_quantity,
+            'is_active': self.is_active,
+            'sort_order': self.sort_order
         }
\ No newline at end of file
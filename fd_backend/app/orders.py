@@ -0,0 +1,343 @@
+# app/orders.py
+# Order state machine: the allowed status transitions, applied with a
+# compare-and-swap on orders.version and logged in order_status_history.
+# Also keeps the per-customer order aggregates in customer_stats current.
+from app.extensions import db
+from app.models.order import Order, OrderStatusHistory
+from app.models.customer import CustomerStats
+from app.inventory import restock_order
+from flask import current_app
+from sqlalchemy import case, func, insert, literal, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+
+PENDING = 'Pending'
+PROCESSING = 'Processing'
+SHIPPED = 'Shipped'
+DELIVERED = 'Delivered'
+CANCELLED = 'Cancelled'
+
+ORDER_STATUSES = (PENDING, PROCESSING, SHIPPED, DELIVERED, CANCELLED)
+
+# Allowed next statuses; Delivered and Cancelled are final
+TRANSITIONS = {
+    PENDING: (PROCESSING, CANCELLED),
+    PROCESSING: (SHIPPED, CANCELLED),
+    SHIPPED: (DELIVERED,),
+    DELIVERED: (),
+    CANCELLED: (),
+}
+
+
+class InvalidTransitionError(Exception):
+    """Raised when an order cannot move from its current status to the requested one"""
+
+    def __init__(self, order_id, from_status, to_status):
+        self.order_id = order_id
+        self.from_status = from_status
+        self.to_status = to_status
+        super().__init__(f"Order {order_id} cannot go from {from_status} to {to_status}")
+
+    def to_dict(self):
+        return {
+            'order_id': self.order_id,
+            'status': self.from_status,
+            'requested_status': self.to_status,
+            'allowed': list(allowed_transitions(self.from_status))
+        }
+
+
+class StaleOrderError(Exception):
+    """Raised when an order changed since it was read (version mismatch)"""
+
+    def __init__(self, order_id, expected_version, current_version=None):
+        self.order_id = order_id
+        self.expected_version = expected_version
+        self.current_version = current_version
+        super().__init__(f"Order {order_id} was modified (expected version {expected_version})")
+
+    def to_dict(self):
+        return {
+            'order_id': self.order_id,
+            'expected_version': self.expected_version,
+            'current_version': self.current_version
+        }
+
+
+def normalize_status(value):
+    """Map user input such as 'delivered' to the canonical status, or None"""
+    if not isinstance(value, str):
+        return None
+    lookup = {status.lower(): status for status in ORDER_STATUSES}
+    return lookup.get(value.strip().lower())
+
+
+def allowed_transitions(status):
+    return TRANSITIONS.get(normalize_status(status) or status, ())
+
+
+def record_status(order_id, from_status, to_status, version, changed_by=None, note=None):
+    """Append a row to the order's status history. The caller commits."""
+    entry = OrderStatusHistory(
+        order_id=order_id,
+        from_status=from_status,
+        to_status=to_status,
+        version=version,
+        changed_by=changed_by,
+        note=note
+    )
+    db.session.add(entry)
+    return entry
+
+
+def _transition_values(to_status):
+    values = {'status': to_status, 'version': Order.version + 1, 'updated_at': datetime.utcnow()}
+    if to_status == DELIVERED:
+        values['delivery_date'] = datetime.utcnow()
+    return values
+
+
+def transition_order(order, to_status, changed_by=None, note=None, expected_version=None):
+    """
+    Move an order to `to_status`. The write is an UPDATE ... WHERE version = :v,
+    so if anyone changed the order since it was read (or since the client read
+    `expected_version`) StaleOrderError is raised and nothing is written.
+    Cancelling returns the sold stock. The caller commits.
+    """
+    from_status = normalize_status(order.status) or order.status
+    version = order.version
+    customer_id, total_amount = order.customer_id, order.total_amount
+
+    if expected_version is not None and expected_version != order.version:
+        raise StaleOrderError(order.id, expected_version, order.version)
+    if to_status not in allowed_transitions(from_status):
+        raise InvalidTransitionError(order.id, from_status, to_status)
+
+    result = db.session.execute(
+        update(Order)
+        .where(Order.id == order.id, Order.version == version)
+        .values(**_transition_values(to_status))
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        current_version = db.session.query(Order.version).filter(Order.id == order.id).scalar()
+        raise StaleOrderError(order.id, version, current_version)
+
+    db.session.expire(order)
+    record_status(order.id, from_status, to_status, version + 1, changed_by=changed_by, note=note)
+    if to_status == CANCELLED:
+        restock_order(order.id, note=note, created_by=changed_by)
+        record_cancellations({customer_id: [total_amount]})
+    return from_status
+
+
+def bulk_transition(order_ids, to_status, changed_by=None, note=None):
+    """
+    Move many orders to `to_status` in one transaction: the rows are locked in
+    one query, every order allowed to make the move is updated with a single
+    UPDATE ... WHERE id IN (...), and the history rows are inserted together.
+    Returns (updated_ids, skipped, missing_ids). The caller commits.
+    """
+    order_ids = sorted(set(order_ids))
+    rows = db.session.query(Order.id, Order.status, Order.version, Order.customer_id, Order.total_amount).filter(
+        Order.id.in_(order_ids)
+    ).order_by(Order.id).with_for_update().all()
+
+    found = {row.id for row in rows}
+    missing = [order_id for order_id in order_ids if order_id not in found]
+
+    movable = []
+    skipped = []
+    cancelled_totals = {}
+    for order_id, status, version, customer_id, total_amount in rows:
+        from_status = normalize_status(status) or status
+        if to_status in allowed_transitions(from_status):
+            movable.append((order_id, from_status, version))
+            cancelled_totals.setdefault(customer_id, []).append(total_amount)
+        else:
+            skipped.append(InvalidTransitionError(order_id, from_status, to_status).to_dict())
+
+    if movable:
+        db.session.execute(
+            update(Order)
+            .where(Order.id.in_([order_id for order_id, _, _ in movable]))
+            .values(**_transition_values(to_status))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.add_all([
+            OrderStatusHistory(
+                order_id=order_id,
+                from_status=from_status,
+                to_status=to_status,
+                version=version + 1,
+                changed_by=changed_by,
+                note=note
+            ) for order_id, from_status, version in movable
+        ])
+        if to_status == CANCELLED:
+            for order_id, _, _ in movable:
+                restock_order(order_id, note=note, created_by=changed_by)
+            record_cancellations(cancelled_totals)
+
+    return [order_id for order_id, _, _ in movable], skipped, missing
+
+
+# Customer stats
+def order_totals(customer_ids=None):
+    """
+    Query of per-customer order aggregates, one row per customer: customer_id,
+    order_count, cancelled_count, lifetime_value (cancelled orders excluded),
+    first_order_at and last_order_at.
+    """
+    cancelled = Order.status == CANCELLED
+    query = db.session.query(
+        Order.customer_id.label('customer_id'),
+        func.count(Order.id).label('order_count'),
+        func.coalesce(func.sum(case((cancelled, 1), else_=0)), 0).label('cancelled_count'),
+        func.coalesce(func.sum(case((cancelled, 0.0), else_=Order.total_amount)), 0.0).label('lifetime_value'),
+        func.min(Order.order_date).label('first_order_at'),
+        func.max(Order.order_date).label('last_order_at')
+    )
+    if customer_ids is not None:
+        query = query.filter(Order.customer_id.in_(customer_ids))
+    return query.group_by(Order.customer_id)
+
+
+def _stats_values(row):
+    return {
+        'order_count': row.order_count,
+        'cancelled_count': row.cancelled_count,
+        'lifetime_value': float(row.lifetime_value or 0.0),
+        'first_order_at': row.first_order_at,
+        'last_order_at': row.last_order_at,
+        'updated_at': datetime.utcnow()
+    }
+
+
+def _bump_customer_stats(customer_id, values):
+    """
+    Apply `values` (column expressions relative to the current row) to the
+    customer's stats row. A customer without one gets it computed from all of
+    their orders, which already include the change being recorded.
+    """
+    statement = (
+        update(CustomerStats)
+        .where(CustomerStats.customer_id == customer_id)
+        .values(updated_at=datetime.utcnow(), **values)
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.execute(statement).rowcount:
+        return
+    row = order_totals([customer_id]).first()
+    if row is None:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(CustomerStats(customer_id=customer_id, **_stats_values(row)))
+    except IntegrityError:
+        # Created by a concurrent order in the meantime
+        db.session.execute(statement)
+
+
+def _stats_enabled():
+    return current_app.config.get('CUSTOMER_STATS_ENABLED', True)
+
+
+def record_order_placed(order):
+    """
+    Count a new order in its customer's stats, as increments so concurrent
+    checkouts by the same customer cannot overwrite each other. The caller commits.
+    """
+    if not _stats_enabled():
+        return
+    order_date = order.order_date or datetime.utcnow()
+    _bump_customer_stats(order.customer_id, {
+        'order_count': CustomerStats.order_count + 1,
+        'lifetime_value': CustomerStats.lifetime_value + (order.total_amount or 0.0),
+        'first_order_at': case(
+            (or_(CustomerStats.first_order_at.is_(None), CustomerStats.first_order_at > order_date), order_date),
+            else_=CustomerStats.first_order_at
+        ),
+        'last_order_at': case(
+            (or_(CustomerStats.last_order_at.is_(None), CustomerStats.last_order_at < order_date), order_date),
+            else_=CustomerStats.last_order_at
+        )
+    })
+
+
+def record_cancellations(totals_by_customer):
+    """Take cancelled orders ({customer_id: [total_amount, ...]}) out of the lifetime values. The caller commits."""
+    if not _stats_enabled():
+        return
+    for customer_id, totals in totals_by_customer.items():
+        _bump_customer_stats(customer_id, {
+            'cancelled_count': CustomerStats.cancelled_count + len(totals),
+            'lifetime_value': CustomerStats.lifetime_value - sum(total or 0.0 for total in totals)
+        })
+
+
+def rebuild_customer_stats(chunk_size=1000):
+    """
+    Recompute customer_stats from the orders table, a range of customers per
+    transaction, and drop rows of customers who no longer have orders.
+    Existing rows get one correlated UPDATE per range and missing ones one
+    INSERT ... SELECT, so the database reads the orders and writes the stats
+    in the same statement and an order placed meanwhile is never overwritten
+    with totals read before it. Returns the number of customers with stats.
+    """
+    cancelled = Order.status == CANCELLED
+
+    def order_aggregate(aggregate):
+        return select(aggregate).where(Order.customer_id == CustomerStats.customer_id).scalar_subquery()
+
+    rebuilt = 0
+    last_id = 0
+    while True:
+        customer_ids = [row.customer_id for row in db.session.query(Order.customer_id).filter(
+            Order.customer_id > last_id
+        ).distinct().order_by(Order.customer_id).limit(chunk_size).all()]
+        if not customer_ids:
+            break
+        first_id, last_id = customer_ids[0], customer_ids[-1]
+        now = datetime.utcnow()
+
+        db.session.execute(
+            update(CustomerStats)
+            .where(CustomerStats.customer_id.between(first_id, last_id))
+            .values(
+                order_count=order_aggregate(func.count(Order.id)),
+                cancelled_count=order_aggregate(func.coalesce(func.sum(case((cancelled, 1), else_=0)), 0)),
+                lifetime_value=order_aggregate(
+                    func.coalesce(func.sum(case((cancelled, 0.0), else_=Order.total_amount)), 0.0)
+                ),
+                first_order_at=order_aggregate(func.min(Order.order_date)),
+                last_order_at=order_aggregate(func.max(Order.order_date)),
+                updated_at=now
+            )
+            .execution_options(synchronize_session=False)
+        )
+        missing = order_totals().filter(
+            Order.customer_id.between(first_id, last_id),
+            ~db.session.query(CustomerStats.customer_id).filter(
+                CustomerStats.customer_id == Order.customer_id
+            ).exists()
+        ).add_columns(literal(now).label('updated_at'))
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(CustomerStats).from_select(
+                    ['customer_id', 'order_count', 'cancelled_count', 'lifetime_value',
+                     'first_order_at', 'last_order_at', 'updated_at'],
+                    missing.statement
+                ))
+        except IntegrityError:
+            # A checkout created one of the rows in the meantime, from all of
+            # that customer's orders; the rest are filled in on the next run
+            pass
+        db.session.commit()
+        rebuilt += len(customer_ids)
+
+    CustomerStats.query.filter(
+        ~db.session.query(Order.id).filter(Order.customer_id == CustomerStats.customer_id).exists()
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return rebuilt
@@ -0,0 +1,343 @@
+# app/privacy.py
+# Customer data requests: a streamed ZIP export of everything stored about a
+# customer, and erasure (deletion or anonymization) run as a background job.
+# Erasure works through the customer's rows in chunks of set-based DELETE and
+# UPDATE statements, committing the job's progress with each chunk, so it
+# never loads a customer's history into memory and can resume where it
+# stopped if the worker dies.
+from app.extensions import db, background_tasks
+from app.models.customer import Customer, CustomerStats, CustomerErasure
+from app.models.order import Order, OrderItem, OrderStatusHistory
+from app.models.feedback import Feedback, FeedbackTopic
+from app.models.cart import Cart, CartItem
+from app.inventory import release, cart_holder
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.orm import selectinload
+from datetime import datetime, timedelta
+import io
+import json
+import zipfile
+
+ERASE_DELETE = 'delete'
+ERASE_ANONYMIZE = 'anonymize'
+ERASURE_MODES = (ERASE_DELETE, ERASE_ANONYMIZE)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+ANONYMIZED_NAME = 'Deleted customer'
+REMOVED_TEXT = '[removed]'
+
+
+def _timestamp(value):
+    return value.isoformat() if value else None
+
+
+# Export
+class _ZipBuffer(io.RawIOBase):
+    """Write-only, unseekable file for zipfile; take() hands over what has been written so far"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _order_record(order):
+    return {
+        'order_id': order.id,
+        'order_date': _timestamp(order.order_date),
+        'status': order.status,
+        'total_amount': order.total_amount,
+        'commitment_fee_paid': order.commitment_fee_paid,
+        'payment_date': _timestamp(order.payment_date),
+        'delivery_date': _timestamp(order.delivery_date),
+        'delivery_address': order.delivery_address,
+        'items': [{
+            'product_id': item.product_id,
+            'product_name': item.product.name if item.product else None,
+            'quantity': item.quantity,
+            'price': item.price
+        } for item in order.items],
+        'status_history': [{
+            'from_status': entry.from_status,
+            'to_status': entry.to_status,
+            'created_at': _timestamp(entry.created_at)
+        } for entry in order.status_history]
+    }
+
+
+def _chunks(query, id_column, chunk_size):
+    """Yield lists of rows from `query` in id order, chunk_size at a time"""
+    last_id = 0
+    while True:
+        rows = query.filter(id_column > last_id).order_by(id_column).limit(chunk_size).all()
+        if not rows:
+            break
+        yield rows
+        last_id = rows[-1].id
+        if len(rows) < chunk_size:
+            break
+
+
+def export_customer_data(customer, chunk_size=500):
+    """
+    Yield a ZIP archive of the customer's profile, orders (with items and
+    status history), feedback and cart, as bytes, a chunk of rows at a time.
+    Nothing is buffered beyond the current chunk.
+    """
+    buffer = _ZipBuffer()
+    counts = {}
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('profile.json', json.dumps(customer.to_dict(), indent=2, default=str))
+        yield buffer.take()
+
+        counts['orders'] = 0
+        with archive.open('orders.ndjson', 'w') as entry:
+            orders = Order.query.options(
+                selectinload(Order.items).selectinload(OrderItem.product),
+                selectinload(Order.status_history)
+            ).filter(Order.customer_id == customer.id)
+            for rows in _chunks(orders, Order.id, chunk_size):
+                entry.write(''.join(json.dumps(_order_record(order)) + '\n' for order in rows).encode('utf-8'))
+                counts['orders'] += len(rows)
+                yield buffer.take()
+
+        counts['feedback'] = 0
+        with archive.open('feedback.ndjson', 'w') as entry:
+            feedback = Feedback.query.filter(Feedback.customer_id == customer.id)
+            for rows in _chunks(feedback, Feedback.id, chunk_size):
+                entry.write(''.join(json.dumps(item.to_dict()) + '\n' for item in rows).encode('utf-8'))
+                counts['feedback'] += len(rows)
+                yield buffer.take()
+
+        carts = Cart.query.options(selectinload(Cart.items)).filter(Cart.customer_id == customer.id).all()
+        archive.writestr('cart.json', json.dumps([{
+            'cart_id': cart.id,
+            'is_active': cart.is_active,
+            'created_at': _timestamp(cart.created_at),
+            'items': [{
+                'product_id': item.product_id,
+                'quantity': item.quantity,
+                'price_at_added': item.price_at_added,
+                'added_at': _timestamp(item.created_at)
+            } for item in cart.items]
+        } for cart in carts], indent=2))
+        counts['cart_items'] = sum(len(cart.items) for cart in carts)
+
+        archive.writestr('manifest.json', json.dumps({
+            'customer_id': customer.id,
+            'generated_at': datetime.utcnow().isoformat(),
+            'records': counts
+        }, indent=2))
+    yield buffer.take()
+
+
+# Erasure
+def request_erasure(customer, mode=ERASE_DELETE, requested_by=None):
+    """
+    Deactivate the customer and queue an erasure job for them, or return the
+    job already queued or running. Commits, then submits the job.
+    """
+    job = CustomerErasure.query.filter(
+        CustomerErasure.customer_id == customer.id,
+        CustomerErasure.status.in_([QUEUED, RUNNING])
+    ).first()
+    if job is not None:
+        return job, False
+
+    # Locked out straight away; the data goes in the background
+    customer.is_active = False
+    customer.password_reset_token = None
+    customer.password_reset_expiry = None
+    job = CustomerErasure(customer_id=customer.id, mode=mode, status=QUEUED, requested_by=requested_by)
+    db.session.add(job)
+    db.session.commit()
+
+    background_tasks.submit(run_erasure, job.id)
+    return job, True
+
+
+def _ids(query, id_column, chunk_size):
+    return [row[0] for row in query.with_entities(id_column).order_by(id_column).limit(chunk_size).all()]
+
+
+def _delete_where(model, condition):
+    return db.session.query(model).filter(condition).delete(synchronize_session=False)
+
+
+def _delete_orders(customer_id, chunk_size):
+    while True:
+        order_ids = _ids(Order.query.filter(Order.customer_id == customer_id), Order.id, chunk_size)
+        if not order_ids:
+            break
+        yield {
+            'order_status_history': _delete_where(OrderStatusHistory, OrderStatusHistory.order_id.in_(order_ids)),
+            'order_items': _delete_where(OrderItem, OrderItem.order_id.in_(order_ids)),
+            'orders': _delete_where(Order, Order.id.in_(order_ids))
+        }
+
+
+def _delete_feedback(customer_id, chunk_size):
+    while True:
+        feedback_ids = _ids(Feedback.query.filter(Feedback.customer_id == customer_id), Feedback.id, chunk_size)
+        if not feedback_ids:
+            break
+        _delete_where(FeedbackTopic, FeedbackTopic.feedback_id.in_(feedback_ids))
+        yield {'feedback': _delete_where(Feedback, Feedback.id.in_(feedback_ids))}
+
+
+def _delete_carts(customer_id, chunk_size):
+    cart_ids = [row.id for row in db.session.query(Cart.id).filter(Cart.customer_id == customer_id).all()]
+    if not cart_ids:
+        return
+    for cart_id in cart_ids:
+        release(cart_holder(cart_id))
+    yield {
+        'cart_items': _delete_where(CartItem, CartItem.cart_id.in_(cart_ids)),
+        'carts': _delete_where(Cart, Cart.id.in_(cart_ids))
+    }
+
+
+def _delete_customer(customer_id, chunk_size):
+    _delete_where(CustomerStats, CustomerStats.customer_id == customer_id)
+    yield {'customers': _delete_where(Customer, Customer.id == customer_id)}
+
+
+def _anonymize_orders(customer_id, chunk_size):
+    pending = Order.query.filter(Order.customer_id == customer_id, Order.delivery_address.isnot(None))
+    while True:
+        order_ids = _ids(pending, Order.id, chunk_size)
+        if not order_ids:
+            break
+        result = db.session.execute(
+            update(Order).where(Order.id.in_(order_ids)).values(delivery_address=None)
+            .execution_options(synchronize_session=False)
+        )
+        yield {'orders': result.rowcount}
+
+
+def _anonymize_feedback(customer_id, chunk_size):
+    # Ratings are kept for product statistics; the text is the customer's own words
+    pending = Feedback.query.filter(Feedback.customer_id == customer_id, Feedback.feedback_message != REMOVED_TEXT)
+    while True:
+        feedback_ids = _ids(pending, Feedback.id, chunk_size)
+        if not feedback_ids:
+            break
+        result = db.session.execute(
+            update(Feedback).where(Feedback.id.in_(feedback_ids))
+            .values(title=None, feedback_message=REMOVED_TEXT)
+            .execution_options(synchronize_session=False)
+        )
+        yield {'feedback': result.rowcount}
+
+
+def _anonymize_customer(customer_id, chunk_size):
+    table = Customer.__table__
+    result = db.session.execute(
+        update(table).where(table.c.id == customer_id).values(
+            name=ANONYMIZED_NAME, email=None, phone='', phone_normalized=None, address=None,
+            date_of_birth=None, profile_picture=None, password='!', is_active=False,
+            password_reset_token=None, password_reset_expiry=None, updated_at=datetime.utcnow()
+        )
+    )
+    yield {'customers': result.rowcount}
+
+
+ERASURE_STEPS = {
+    ERASE_DELETE: (
+        ('orders', _delete_orders),
+        ('feedback', _delete_feedback),
+        ('carts', _delete_carts),
+        ('customer', _delete_customer),
+    ),
+    ERASE_ANONYMIZE: (
+        ('orders', _anonymize_orders),
+        ('feedback', _anonymize_feedback),
+        ('carts', _delete_carts),
+        ('customer', _anonymize_customer),
+    ),
+}
+
+
+def run_erasure(job_id, chunk_size=None):
+    """
+    Run (or resume) an erasure job. Each chunk of statements is committed
+    together with the job's progress; every step only looks at rows that are
+    still to be done, so re-running a half-finished job is safe.
+    """
+    chunk_size = chunk_size or current_app.config.get('CUSTOMER_ERASURE_CHUNK_SIZE', 500)
+    job = db.session.get(CustomerErasure, job_id)
+    if job is None or job.status == COMPLETED:
+        return job
+
+    job.status = RUNNING
+    job.started_at = job.started_at or datetime.utcnow()
+    job.error = None
+    db.session.commit()
+
+    progress = job.get_progress()
+    try:
+        for step, func in ERASURE_STEPS[job.mode]:
+            job.step = step
+            db.session.commit()
+            for counts in func(job.customer_id, chunk_size):
+                for table, count in counts.items():
+                    progress[table] = progress.get(table, 0) + count
+                job.progress = json.dumps(progress, sort_keys=True)
+                db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(CustomerErasure, job_id)
+        job.status = FAILED
+        job.error = str(e)
+        db.session.commit()
+        current_app.logger.error(f"Customer erasure {job_id} failed: {str(e)}")
+        return job
+
+    job.status = COMPLETED
+    job.step = None
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    current_app.logger.info(f"Customer erasure {job_id} ({job.mode}) completed: {progress}")
+    return job
+
+
+def resume_erasures():
+    """
+    Pick up erasure jobs whose worker went away (queued or running with no
+    progress for CUSTOMER_ERASURE_STALE_SECONDS). A job is claimed with a
+    compare-and-swap on updated_at, so only one worker resumes it.
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=current_app.config.get('CUSTOMER_ERASURE_STALE_SECONDS', 900))
+    stale = db.session.query(CustomerErasure.id, CustomerErasure.updated_at).filter(
+        CustomerErasure.status.in_([QUEUED, RUNNING]),
+        CustomerErasure.updated_at < stale_before
+    ).order_by(CustomerErasure.id).all()
+    resumed = 0
+    for job_id, updated_at in stale:
+        claimed = db.session.execute(
+            update(CustomerErasure)
+            .where(CustomerErasure.id == job_id, CustomerErasure.updated_at == updated_at)
+            .values(updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            run_erasure(job_id)
+            resumed += 1
+    return resumed
@@ -0,0 +1,204 @@
+# app/sentiment.py
+# Offline feedback analysis: a lexicon-based sentiment score, keyword topics
+# and an urgency score for triage, computed in the background after feedback
+# is submitted and stored on the feedback row (topics in feedback_topics).
+# Messages are processed in batches: tokenized once, scored with dictionary
+# lookups, and written back with one executemany UPDATE per batch.
+from app.extensions import db, metrics
+from app.models.feedback import Feedback, FeedbackTopic
+from flask import current_app
+from sqlalchemy import bindparam, update
+from datetime import datetime
+import math
+import re
+import time
+
+_tokens = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+# Word -> valence, roughly -3 (very negative) to 3 (very positive)
+LEXICON = {
+    # Positive
+    'good': 1.5, 'great': 2.5, 'excellent': 3, 'amazing': 3, 'awesome': 3, 'wonderful': 3, 'perfect': 3,
+    'best': 3, 'love': 3, 'loved': 3, 'loves': 3, 'like': 1, 'liked': 1.5, 'nice': 1.5, 'enjoy': 2,
+    'enjoyed': 2, 'happy': 2, 'satisfied': 2, 'pleased': 2, 'recommend': 2, 'thanks': 1.5, 'thank': 1.5,
+    'fresh': 2, 'delicious': 3, 'tasty': 2.5, 'yummy': 3, 'refreshing': 2.5, 'sweet': 1, 'smooth': 1.5,
+    'fast': 1.5, 'quick': 1.5, 'prompt': 2, 'early': 1, 'friendly': 2, 'polite': 2, 'helpful': 2,
+    'affordable': 2, 'cheap': 1, 'worth': 1.5, 'clean': 1.5, 'healthy': 1.5,
+    # Negative
+    'bad': -2, 'poor': -2, 'terrible': -3, 'awful': -3, 'horrible': -3, 'worst': -3, 'disgusting': -3,
+    'hate': -3, 'hated': -3, 'dislike': -2, 'disappointed': -2.5, 'disappointing': -2.5, 'unhappy': -2,
+    'annoyed': -2, 'angry': -3, 'frustrated': -2.5, 'waste': -2.5, 'useless': -2.5, 'complaint': -1.5,
+    'problem': -1.5, 'issue': -1, 'late': -2, 'delayed': -2, 'delay': -1.5, 'slow': -1.5,
+    'missing': -2, 'wrong': -2, 'rude': -3, 'unprofessional': -2.5, 'stale': -2.5, 'rotten': -3,
+    'spoiled': -3, 'spoilt': -3, 'expired': -2.5, 'mouldy': -3, 'moldy': -3, 'sour': -1, 'bitter': -1,
+    'watery': -1.5, 'bland': -1.5, 'warm': -1, 'broken': -2, 'leaking': -2, 'leaked': -2, 'damaged': -2,
+    'dirty': -3, 'sick': -3, 'expensive': -1.5, 'overpriced': -2.5, 'overcharged': -2.5, 'refund': -1,
+    'cancelled': -1,
+}
+
+NEGATIONS = {'not', 'no', 'never', 'nothing', 'neither', 'nor', 'without', 'hardly', 'barely'}
+INTENSIFIERS = {'very': 1.5, 'really': 1.4, 'so': 1.3, 'extremely': 1.8, 'too': 1.3, 'super': 1.5,
+                'totally': 1.4, 'absolutely': 1.6, 'quite': 1.2}
+# How many following words a negation flips
+NEGATION_SCOPE = 3
+
+TOPICS = {
+    'delivery': ('delivery', 'deliver', 'delivered', 'driver', 'rider', 'courier', 'arrive', 'arrived',
+                 'shipping', 'late', 'delayed', 'delay', 'early', 'address'),
+    'taste': ('taste', 'tasted', 'tastes', 'tasty', 'flavour', 'flavor', 'delicious', 'yummy', 'sweet',
+              'sour', 'bitter', 'bland', 'watery', 'refreshing', 'smooth'),
+    'price': ('price', 'prices', 'cost', 'expensive', 'cheap', 'affordable', 'overpriced', 'overcharged',
+              'value', 'worth', 'discount', 'offer'),
+    'quality': ('quality', 'fresh', 'stale', 'rotten', 'spoiled', 'spoilt', 'expired', 'mouldy', 'moldy',
+                'clean', 'dirty', 'healthy'),
+    'packaging': ('packaging', 'package', 'bottle', 'bottles', 'lid', 'seal', 'sealed', 'leaking', 'leaked',
+                  'broken', 'damaged', 'box'),
+    'service': ('service', 'staff', 'support', 'rude', 'friendly', 'polite', 'helpful', 'unprofessional',
+                'response', 'call', 'phone'),
+    'order': ('order', 'orders', 'missing', 'wrong', 'refund', 'cancel', 'cancelled', 'payment', 'paid',
+              'charged', 'receipt'),
+}
+# Word -> topics it signals, built once from TOPICS
+KEYWORD_TOPICS = {}
+for _topic, _keywords in TOPICS.items():
+    for _keyword in _keywords:
+        KEYWORD_TOPICS.setdefault(_keyword, set()).add(_topic)
+
+# Words that push feedback up the queue whatever its overall tone
+URGENT_WORDS = {'sick', 'ill', 'refund', 'missing', 'rotten', 'spoiled', 'spoilt', 'expired',
+                'mouldy', 'moldy', 'overcharged', 'charged', 'allergic', 'dirty', 'broken', 'urgent'}
+
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+
+
+def tokenize(text):
+    return _tokens.findall((text or '').lower())
+
+
+def score_tokens(tokens):
+    """Sentiment of a token list in [-1, 1]: summed valences, normalized"""
+    total = 0.0
+    negate_until = -1
+    boost = 1.0
+    for position, token in enumerate(tokens):
+        if token in NEGATIONS or token.endswith("n't"):
+            negate_until = position + NEGATION_SCOPE
+            continue
+        if token in INTENSIFIERS:
+            boost = INTENSIFIERS[token]
+            continue
+        valence = LEXICON.get(token)
+        if valence is not None:
+            valence *= boost
+            if position <= negate_until:
+                valence *= -0.75
+            total += valence
+        boost = 1.0
+    # Same squashing as VADER: approaches +/-1 as the sum grows
+    return total / math.sqrt(total * total + 15) if total else 0.0
+
+
+def analyze(title, message, rating=None):
+    """(sentiment_score, sentiment, topics, urgency) for one piece of feedback"""
+    tokens = tokenize(title) + tokenize(message)
+    score = score_tokens(tokens)
+    if rating is not None:
+        # A 1-5 star rating is the customer's own verdict; let it pull the text score
+        score = 0.7 * score + 0.3 * max(-1.0, min(1.0, (rating - 3) / 2))
+    if score >= POSITIVE_THRESHOLD:
+        label = 'positive'
+    elif score <= NEGATIVE_THRESHOLD:
+        label = 'negative'
+    else:
+        label = 'neutral'
+
+    words = set(tokens)
+    topics = set()
+    for word in words:
+        topics.update(KEYWORD_TOPICS.get(word, ()))
+
+    urgency = (1 - score) * 30  # 0 (glowing) to 60 (furious)
+    if rating is not None and rating <= 2:
+        urgency += 25 if rating <= 1 else 15
+    if words & URGENT_WORDS:
+        urgency += 20
+    urgency = int(round(max(0, min(100, urgency))))
+    return round(score, 4), label, sorted(topics), urgency
+
+
+def analyze_feedback(feedback_ids=None, batch_size=None, limit=None, reanalyze=False):
+    """
+    Analyze feedback in batches of batch_size: the given ids, or else every
+    row not analyzed yet (all rows with reanalyze=True), up to `limit`.
+    Each batch is one SELECT, one executemany UPDATE, and a replace of its
+    topics, committed together. Returns a throughput report.
+    """
+    batch_size = batch_size or current_app.config.get('FEEDBACK_ANALYSIS_BATCH_SIZE', 500)
+    started = time.perf_counter()
+    processed = 0
+    batches = 0
+    by_sentiment = {}
+    table = Feedback.__table__
+    last_id = 0
+    while limit is None or processed < limit:
+        query = db.session.query(Feedback.id, Feedback.title, Feedback.feedback_message, Feedback.rating).filter(
+            Feedback.id > last_id
+        )
+        if feedback_ids is not None:
+            query = query.filter(Feedback.id.in_(list(feedback_ids)))
+        elif not reanalyze:
+            query = query.filter(Feedback.analyzed_at.is_(None))
+        size = batch_size if limit is None else min(batch_size, limit - processed)
+        rows = query.order_by(Feedback.id).limit(size).all()
+        if not rows:
+            break
+
+        batch_started = time.perf_counter()
+        now = datetime.utcnow()
+        values = []
+        topics = []
+        for feedback_id, title, message, rating in rows:
+            score, label, row_topics, urgency = analyze(title, message, rating)
+            values.append({'b_id': feedback_id, 'b_score': score, 'b_label': label,
+                           'b_urgency': urgency, 'b_now': now})
+            topics.extend({'feedback_id': feedback_id, 'topic': topic} for topic in row_topics)
+            by_sentiment[label] = by_sentiment.get(label, 0) + 1
+
+        ids = [row[0] for row in rows]
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('b_id'))
+            .values(sentiment_score=bindparam('b_score'), sentiment=bindparam('b_label'),
+                    urgency=bindparam('b_urgency'), analyzed_at=bindparam('b_now'),
+                    updated_at=table.c.updated_at),
+            values
+        )
+        FeedbackTopic.query.filter(FeedbackTopic.feedback_id.in_(ids)).delete(synchronize_session=False)
+        if topics:
+            db.session.execute(FeedbackTopic.__table__.insert(), topics)
+        db.session.commit()
+
+        processed += len(rows)
+        batches += 1
+        last_id = ids[-1]
+        metrics.feedback_analysis_batch_seconds.observe(time.perf_counter() - batch_started)
+        for label in {value['b_label'] for value in values}:
+            metrics.feedback_analyzed_total.inc(
+                sum(1 for value in values if value['b_label'] == label), sentiment=label
+            )
+        if len(rows) < size:
+            break
+
+    elapsed = time.perf_counter() - started
+    if processed and feedback_ids is None:
+        current_app.logger.info(
+            f"Feedback analysis: {processed} rows in {elapsed:.2f}s ({processed / elapsed:.0f} rows/sec)"
+        )
+    return {
+        'processed': processed,
+        'batches': batches,
+        'by_sentiment': by_sentiment,
+        'elapsed_seconds': round(elapsed, 3),
+        'rows_per_second': round(processed / elapsed, 1) if elapsed else None
+    }
@@ -0,0 +1,126 @@
+# app/site_content.py
+# The public content shown on the home and about pages (best sellers, company
+# info, team members, stats, quick tips, featured products and the contact
+# details), each built once and cached until an admin changes it. The
+# individual content endpoints and the /content/bundle endpoint, which
+# returns any set of sections in one response, share the same cache entries.
+from app.extensions import db, cache
+from app.cache import CONTENT, CONTACT, PRODUCTS
+from app.catalog import featured_products
+from app.models.content import BestSeller, QuickTip, CompanyInfo, TeamMember, CompanyStat
+from app.models.contact_info import ContactInfo
+from app.models.product import Product
+from flask import current_app
+from sqlalchemy.orm import contains_eager
+
+
+def _ttl():
+    return current_app.config.get('CACHE_CONTENT_TTL')
+
+
+def best_sellers():
+    """
+    Best sellers with their products, by display order. They show stock, so
+    they are filed under the products version too and use the products TTL.
+    """
+    def load():
+        rows = BestSeller.query.join(Product).options(
+            contains_eager(BestSeller.product).selectinload(Product.best_seller_info)
+        ).order_by(BestSeller.display_order).all()
+        return [row.to_dict() for row in rows]
+
+    return cache.get_or_set(CONTENT, f'best-sellers:{cache.version(PRODUCTS)}', load,
+                            ttl=current_app.config.get('CACHE_PRODUCTS_TTL'))
+
+
+def company_info():
+    def load():
+        return {item.key: item.value for item in CompanyInfo.query.all()}
+
+    return cache.get_or_set(CONTENT, 'company-info', load, ttl=_ttl())
+
+
+def team_members():
+    def load():
+        return [member.to_dict() for member in TeamMember.query.order_by(TeamMember.display_order).all()]
+
+    return cache.get_or_set(CONTENT, 'team-members', load, ttl=_ttl())
+
+
+def company_stats():
+    def load():
+        return [stat.to_dict() for stat in CompanyStat.query.order_by(CompanyStat.display_order).all()]
+
+    return cache.get_or_set(CONTENT, 'stats', load, ttl=_ttl())
+
+
+def quick_tips():
+    def load():
+        return [tip.to_dict() for tip in QuickTip.query.order_by(QuickTip.created_at.desc()).all()]
+
+    return cache.get_or_set(CONTENT, 'quick-tips', load, ttl=_ttl())
+
+
+def featured():
+    products = featured_products()
+    return {'products': products, 'count': len(products)}
+
+
+def contact_info():
+    """The contact details, or None if they have not been set"""
+    def load():
+        contact = ContactInfo.query.first()
+        if not contact:
+            return None
+        return {
+            'phone': contact.phone,
+            'email': contact.email,
+            'location': contact.location,
+            'map_link': contact.map_link,
+            'social_media_links': contact.get_social_links()
+        }
+
+    return cache.get_or_set(CONTACT, 'contact', load, ttl=_ttl())
+
+
+# Section name -> (cache namespaces it depends on, builder). Each builder
+# returns the body of the section's own endpoint.
+SECTIONS = {
+    'best-sellers': ((CONTENT, PRODUCTS), best_sellers),
+    'company-info': ((CONTENT,), company_info),
+    'team-members': ((CONTENT,), team_members),
+    'stats': ((CONTENT,), company_stats),
+    'quick-tips': ((CONTENT,), quick_tips),
+    'featured': ((PRODUCTS,), featured),
+    'contact': ((CONTACT,), contact_info),
+}
+
+
+def section_version(name, versions):
+    """A section's version: its namespaces' versions joined, e.g. '4.17' for best-sellers"""
+    return '.'.join(str(versions[namespace]) for namespace in SECTIONS[name][0])
+
+
+def content_bundle(names=None):
+    """
+    The requested sections (all of them for None) with their versions. The
+    namespace versions are read in one query up front, and every section
+    then comes from the cache, so a warm bundle makes no other queries. A
+    section that fails is reported under errors instead of failing the rest.
+    """
+    names = list(names) if names else list(SECTIONS)
+    versions = cache.versions(*{namespace for name in names for namespace in SECTIONS[name][0]})
+    bundle = {'sections': {}, 'versions': {}}
+    errors = {}
+    for name in names:
+        try:
+            bundle['sections'][name] = SECTIONS[name][1]()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error building content section {name}: {str(e)}")
+            errors[name] = 'Failed to build section'
+            continue
+        bundle['versions'][name] = section_version(name, versions)
+    if errors:
+        bundle['errors'] = errors
+    return bundle
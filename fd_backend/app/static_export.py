@@ -0,0 +1,172 @@
+# app/static_export.py
+# Static snapshots of the public content and contact GET responses, written
+# as JSON files under STATIC_EXPORT_DIR so the web server can serve them
+# without reaching Flask. Each response goes to <path>.json (e.g.
+# content/about/stats.json for /api/v1/content/about/stats) and to an
+# immutable <path>.<version>.json, and manifest.json maps every path to its
+# current version. The version of a file is the cache namespace versions of
+# the data in it, which the admin routes bump on every write, so a run only
+# rewrites the files whose data changed. Runs in different workers are
+# serialized by an flock on .export.lock in the output directory.
+from app.extensions import background_tasks, cache
+from app.cache import CONTENT, CONTACT, HEALTH_TIPS, PRODUCTS
+from app.categories import slugify
+from app.health_tips import list_health_tips, health_tip_categories
+from app.site_content import (
+    best_sellers, company_info, team_members, company_stats, quick_tips, contact_info, content_bundle
+)
+from flask import current_app
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows, where only the development server runs
+    fcntl = None
+
+MANIFEST = 'manifest.json'
+LOCK_FILE = '.export.lock'
+
+_export_lock = threading.Lock()
+
+
+def _exports():
+    """(path, cache namespaces, builder) for every exported response"""
+    exports = [
+        ('content/home/best-sellers', (CONTENT, PRODUCTS), best_sellers),
+        ('content/about/company-info', (CONTENT,), company_info),
+        ('content/about/team-members', (CONTENT,), team_members),
+        ('content/about/stats', (CONTENT,), company_stats),
+        ('content/quick-tips', (CONTENT,), quick_tips),
+        ('content/health-tips', (HEALTH_TIPS,), list_health_tips),
+        ('content/health-tips/categories', (HEALTH_TIPS,), health_tip_categories),
+        ('content/bundle', (CONTENT, PRODUCTS, CONTACT), content_bundle),
+        ('contact', (CONTACT,), contact_info),
+    ]
+    # /content/health-tips?category=<name>, for the web server to rewrite to
+    for item in health_tip_categories()['categories']:
+        exports.append((
+            f"content/health-tips/category/{slugify(item['category'])}", (HEALTH_TIPS,),
+            lambda category=item['category']: list_health_tips(category)
+        ))
+    return exports
+
+
+def _write(path, data):
+    """Write a file atomically, so the web server never serves half of one"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as handle:
+        handle.write(data)
+    os.replace(temporary, path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _read_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST)) as handle:
+            return json.load(handle).get('files', {})
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+@contextmanager
+def _process_lock(output_dir):
+    """Hold an flock on the output directory's lock file, so only one worker exports at a time"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, LOCK_FILE), 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def export_static(output_dir=None, force=False):
+    """
+    Render every public content and contact response to output_dir
+    (STATIC_EXPORT_DIR by default). Only files whose version differs from
+    the manifest's, or that are missing, are rewritten unless force is set.
+    The previous versioned file is kept for clients still holding the old
+    manifest; older ones, and files for responses that no longer exist
+    (a deleted category, unset contact details), are removed.
+    Returns a report of what was written.
+    """
+    output_dir = output_dir or current_app.config.get('STATIC_EXPORT_DIR')
+    started = time.perf_counter()
+    report = {'written': [], 'unchanged': 0, 'removed': [], 'output_dir': output_dir}
+    with _export_lock, _process_lock(output_dir):
+        manifest = _read_manifest(output_dir)
+        exports = _exports()
+        versions = cache.versions(*{namespace for _, namespaces, _ in exports for namespace in namespaces})
+        files = {}
+        for path, namespaces, build in exports:
+            version = '.'.join(str(versions[namespace]) for namespace in namespaces)
+            entry = manifest.get(path)
+            stable = os.path.join(output_dir, f'{path}.json')
+            if not force and entry and entry['version'] == version and os.path.exists(stable):
+                files[path] = entry
+                report['unchanged'] += 1
+                continue
+
+            body = build()
+            if body is None:
+                # The endpoint answers 404; let the web server pass it through
+                continue
+            data = json.dumps(body, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+            versioned = f'{path}.{version}.json'
+            _write(os.path.join(output_dir, versioned), data)
+            _write(stable, data)
+            previous = None
+            if entry:
+                previous = entry['file'] if entry['file'] != versioned else entry.get('previous')
+                if entry.get('previous') and entry['previous'] not in (versioned, previous):
+                    _remove(os.path.join(output_dir, entry['previous']))
+            files[path] = {
+                'version': version,
+                'file': versioned,
+                'previous': previous,
+                'generated_at': datetime.utcnow().isoformat()
+            }
+            report['written'].append(path)
+
+        for path, entry in manifest.items():
+            if path in files:
+                continue
+            for name in (f'{path}.json', entry['file'], entry.get('previous')):
+                if name:
+                    _remove(os.path.join(output_dir, name))
+            report['removed'].append(path)
+
+        if report['written'] or report['removed'] or not manifest:
+            _write(os.path.join(output_dir, MANIFEST), json.dumps({
+                'generated_at': datetime.utcnow().isoformat(),
+                'files': files
+            }, indent=2, sort_keys=True).encode('utf-8'))
+
+    report['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    if report['written'] or report['removed']:
+        current_app.logger.info(
+            f"Static export: {len(report['written'])} written, {len(report['removed'])} removed, "
+            f"{report['unchanged']} unchanged in {report['elapsed_seconds']}s"
+        )
+    return report
+
+
+def schedule_static_export():
+    """Refresh the static export in the background after an admin write, if it is enabled"""
+    if current_app.config.get('STATIC_EXPORT_ENABLED'):
+        background_tasks.submit(export_static)
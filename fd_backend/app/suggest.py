@@ -0,0 +1,336 @@
+# app/suggest.py
+# Typeahead for the storefront search box: an in-memory sorted array of the
+# normalized words of every active product's name and category. A prefix is
+# a contiguous slice of the array, found with two binary searches, and each
+# word's products are kept in rank order so only the top k are visited.
+# Multi-word queries intersect the words' product sets, most selective first.
+from app.extensions import db, cache
+from app.cache import PRODUCTS
+from app.models.product import Product
+from flask import current_app
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import heapq
+import itertools
+import re
+import threading
+import unicodedata
+
+_non_word = re.compile(r'[^a-z0-9]+')
+
+# updated_at is stamped at flush, before commit, so incremental syncs re-read
+# a window before the last one to catch transactions that were still open
+SYNC_OVERLAP = timedelta(minutes=5)
+
+
+def normalize(text):
+    """'Açaí  Berry-Mix' -> 'acai berry mix'"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _non_word.sub(' ', text.lower()).strip()
+
+
+class _PrefixMap:
+    """
+    Sorted array of distinct words, each with a posting list of
+    (rank, product_id) kept in rank order and the set of the same product
+    IDs. All words with a given prefix form a contiguous slice of the array;
+    merging their posting lists yields matching products best-ranked first,
+    so a lookup can stop after k, and the sets intersect with other words'.
+    """
+
+    def __init__(self):
+        self.words = []
+        self.postings = {}
+        self.ids = {}
+
+    def build(self, pairs):
+        """Replace the contents with (word, (rank, product_id)) pairs"""
+        postings = {}
+        for word, entry in pairs:
+            postings.setdefault(word, []).append(entry)
+        for entries in postings.values():
+            entries.sort()
+        self.postings = postings
+        self.ids = {word: {product_id for _, product_id in entries} for word, entries in postings.items()}
+        self.words = sorted(postings)
+
+    def add(self, word, entry):
+        entries = self.postings.get(word)
+        if entries is None:
+            self.postings[word] = [entry]
+            self.ids[word] = {entry[1]}
+            insort(self.words, word)
+        else:
+            insort(entries, entry)
+            self.ids[word].add(entry[1])
+
+    def remove(self, word, entry):
+        entries = self.postings.get(word)
+        if not entries:
+            return
+        position = bisect_left(entries, entry)
+        if position < len(entries) and entries[position] == entry:
+            del entries[position]
+            self.ids[word].discard(entry[1])
+        if not entries:
+            del self.postings[word]
+            del self.ids[word]
+            del self.words[bisect_left(self.words, word)]
+
+    def prefix_words(self, prefix):
+        """The indexed words starting with `prefix`"""
+        start = bisect_left(self.words, prefix)
+        # Every word with this prefix sorts before prefix + the highest character
+        end = bisect_left(self.words, prefix + '\uffff', lo=start)
+        return self.words[start:end]
+
+    def iter_words(self, words):
+        """Product IDs of `words`, best rank first (may repeat)"""
+        if len(words) == 1:
+            return (product_id for _, product_id in self.postings[words[0]])
+        return (product_id for _, product_id in heapq.merge(*(self.postings[word] for word in words)))
+
+    def iter_prefix(self, prefix):
+        """Product IDs with a word starting with `prefix`, best rank first (may repeat)"""
+        return self.iter_words(self.prefix_words(prefix))
+
+    def restrict(self, candidates, words):
+        """The candidates that have one of `words`"""
+        if len(words) == 1:
+            return candidates & self.ids[words[0]]
+        return set().union(*(candidates & self.ids[word] for word in words))
+
+
+class SuggestIndex:
+    """
+    Prefix index over product names and categories.
+
+    Every word of a product's normalized name and category goes into one
+    prefix map, and the first word of its name into a second one, so names
+    starting with the query can be ranked ahead of other matches. Within each
+    map products are ranked featured first, then shorter names. Products can
+    be added, replaced and removed one at a time, so a write only costs the
+    insertions and deletions for that product's words.
+    """
+
+    # Posting entries to walk for a multi-word query before switching to sets
+    WALK_BUDGET = 200
+
+    def __init__(self):
+        self._words = _PrefixMap()
+        self._leading = _PrefixMap()
+        self._names = []  # sorted (normalized name, product_id)
+        self._products = {}  # product_id -> (name, category, normalized name, words, rank)
+        self._results = OrderedDict()  # (query, limit) -> suggestions, cleared on change
+        self._lock = threading.RLock()
+        self.version = None
+        self.synced_at = None
+
+    def __len__(self):
+        return len(self._products)
+
+    @staticmethod
+    def _record(product_id, name, category, is_featured):
+        normalized = normalize(name)
+        words = sorted(set(normalized.split()) | set(normalize(category).split()))
+        rank = (not is_featured, len(normalized), normalized, product_id)
+        return name, category, normalized, words, rank
+
+    def build(self, rows):
+        """Replace the whole index with rows of (id, name, category, is_featured)"""
+        products = {}
+        for product_id, name, category, is_featured in rows:
+            products[product_id] = self._record(product_id, name, category, is_featured)
+        words = _PrefixMap()
+        words.build(
+            (word, (record[4], product_id)) for product_id, record in products.items() for word in record[3]
+        )
+        leading = _PrefixMap()
+        leading.build(
+            (record[2].split()[0], (record[4], product_id)) for product_id, record in products.items() if record[2]
+        )
+        names = sorted((record[2], product_id) for product_id, record in products.items())
+        with self._lock:
+            self._products = products
+            self._words = words
+            self._leading = leading
+            self._names = names
+            self._results.clear()
+
+    def remove(self, product_id):
+        with self._lock:
+            record = self._products.pop(product_id, None)
+            if record is None:
+                return
+            entry = (record[4], product_id)
+            for word in record[3]:
+                self._words.remove(word, entry)
+            if record[2]:
+                self._leading.remove(record[2].split()[0], entry)
+            del self._names[bisect_left(self._names, (record[2], product_id))]
+            self._results.clear()
+
+    def upsert(self, product_id, name, category, is_featured):
+        with self._lock:
+            self.remove(product_id)
+            record = self._record(product_id, name, category, is_featured)
+            self._products[product_id] = record
+            entry = (record[4], product_id)
+            for word in record[3]:
+                self._words.add(word, entry)
+            if record[2]:
+                self._leading.add(record[2].split()[0], entry)
+            insort(self._names, (record[2], product_id))
+            self._results.clear()
+
+    def search(self, query, limit=10):
+        """
+        Top `limit` products with a word starting with each word of `query`:
+        names starting with the query first, then featured, then shorter names.
+        """
+        terms = normalize(query).split()
+        if not terms:
+            return []
+        phrase = ' '.join(terms)
+        key = (phrase, limit)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+                return cached
+
+            if len(terms) == 1:
+                found = self._search_word(phrase, limit)
+            else:
+                found = self._search_words(terms, phrase, limit)
+
+            result = [
+                {'id': product_id, 'name': self._products[product_id][0], 'category': self._products[product_id][1]}
+                for product_id in found
+            ]
+            self._results[key] = result
+            while len(self._results) > 1000:
+                self._results.popitem(last=False)
+            return result
+
+    def _search_word(self, term, limit):
+        """Names starting with `term`, then every other product with a word starting with it"""
+        found = []
+        seen = set()
+        for product_id in itertools.chain(self._leading.iter_prefix(term), self._words.iter_prefix(term)):
+            if product_id in seen:
+                continue
+            seen.add(product_id)
+            found.append(product_id)
+            if len(found) >= limit:
+                break
+        return found
+
+    def _best(self, limit, product_ids):
+        """The `limit` best-ranked of product_ids (ranks end with the product ID, so they are unique)"""
+        products = self._products
+        return [rank[-1] for rank in heapq.nsmallest(limit, [products[product_id][4] for product_id in product_ids])]
+
+    def _search_words(self, terms, phrase, limit):
+        """
+        Names starting with the phrase, then the other products that have a
+        word starting with each term, best rank first. Both are found by
+        walking posting lists in rank order while matches are dense; when they
+        are sparse, the names come from a slice of the sorted names and the
+        others from intersecting the terms' product sets, most selective first.
+        """
+        start = bisect_left(self._names, (phrase,))
+        end = bisect_left(self._names, (phrase + '\uffff',), lo=start)
+        if end - start <= self.WALK_BUDGET:
+            found = self._best(limit, (product_id for _, product_id in self._names[start:end]))
+        else:
+            found = list(itertools.islice(
+                (product_id for product_id in self._leading.iter_prefix(terms[0])
+                 if self._products[product_id][2].startswith(phrase)),
+                limit
+            ))
+        if len(found) >= limit:
+            return found
+
+        slices = []
+        for term in set(terms):
+            words = self._words.prefix_words(term)
+            if not words:
+                return found
+            slices.append((sum(len(self._words.ids[word]) for word in words), words))
+        slices.sort(key=lambda item: item[0])
+        driver = slices[0][1]
+        others = [[self._words.ids[word] for word in words] for _, words in slices[1:]]
+
+        seen = set(found)
+        for walked, product_id in enumerate(self._words.iter_words(driver)):
+            if walked >= self.WALK_BUDGET:
+                break
+            if product_id in seen:
+                continue
+            if all(any(product_id in ids for ids in sets) for sets in others):
+                seen.add(product_id)
+                found.append(product_id)
+                if len(found) >= limit:
+                    return found
+        else:
+            return found
+
+        # Sparse: intersect the sets and rank what is left, starting from a
+        # single word's set where there is one so nothing has to be copied
+        base = min(range(len(slices)), key=lambda position: (len(slices[position][1]) > 1, slices[position][0]))
+        words = slices[base][1]
+        matches = self._words.ids[words[0]] if len(words) == 1 else set().union(
+            *(self._words.ids[word] for word in words)
+        )
+        for position, (_, words) in enumerate(slices):
+            if position != base:
+                matches = self._words.restrict(matches, words)
+        return found + self._best(limit - len(found), matches - seen)
+
+
+product_suggestions = SuggestIndex()
+
+
+def _active_rows(query):
+    return query.with_entities(Product.id, Product.name, Product.category, Product.is_featured).filter(
+        Product.is_active.is_(True)
+    ).all()
+
+
+def sync_suggestions(index=None):
+    """
+    Bring the index up to date when the products cache namespace has moved on.
+    The first call loads every active product; later calls only re-read
+    products updated since the last sync and drop those that were deleted or
+    deactivated.
+    """
+    index = index if index is not None else product_suggestions
+    version = cache.version(PRODUCTS)
+    if index.version is not None and index.version == version:
+        return index
+
+    with index._lock:
+        if index.version is not None and index.version == version:
+            return index
+        started = datetime.utcnow()
+        if index.synced_at is None:
+            index.build(_active_rows(Product.query))
+        else:
+            changed = db.session.query(
+                Product.id, Product.name, Product.category, Product.is_featured, Product.is_active
+            ).filter(Product.updated_at >= index.synced_at - SYNC_OVERLAP).all()
+            for product_id, name, category, is_featured, is_active in changed:
+                if is_active:
+                    index.upsert(product_id, name, category, is_featured)
+                else:
+                    index.remove(product_id)
+            active = {product_id for (product_id,) in db.session.query(Product.id).filter(Product.is_active.is_(True))}
+            for product_id in [product_id for product_id in index._products if product_id not in active]:
+                index.remove(product_id)
+        index.synced_at = started
+        index.version = version
+        current_app.logger.debug(f"Suggest index synced: {len(index)} products")
+    return index
@@ -0,0 +1,142 @@
+import os
+import queue
+import threading
+import time
+import traceback
+
+try:
+    import fcntl
+except ImportError:  # Windows, where only the development server runs
+    fcntl = None
+
+
+class BackgroundTasks:
+    """
+    In-process background job runner.
+
+    Jobs submitted with submit() run on a daemon thread inside an application
+    context, and jobs registered with add_periodic() run on a fixed interval.
+    The worker thread is started lazily from the first request of each
+    process, so every forked Passenger worker gets its own thread.
+
+    Periodic jobs registered with exclusive=True run in one process only:
+    the first worker to lock TASKS_LOCK_FILE keeps the lock until it exits,
+    and the others skip those jobs (taking over if the lock is released).
+
+    With TASKS_RUN_INLINE set (as in testing), submit() runs the job
+    immediately and periodic jobs are not scheduled.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = queue.Queue()
+        self._periodic = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._lock_file = None
+        self._lock_pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TASKS_RUN_INLINE', False)
+        app.config.setdefault('TASKS_POLL_INTERVAL', 1.0)
+        app.config.setdefault('TASKS_LOCK_FILE', None)
+        self.app = app
+        app.extensions['background_tasks'] = self
+        app.before_request(self._ensure_started)
+
+    def add_periodic(self, name, interval, func, *args, exclusive=False, **kwargs):
+        """
+        Run func every `interval` seconds; re-registering a name replaces it.
+        With exclusive, only the process holding TASKS_LOCK_FILE runs it.
+        """
+        with self._lock:
+            self._periodic[name] = {
+                'interval': interval,
+                'func': func,
+                'args': args,
+                'kwargs': kwargs,
+                'exclusive': exclusive,
+                'next_run': time.monotonic() + interval
+            }
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func to run in the background inside an application context"""
+        if self.app is not None and self.app.config.get('TASKS_RUN_INLINE'):
+            self._run(func, args, kwargs)
+            return
+        self._queue.put((func, args, kwargs))
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self.app is None or self.app.config.get('TASKS_RUN_INLINE'):
+            return
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._worker, name='background-tasks', daemon=True)
+            self._thread.start()
+
+    def _run(self, func, args, kwargs):
+        from app.extensions import db
+        with self.app.app_context():
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.error(f"Background task {getattr(func, '__name__', func)} failed: {str(e)}")
+                self.app.logger.error(traceback.format_exc())
+            finally:
+                db.session.remove()
+
+    def _run_due_periodic(self):
+        now = time.monotonic()
+        with self._lock:
+            due = [job for job in self._periodic.values() if job['next_run'] <= now]
+            for job in due:
+                job['next_run'] = now + job['interval']
+        for job in due:
+            if job['exclusive'] and not self._holds_lock():
+                continue
+            self._run(job['func'], job['args'], job['kwargs'])
+
+    def _holds_lock(self):
+        """Whether this process runs the exclusive jobs, locking TASKS_LOCK_FILE if nobody holds it"""
+        path = self.app.config.get('TASKS_LOCK_FILE')
+        if not path or fcntl is None:
+            return True
+        if self._lock_pid == os.getpid():
+            return True
+        try:
+            handle = open(path, 'a')
+        except OSError as e:
+            self.app.logger.error(f"Cannot open task lock file {path}: {str(e)}")
+            return False
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            # Held by another worker
+            handle.close()
+            return False
+        # Kept open (and locked) for the life of the process
+        self._lock_file = handle
+        self._lock_pid = os.getpid()
+        self.app.logger.info(f"Process {self._lock_pid} runs the exclusive background jobs")
+        return True
+
+    def _worker(self):
+        poll_interval = self.app.config.get('TASKS_POLL_INTERVAL', 1.0)
+        while True:
+            try:
+                func, args, kwargs = self._queue.get(timeout=poll_interval)
+            except queue.Empty:
+                pass
+            else:
+                self._run(func, args, kwargs)
+                self._queue.task_done()
+            self._run_due_periodic()
@@ -28,6 +28,112 @@ class Config:
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16 MB default
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads'))
     
+    # SQL Instrumentation
+    SQL_INSTRUMENTATION_ENABLED = os.environ.get('SQL_INSTRUMENTATION_ENABLED', 'True').lower() == 'true'
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
+    SQL_SLOWEST_STATEMENTS = int(os.environ.get('SQL_SLOWEST_STATEMENTS', 3))
+    SQL_LOG_REQUESTS = os.environ.get('SQL_LOG_REQUESTS', 'True').lower() == 'true'
+    
+    # Metrics (set METRICS_DIR to a directory shared by all Passenger workers)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+    # /metrics is served to these addresses or networks (comma-separated) and to
+    # requests sending 'Authorization: Bearer <METRICS_TOKEN>'
+    METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # Health Checks
+    HEALTH_CHECK_TTL = float(os.environ.get('HEALTH_CHECK_TTL', 10))  # seconds a probe result is reused
+    HEALTH_CHECK_SMTP = os.environ.get('HEALTH_CHECK_SMTP', 'True').lower() == 'true'
+    HEALTH_SMTP_TIMEOUT = float(os.environ.get('HEALTH_SMTP_TIMEOUT', 2))
+    HEALTH_POOL_SATURATION_THRESHOLD = float(os.environ.get('HEALTH_POOL_SATURATION_THRESHOLD', 0.9))
+    
+    # Background Tasks
+    TASKS_RUN_INLINE = os.environ.get('TASKS_RUN_INLINE', 'False').lower() == 'true'
+    # Lock file electing the one worker that runs exclusive periodic jobs (customer stats rebuild)
+    TASKS_LOCK_FILE = os.environ.get('TASKS_LOCK_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tasks.lock'))
+    
+    # Guest Carts
+    GUEST_CART_COOKIE_NAME = os.environ.get('GUEST_CART_COOKIE_NAME', 'fd_guest_cart')
+    GUEST_CART_TTL_DAYS = int(os.environ.get('GUEST_CART_TTL_DAYS', 7))
+    GUEST_CART_MAX_ITEMS = int(os.environ.get('GUEST_CART_MAX_ITEMS', 100))
+    GUEST_CART_SWEEP_INTERVAL = int(os.environ.get('GUEST_CART_SWEEP_INTERVAL', 3600))  # seconds
+    
+    # Stock Reservations
+    RESERVATION_TTL_MINUTES = int(os.environ.get('RESERVATION_TTL_MINUTES', 15))
+    RESERVATION_SWEEP_INTERVAL = int(os.environ.get('RESERVATION_SWEEP_INTERVAL', 60))  # seconds
+    
+    # Stock Ledger
+    STOCK_SNAPSHOT_INTERVAL = int(os.environ.get('STOCK_SNAPSHOT_INTERVAL', 300))  # seconds
+    STOCK_SNAPSHOT_SETTLE_SECONDS = int(os.environ.get('STOCK_SNAPSHOT_SETTLE_SECONDS', 60))
+    STOCK_RECONCILE_INTERVAL = int(os.environ.get('STOCK_RECONCILE_INTERVAL', 3600))  # seconds
+    STOCK_RECONCILE_CHUNK_SIZE = int(os.environ.get('STOCK_RECONCILE_CHUNK_SIZE', 500))
+    
+    # Low Stock Alerts
+    LOW_STOCK_THRESHOLD = int(os.environ.get('LOW_STOCK_THRESHOLD', 10))
+    LOW_STOCK_ALERTS_ENABLED = os.environ.get('LOW_STOCK_ALERTS_ENABLED', 'True').lower() == 'true'
+    LOW_STOCK_ALERT_RECIPIENTS = os.environ.get('LOW_STOCK_ALERT_RECIPIENTS')  # comma-separated; defaults to active admins
+    LOW_STOCK_REBUILD_INTERVAL = int(os.environ.get('LOW_STOCK_REBUILD_INTERVAL', 3600))  # seconds
+    
+    # Caching
+    CACHE_ENABLED = os.environ.get('CACHE_ENABLED', 'True').lower() == 'true'
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', 300))  # seconds
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 2000))
+    CACHE_VERSION_CHECK_INTERVAL = float(os.environ.get('CACHE_VERSION_CHECK_INTERVAL', 2))  # seconds
+    # Product listings show stock, which checkout changes without invalidating
+    CACHE_PRODUCTS_TTL = int(os.environ.get('CACHE_PRODUCTS_TTL', 60))  # seconds
+    CACHE_CATEGORIES_TTL = int(os.environ.get('CACHE_CATEGORIES_TTL', 300))  # seconds
+    # Site content only changes through admin routes, which invalidate it
+    CACHE_CONTENT_TTL = int(os.environ.get('CACHE_CONTENT_TTL', 3600))  # seconds
+    
+    # Orders
+    ORDER_BULK_STATUS_LIMIT = int(os.environ.get('ORDER_BULK_STATUS_LIMIT', 1000))
+    
+    # Bulk Product Operations
+    PRODUCT_BULK_LIMIT = int(os.environ.get('PRODUCT_BULK_LIMIT', 5000))
+    
+    # Customer Search
+    PHONE_DEFAULT_COUNTRY_CODE = os.environ.get('PHONE_DEFAULT_COUNTRY_CODE', '254')  # for numbers written with a leading 0
+    CUSTOMER_PAGE_SIZE = int(os.environ.get('CUSTOMER_PAGE_SIZE', 100))
+    CUSTOMER_SEARCH_PAGE_SIZE = int(os.environ.get('CUSTOMER_SEARCH_PAGE_SIZE', 25))
+    CUSTOMER_PAGE_SIZE_MAX = int(os.environ.get('CUSTOMER_PAGE_SIZE_MAX', 500))
+    
+    # Customer Stats
+    CUSTOMER_STATS_ENABLED = os.environ.get('CUSTOMER_STATS_ENABLED', 'True').lower() == 'true'  # maintain customer_stats on order writes
+    CUSTOMER_STATS_REBUILD_INTERVAL = int(os.environ.get('CUSTOMER_STATS_REBUILD_INTERVAL', 86400))  # seconds
+    CUSTOMER_SUMMARY_RECENT_ORDERS = int(os.environ.get('CUSTOMER_SUMMARY_RECENT_ORDERS', 5))
+    
+    # Customer Data Export and Erasure
+    CUSTOMER_EXPORT_CHUNK_SIZE = int(os.environ.get('CUSTOMER_EXPORT_CHUNK_SIZE', 500))  # rows per streamed chunk
+    CUSTOMER_ERASURE_CHUNK_SIZE = int(os.environ.get('CUSTOMER_ERASURE_CHUNK_SIZE', 500))  # rows per transaction
+    CUSTOMER_ERASURE_SWEEP_INTERVAL = int(os.environ.get('CUSTOMER_ERASURE_SWEEP_INTERVAL', 300))  # seconds
+    CUSTOMER_ERASURE_STALE_SECONDS = int(os.environ.get('CUSTOMER_ERASURE_STALE_SECONDS', 900))  # resume jobs idle this long
+    
+    # Feedback Inbox
+    FEEDBACK_PAGE_SIZE = int(os.environ.get('FEEDBACK_PAGE_SIZE', 50))
+    FEEDBACK_PAGE_SIZE_MAX = int(os.environ.get('FEEDBACK_PAGE_SIZE_MAX', 200))
+    FEEDBACK_BULK_LIMIT = int(os.environ.get('FEEDBACK_BULK_LIMIT', 5000))
+    FEEDBACK_EMAIL_BATCH_SIZE = int(os.environ.get('FEEDBACK_EMAIL_BATCH_SIZE', 100))  # messages per SMTP connection
+    FEEDBACK_EMAIL_SWEEP_INTERVAL = int(os.environ.get('FEEDBACK_EMAIL_SWEEP_INTERVAL', 600))  # seconds between sweeps for owed emails
+    FEEDBACK_EMAIL_SWEEP_DELAY = int(os.environ.get('FEEDBACK_EMAIL_SWEEP_DELAY', 600))  # leave responses this recent to their own batch
+    FEEDBACK_EMAIL_SWEEP_LIMIT = int(os.environ.get('FEEDBACK_EMAIL_SWEEP_LIMIT', 1000))
+    FEEDBACK_ANALYSIS_ENABLED = os.environ.get('FEEDBACK_ANALYSIS_ENABLED', 'True').lower() == 'true'  # sentiment and topic tagging
+    FEEDBACK_ANALYSIS_BATCH_SIZE = int(os.environ.get('FEEDBACK_ANALYSIS_BATCH_SIZE', 500))
+    FEEDBACK_ANALYSIS_INTERVAL = int(os.environ.get('FEEDBACK_ANALYSIS_INTERVAL', 300))  # seconds between backlog sweeps
+    
+    # Catalog Browsing
+    PRICE_FACET_EDGES = os.environ.get('PRICE_FACET_EDGES', '5,10,20,50')  # bucket boundaries for the price facet
+    BROWSE_MAX_PER_PAGE = int(os.environ.get('BROWSE_MAX_PER_PAGE', 100))
+    
+    # Site Content
+    HEALTH_TIPS_PER_PAGE = int(os.environ.get('HEALTH_TIPS_PER_PAGE', 12))
+    HEALTH_TIPS_MAX_PER_PAGE = int(os.environ.get('HEALTH_TIPS_MAX_PER_PAGE', 100))
+    # JSON snapshots of the public content responses for the web server to serve
+    STATIC_EXPORT_DIR = os.environ.get('STATIC_EXPORT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'export'))
+    STATIC_EXPORT_ENABLED = os.environ.get('STATIC_EXPORT_ENABLED', 'False').lower() == 'true'  # refresh after admin writes
+    STATIC_EXPORT_INTERVAL = int(os.environ.get('STATIC_EXPORT_INTERVAL', 300))  # seconds between refreshes
+    
     # Security Headers
     SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', 'False').lower() == 'true'
     SESSION_COOKIE_HTTPONLY = True
@@ -50,6 +156,7 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'  # Use in-memory database for tests
+    TASKS_RUN_INLINE = True  # Run background jobs synchronously in tests
 
 # Configuration dictionary
 config_by_name = {
@@ -0,0 +1,32 @@
+"""Add cache namespaces
+
+Revision ID: 1138f7de4f5f
+Revises: fcf5bf8579ec
+Create Date: 2026-10-19 18:46:15.527390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1138f7de4f5f'
+down_revision = 'fcf5bf8579ec'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The app's create_all() may already have created the table on startup
+    if sa.inspect(op.get_bind()).has_table('cache_namespaces'):
+        return
+    op.create_table('cache_namespaces',
+    sa.Column('namespace', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('namespace')
+    )
+
+
+def downgrade():
+    op.drop_table('cache_namespaces')
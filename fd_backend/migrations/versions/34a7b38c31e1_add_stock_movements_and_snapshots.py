@@ -0,0 +1,52 @@
+"""Add stock movements and snapshots
+
+Revision ID: 34a7b38c31e1
+Revises: 49ec7bddebf0
+Create Date: 2026-10-19 17:58:26.104733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '34a7b38c31e1'
+down_revision = '49ec7bddebf0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The app's create_all() may already have created the tables on startup
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('stock_movements'):
+        op.create_table('stock_movements',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('movement_type', sa.String(length=20), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('reference', sa.String(length=64), nullable=True),
+        sa.Column('note', sa.String(length=255), nullable=True),
+        sa.Column('created_by', sa.String(length=64), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('idx_movement_product_id', 'stock_movements', ['product_id', 'id', 'quantity'], unique=False)
+        op.create_index('idx_movement_reference', 'stock_movements', ['reference'], unique=False)
+    if not inspector.has_table('stock_snapshots'):
+        op.create_table('stock_snapshots',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('last_movement_id', sa.Integer(), nullable=False),
+        sa.Column('taken_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id')
+        )
+
+
+def downgrade():
+    op.drop_table('stock_snapshots')
+    op.drop_index('idx_movement_reference', table_name='stock_movements')
+    op.drop_index('idx_movement_product_id', table_name='stock_movements')
+    op.drop_table('stock_movements')
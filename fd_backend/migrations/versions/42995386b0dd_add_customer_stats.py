@@ -0,0 +1,41 @@
+"""Add customer stats
+
+Revision ID: 42995386b0dd
+Revises: 9a03bdf5bc4c
+Create Date: 2026-10-19 19:47:55.202317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '42995386b0dd'
+down_revision = '9a03bdf5bc4c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # The app's create_all() may already have created the table on startup;
+    # it is filled by the app on its next start (orders.rebuild_customer_stats)
+    if not inspector.has_table('customer_stats'):
+        op.create_table('customer_stats',
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('order_count', sa.Integer(), nullable=False),
+        sa.Column('cancelled_count', sa.Integer(), nullable=False),
+        sa.Column('lifetime_value', sa.Float(), nullable=False),
+        sa.Column('first_order_at', sa.DateTime(), nullable=True),
+        sa.Column('last_order_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('customer_id')
+        )
+    if 'idx_order_customer_date' not in {index['name'] for index in inspector.get_indexes('orders')}:
+        op.create_index('idx_order_customer_date', 'orders', ['customer_id', 'order_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_order_customer_date', table_name='orders')
+    op.drop_table('customer_stats')
@@ -0,0 +1,42 @@
+"""Add stock reservations
+
+Revision ID: 49ec7bddebf0
+Revises: e11e87faa59e
+Create Date: 2026-10-19 17:41:03.662915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '49ec7bddebf0'
+down_revision = 'e11e87faa59e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The app's create_all() may already have created the table on startup
+    if sa.inspect(op.get_bind()).has_table('stock_reservations'):
+        return
+    op.create_table('stock_reservations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('holder', sa.String(length=64), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('holder', 'product_id', name='uq_reservation_holder_product')
+    )
+    op.create_index('idx_reservation_expires', 'stock_reservations', ['expires_at'], unique=False)
+    op.create_index('idx_reservation_product_expires', 'stock_reservations', ['product_id', 'expires_at', 'quantity'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_reservation_product_expires', table_name='stock_reservations')
+    op.drop_index('idx_reservation_expires', table_name='stock_reservations')
+    op.drop_table('stock_reservations')
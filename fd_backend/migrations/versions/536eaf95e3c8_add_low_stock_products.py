@@ -0,0 +1,40 @@
+"""Add low stock products and the active stock index
+
+Revision ID: 536eaf95e3c8
+Revises: 34a7b38c31e1
+Create Date: 2026-10-19 18:09:47.350129
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '536eaf95e3c8'
+down_revision = '34a7b38c31e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The app's create_all() may already have created the table on startup
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('low_stock_products'):
+        op.create_table('low_stock_products',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('stock_quantity', sa.Integer(), nullable=False),
+        sa.Column('threshold', sa.Integer(), nullable=False),
+        sa.Column('flagged_at', sa.DateTime(), nullable=True),
+        sa.Column('notified_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id')
+        )
+        op.create_index('idx_low_stock_quantity', 'low_stock_products', ['stock_quantity'], unique=False)
+    if 'idx_product_active_stock' not in {index['name'] for index in inspector.get_indexes('products')}:
+        op.create_index('idx_product_active_stock', 'products', ['is_active', 'stock_quantity'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_product_active_stock', table_name='products')
+    op.drop_index('idx_low_stock_quantity', table_name='low_stock_products')
+    op.drop_table('low_stock_products')
@@ -0,0 +1,45 @@
+"""Add order version and status history
+
+Revision ID: 7427773ff158
+Revises: 536eaf95e3c8
+Create Date: 2026-10-19 18:21:30.918462
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7427773ff158'
+down_revision = '536eaf95e3c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'version' not in {column['name'] for column in inspector.get_columns('orders')}:
+        # Existing orders start at version 1
+        op.add_column('orders', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    # The app's create_all() may already have created the table on startup
+    if not inspector.has_table('order_status_history'):
+        op.create_table('order_status_history',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('from_status', sa.String(length=50), nullable=True),
+        sa.Column('to_status', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('changed_by', sa.String(length=64), nullable=True),
+        sa.Column('note', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('idx_order_status_history_order', 'order_status_history', ['order_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_order_status_history_order', table_name='order_status_history')
+    op.drop_table('order_status_history')
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('version')
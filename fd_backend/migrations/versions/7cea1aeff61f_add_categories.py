@@ -0,0 +1,55 @@
+"""Add categories and products.category_id
+
+Revision ID: 7cea1aeff61f
+Revises: f9d033e4066f
+Create Date: 2026-10-19 19:10:41.066395
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7cea1aeff61f'
+down_revision = 'f9d033e4066f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # The app's create_all() may already have created the table on startup
+    if not inspector.has_table('categories'):
+        op.create_table('categories',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('slug', sa.String(length=120), nullable=False),
+        sa.Column('parent_id', sa.Integer(), nullable=True),
+        sa.Column('product_count', sa.Integer(), nullable=False),
+        sa.Column('display_order', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['parent_id'], ['categories.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+        sa.UniqueConstraint('slug')
+        )
+        op.create_index('idx_category_parent', 'categories', ['parent_id'], unique=False)
+
+    # Products are filed under their category by the app on its next start
+    # (categories.sync_product_categories)
+    if 'category_id' not in {column['name'] for column in inspector.get_columns('products')}:
+        with op.batch_alter_table('products') as batch_op:
+            batch_op.add_column(sa.Column('category_id', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key('fk_product_category', 'categories', ['category_id'], ['id'])
+    if 'idx_product_category_active' not in {index['name'] for index in inspector.get_indexes('products')}:
+        op.create_index('idx_product_category_active', 'products', ['category_id', 'is_active'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_product_category_active', table_name='products')
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_constraint('fk_product_category', type_='foreignkey')
+        batch_op.drop_column('category_id')
+    op.drop_index('idx_category_parent', table_name='categories')
+    op.drop_table('categories')
@@ -0,0 +1,34 @@
+"""Add feedback response_notified_at
+
+Revision ID: 8b8ce3c20e8c
+Revises: bf198ded66a1
+Create Date: 2026-10-19 20:41:37.215806
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b8ce3c20e8c'
+down_revision = 'bf198ded66a1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('feedback')}
+    if 'response_notified_at' in columns:
+        return
+    op.add_column('feedback', sa.Column('response_notified_at', sa.DateTime(), nullable=True))
+    # Responses given before this column existed were never emailed in bulk; the
+    # periodic send_response_emails sweep must not email them now
+    op.execute(
+        "UPDATE feedback SET response_notified_at = COALESCE(updated_at, CURRENT_TIMESTAMP) "
+        "WHERE response IS NOT NULL"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('feedback') as batch_op:
+        batch_op.drop_column('response_notified_at')
@@ -0,0 +1,39 @@
+"""Add customer phone search and listing indexes
+
+Revision ID: 9a03bdf5bc4c
+Revises: 7cea1aeff61f
+Create Date: 2026-10-19 19:32:18.514026
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a03bdf5bc4c'
+down_revision = '7cea1aeff61f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # Existing customers' numbers are normalized by the app on its next start
+    # (customers.backfill_phone_numbers)
+    if 'phone_normalized' not in {column['name'] for column in inspector.get_columns('customers')}:
+        op.add_column('customers', sa.Column('phone_normalized', sa.String(length=20), nullable=True))
+    indexes = {index['name'] for index in inspector.get_indexes('customers')}
+    if 'idx_customer_phone_normalized' not in indexes:
+        op.create_index('idx_customer_phone_normalized', 'customers', ['phone_normalized'], unique=False)
+    if 'idx_customer_status' not in indexes:
+        op.create_index('idx_customer_status', 'customers', ['is_active', 'email_verified', 'id'], unique=False)
+    if 'ft_customer_name' not in indexes:
+        op.create_index('ft_customer_name', 'customers', ['name'], unique=False, mysql_prefix='FULLTEXT')
+
+
+def downgrade():
+    op.drop_index('ft_customer_name', table_name='customers')
+    op.drop_index('idx_customer_status', table_name='customers')
+    op.drop_index('idx_customer_phone_normalized', table_name='customers')
+    with op.batch_alter_table('customers') as batch_op:
+        batch_op.drop_column('phone_normalized')
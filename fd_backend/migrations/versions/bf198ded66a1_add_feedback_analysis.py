@@ -0,0 +1,60 @@
+"""Add feedback sentiment, urgency and topics
+
+Revision ID: bf198ded66a1
+Revises: e090035e0164
+Create Date: 2026-10-19 20:26:04.693518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bf198ded66a1'
+down_revision = 'e090035e0164'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # Existing feedback is analyzed by the app's periodic analyze_feedback job
+    columns = {column['name'] for column in inspector.get_columns('feedback')}
+    if 'sentiment_score' not in columns:
+        op.add_column('feedback', sa.Column('sentiment_score', sa.Float(), nullable=True))
+    if 'sentiment' not in columns:
+        op.add_column('feedback', sa.Column('sentiment', sa.String(length=10), nullable=True))
+    if 'urgency' not in columns:
+        op.add_column('feedback', sa.Column('urgency', sa.Integer(), nullable=True))
+    if 'analyzed_at' not in columns:
+        op.add_column('feedback', sa.Column('analyzed_at', sa.DateTime(), nullable=True))
+    indexes = {index['name'] for index in inspector.get_indexes('feedback')}
+    if 'idx_feedback_urgency_id' not in indexes:
+        op.create_index('idx_feedback_urgency_id', 'feedback', ['urgency', 'id'], unique=False)
+    if 'idx_feedback_sentiment_id' not in indexes:
+        op.create_index('idx_feedback_sentiment_id', 'feedback', ['sentiment', 'id'], unique=False)
+    if 'idx_feedback_analyzed' not in indexes:
+        op.create_index('idx_feedback_analyzed', 'feedback', ['analyzed_at', 'id'], unique=False)
+
+    # The app's create_all() may already have created the table on startup
+    if not inspector.has_table('feedback_topics'):
+        op.create_table('feedback_topics',
+        sa.Column('feedback_id', sa.Integer(), nullable=False),
+        sa.Column('topic', sa.String(length=50), nullable=False),
+        sa.ForeignKeyConstraint(['feedback_id'], ['feedback.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('feedback_id', 'topic')
+        )
+        op.create_index('idx_feedback_topic', 'feedback_topics', ['topic', 'feedback_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_feedback_topic', table_name='feedback_topics')
+    op.drop_table('feedback_topics')
+    op.drop_index('idx_feedback_analyzed', table_name='feedback')
+    op.drop_index('idx_feedback_sentiment_id', table_name='feedback')
+    op.drop_index('idx_feedback_urgency_id', table_name='feedback')
+    with op.batch_alter_table('feedback') as batch_op:
+        batch_op.drop_column('analyzed_at')
+        batch_op.drop_column('urgency')
+        batch_op.drop_column('sentiment')
+        batch_op.drop_column('sentiment_score')
@@ -0,0 +1,52 @@
+"""Add customer erasures and the cart and order item customer indexes
+
+Revision ID: c5261cbc546e
+Revises: 42995386b0dd
+Create Date: 2026-10-19 20:03:12.840719
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5261cbc546e'
+down_revision = '42995386b0dd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # The app's create_all() may already have created the table on startup
+    if not inspector.has_table('customer_erasures'):
+        op.create_table('customer_erasures',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('mode', sa.String(length=20), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('step', sa.String(length=50), nullable=True),
+        sa.Column('progress', sa.Text(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('requested_by', sa.String(length=64), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('idx_customer_erasure_customer', 'customer_erasures', ['customer_id'], unique=False)
+        op.create_index('idx_customer_erasure_status', 'customer_erasures', ['status', 'updated_at'], unique=False)
+    # Erasure deletes carts and order items by customer and order
+    if 'idx_cart_customer' not in {index['name'] for index in inspector.get_indexes('carts')}:
+        op.create_index('idx_cart_customer', 'carts', ['customer_id'], unique=False)
+    if 'idx_order_item_order' not in {index['name'] for index in inspector.get_indexes('order_items')}:
+        op.create_index('idx_order_item_order', 'order_items', ['order_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_order_item_order', table_name='order_items')
+    op.drop_index('idx_cart_customer', table_name='carts')
+    op.drop_index('idx_customer_erasure_status', table_name='customer_erasures')
+    op.drop_index('idx_customer_erasure_customer', table_name='customer_erasures')
+    op.drop_table('customer_erasures')
@@ -0,0 +1,39 @@
+"""Add feedback inbox indexes
+
+Revision ID: e090035e0164
+Revises: c5261cbc546e
+Create Date: 2026-10-19 20:14:36.371952
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e090035e0164'
+down_revision = 'c5261cbc546e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('feedback')}
+    if 'idx_feedback_status_id' not in indexes:
+        op.create_index('idx_feedback_status_id', 'feedback', ['status', 'id'], unique=False)
+    if 'idx_feedback_status_rating' not in indexes:
+        op.create_index('idx_feedback_status_rating', 'feedback', ['status', 'rating'], unique=False)
+    if 'idx_feedback_rating_id' not in indexes:
+        op.create_index('idx_feedback_rating_id', 'feedback', ['rating', 'id'], unique=False)
+    if 'idx_feedback_created' not in indexes:
+        op.create_index('idx_feedback_created', 'feedback', ['created_at'], unique=False)
+    if 'ft_feedback_text' not in indexes:
+        op.create_index('ft_feedback_text', 'feedback', ['title', 'feedback_message'], unique=False,
+                        mysql_prefix='FULLTEXT')
+
+
+def downgrade():
+    op.drop_index('ft_feedback_text', table_name='feedback')
+    op.drop_index('idx_feedback_created', table_name='feedback')
+    op.drop_index('idx_feedback_rating_id', table_name='feedback')
+    op.drop_index('idx_feedback_status_rating', table_name='feedback')
+    op.drop_index('idx_feedback_status_id', table_name='feedback')
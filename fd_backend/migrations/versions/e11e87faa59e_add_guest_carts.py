@@ -0,0 +1,38 @@
+"""Add guest carts
+
+Revision ID: e11e87faa59e
+Revises:
+Create Date: 2026-10-19 17:05:12.418204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e11e87faa59e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The app's create_all() may already have created the table on startup
+    if sa.inspect(op.get_bind()).has_table('guest_carts'):
+        return
+    op.create_table('guest_carts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('token', sa.String(length=64), nullable=False),
+    sa.Column('items', sa.Text(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('token')
+    )
+    op.create_index('idx_guest_cart_expires', 'guest_carts', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_guest_cart_expires', table_name='guest_carts')
+    op.drop_table('guest_carts')
@@ -0,0 +1,69 @@
+"""Add product variants and the product price range
+
+Revision ID: f9d033e4066f
+Revises: 1138f7de4f5f
+Create Date: 2026-10-19 18:58:09.804117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f9d033e4066f'
+down_revision = '1138f7de4f5f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # The app's create_all() may already have created the table on startup
+    if not inspector.has_table('product_variants'):
+        op.create_table('product_variants',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('sku', sa.String(length=64), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('stock_quantity', sa.Integer(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('sort_order', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('sku')
+        )
+        op.create_index('idx_variant_product_active_price', 'product_variants', ['product_id', 'is_active', 'price'], unique=False)
+
+    columns = {column['name'] for column in inspector.get_columns('products')}
+    if 'min_price' not in columns:
+        op.add_column('products', sa.Column('min_price', sa.Float(), nullable=True))
+    if 'max_price' not in columns:
+        op.add_column('products', sa.Column('max_price', sa.Float(), nullable=True))
+    indexes = {index['name'] for index in inspector.get_indexes('products')}
+    if 'idx_product_active_max_price' not in indexes:
+        op.create_index('idx_product_active_max_price', 'products', ['is_active', 'max_price'], unique=False)
+    if 'idx_product_active_min_price' not in indexes:
+        op.create_index('idx_product_active_min_price', 'products', ['is_active', 'min_price'], unique=False)
+
+    # Fill the price range of existing products, as catalog.refresh_price_range does
+    op.execute("""
+        UPDATE products SET
+            min_price = COALESCE((SELECT MIN(v.price) FROM product_variants v
+                                  WHERE v.product_id = products.id AND v.is_active = 1), products.price),
+            max_price = COALESCE((SELECT MAX(v.price) FROM product_variants v
+                                  WHERE v.product_id = products.id AND v.is_active = 1), products.price)
+        WHERE min_price IS NULL OR max_price IS NULL
+    """)
+
+
+def downgrade():
+    op.drop_index('idx_product_active_min_price', table_name='products')
+    op.drop_index('idx_product_active_max_price', table_name='products')
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('max_price')
+        batch_op.drop_column('min_price')
+    op.drop_index('idx_variant_product_active_price', table_name='product_variants')
+    op.drop_table('product_variants')
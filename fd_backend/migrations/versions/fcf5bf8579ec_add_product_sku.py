@@ -0,0 +1,30 @@
+"""Add product SKU
+
+Revision ID: fcf5bf8579ec
+Revises: 7427773ff158
+Create Date: 2026-10-19 18:34:52.270641
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fcf5bf8579ec'
+down_revision = '7427773ff158'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'sku' in {column['name'] for column in sa.inspect(op.get_bind()).get_columns('products')}:
+        return
+    op.add_column('products', sa.Column('sku', sa.String(length=64), nullable=True))
+    # Same name MySQL gives the unique key of a unique=True column
+    op.create_index('sku', 'products', ['sku'], unique=True)
+
+
+def downgrade():
+    op.drop_index('sku', table_name='products')
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('sku')
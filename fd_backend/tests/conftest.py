@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import TestingConfig  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App on a file-backed SQLite database, so several threads can share it"""
+    from app import create_app
+    from app.extensions import cache
+
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        # Wait for the other writer's lock instead of failing with 'database is locked'
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+        SQL_LOG_REQUESTS = False
+
+    # Namespace versions are remembered per process, and every test has a new database
+    cache.clear()
+    return create_app(Config)
+
+
+@pytest.fixture
+def customer_headers(app):
+    """Authorization headers for n new customers"""
+    from flask_jwt_extended import create_access_token
+    from app.extensions import db
+    from app.models.customer import Customer
+
+    def make(count=1):
+        headers = []
+        with app.app_context():
+            for number in range(count):
+                customer = Customer(name=f'Customer {number}', phone=f'0700 000 {number:03d}',
+                                    email=f'customer{number}@example.com', password='x')
+                db.session.add(customer)
+                db.session.commit()
+                token = create_access_token(identity=f'customer_{customer.id}', additional_claims={'role': 'customer'})
+                headers.append({'Authorization': f'Bearer {token}'})
+        return headers
+
+    return make
+
+
+@pytest.fixture
+def make_product(app):
+    """Create an active product with the given stock and return its id"""
+    from app.extensions import db
+    from app.models.product import Product
+
+    def make(stock, name='Mango Juice', price=5.0, category='Juices'):
+        with app.app_context():
+            product = Product(name=name, price=price, category=category, stock_quantity=stock)
+            db.session.add(product)
+            db.session.commit()
+            return product.id
+
+    return make
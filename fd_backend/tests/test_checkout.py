@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+
+from app.extensions import db
+from app.models.inventory import StockMovement
+from app.models.order import Order
+from app.models.product import Product
+
+
+def stock_of(app, product_id):
+    with app.app_context():
+        return db.session.get(Product, product_id).stock_quantity
+
+
+def test_concurrent_checkouts_sell_the_last_unit_once(app, customer_headers, make_product):
+    product_id = make_product(stock=1)
+    headers = customer_headers(2)
+    barrier = threading.Barrier(len(headers))
+    statuses = []
+
+    def checkout(auth):
+        client = app.test_client()
+        barrier.wait()
+        response = client.post('/api/v1/orders/', headers=auth,
+                               json={'items': [{'product_id': product_id, 'quantity': 1}]})
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=checkout, args=(auth,)) for auth in headers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [201, 409]
+    assert stock_of(app, product_id) == 0
+    with app.app_context():
+        assert Order.query.count() == 1
+        assert StockMovement.query.filter_by(product_id=product_id, movement_type=StockMovement.SALE).count() == 1
+
+
+def test_checkout_beyond_stock_is_refused_without_side_effects(app, customer_headers, make_product):
+    product_id = make_product(stock=2)
+    [auth] = customer_headers()
+    response = app.test_client().post('/api/v1/orders/', headers=auth,
+                                      json={'items': [{'product_id': product_id, 'quantity': 3}]})
+
+    assert response.status_code == 409
+    assert response.get_json()['shortages'] == [{'product_id': product_id, 'requested': 3, 'available': 2}]
+    assert stock_of(app, product_id) == 2
+    with app.app_context():
+        assert Order.query.count() == 0
+
+
+@pytest.mark.parametrize('body', [
+    {'items': 'mango'},
+    {'items': ['mango']},
+    {'items': [{'product_id': '1', 'quantity': 1}]},
+    {'items': [{'product_id': 1, 'quantity': 0}]},
+    ['mango'],
+])
+def test_malformed_items_are_rejected(app, customer_headers, body):
+    [auth] = customer_headers()
+    response = app.test_client().post('/api/v1/orders/', headers=auth, json=body)
+    assert response.status_code == 400
@@ -0,0 +1,15 @@
+def suggested(client, query):
+    response = client.get('/api/v1/products/suggest', query_string={'q': query})
+    return [item['name'] for item in response.get_json()['suggestions']]
+
+
+def test_cli_import_refreshes_cached_product_views(app, tmp_path):
+    client = app.test_client()
+    assert suggested(client, 'zanzibar') == []
+
+    path = tmp_path / 'products.csv'
+    path.write_text('sku,name,category,price,stock_quantity\nZNZ-001,Zanzibar Mango Juice,Juices,4.5,10\n')
+    result = app.test_cli_runner().invoke(args=['import-products', str(path)])
+
+    assert result.exit_code == 0, result.output
+    assert suggested(client, 'zanzibar') == ['Zanzibar Mango Juice']
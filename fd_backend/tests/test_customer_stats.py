@@ -0,0 +1,60 @@
+import fcntl
+
+from app.extensions import db, background_tasks
+from app.models.customer import Customer, CustomerStats
+from app.models.order import Order
+from app.orders import rebuild_customer_stats
+
+
+def make_customer(number):
+    customer = Customer(name=f'Customer {number}', phone=f'0711 000 {number:03d}',
+                        email=f'stats{number}@example.com', password='x')
+    db.session.add(customer)
+    db.session.flush()
+    return customer.id
+
+
+def test_rebuild_corrects_drift_and_fills_missing_rows(app):
+    with app.app_context():
+        first, second, third = (make_customer(number) for number in range(3))
+        db.session.add_all([
+            Order(customer_id=first, total_amount=10.0, status='Delivered'),
+            Order(customer_id=first, total_amount=5.0, status='Cancelled'),
+            Order(customer_id=second, total_amount=7.5, status='Pending'),
+        ])
+        # Drifted, missing (second) and orphaned (third) rows
+        db.session.add(CustomerStats(customer_id=first, order_count=9, cancelled_count=0, lifetime_value=99.0))
+        db.session.add(CustomerStats(customer_id=third, order_count=1, cancelled_count=0, lifetime_value=1.0))
+        db.session.commit()
+
+        assert rebuild_customer_stats(chunk_size=1) == 2
+
+        stats = {row.customer_id: row for row in CustomerStats.query.all()}
+        assert set(stats) == {first, second}
+        assert (stats[first].order_count, stats[first].cancelled_count, stats[first].lifetime_value) == (2, 1, 10.0)
+        assert (stats[second].order_count, stats[second].cancelled_count, stats[second].lifetime_value) == (1, 0, 7.5)
+        assert stats[first].first_order_at is not None and stats[first].last_order_at is not None
+
+
+def test_exclusive_jobs_run_in_the_process_holding_the_lock_file(app, tmp_path):
+    path = tmp_path / 'tasks.lock'
+    app.config['TASKS_LOCK_FILE'] = str(path)
+    runs = []
+    background_tasks.add_periodic('exclusive_probe', 0, runs.append, 'ran', exclusive=True)
+    try:
+        with open(path, 'a') as other_worker:
+            fcntl.flock(other_worker, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            background_tasks._run_due_periodic()
+            assert runs == []
+
+        # Released (the other worker exited): this process takes over and keeps the lock
+        background_tasks._run_due_periodic()
+        background_tasks._run_due_periodic()
+        assert runs == ['ran', 'ran']
+    finally:
+        with background_tasks._lock:
+            background_tasks._periodic.pop('exclusive_probe', None)
+        if background_tasks._lock_file is not None:
+            background_tasks._lock_file.close()
+        background_tasks._lock_file = None
+        background_tasks._lock_pid = None
@@ -0,0 +1,100 @@
+from app.models.feedback import Feedback
+
+
+def test_customer_can_submit_feedback(app, customer_headers):
+    [auth] = customer_headers()
+    response = app.test_client().post('/api/v1/feedback/', headers=auth,
+                                      json={'title': 'Mango juice', 'message': 'Fresh and cold, thanks', 'rating': 5})
+
+    assert response.status_code == 201
+    with app.app_context():
+        feedback = Feedback.query.one()
+        assert feedback.status == 'new'
+        assert feedback.sentiment == 'positive'
+
+
+def test_feedback_without_a_token_is_refused(app):
+    response = app.test_client().post('/api/v1/feedback/', json={'message': 'Hello'})
+    assert response.status_code == 401
+
+
+def _admin_headers(app):
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        return {'Authorization': f"Bearer {create_access_token(identity='admin_1')}"}
+
+
+def _responded_feedback(app, customer_headers, count):
+    from datetime import datetime, timedelta
+    from app.extensions import db
+    customer_headers(1)
+    with app.app_context():
+        for number in range(count):
+            db.session.add(Feedback(customer_id=1, feedback_message=f'Message {number}', response='Thanks',
+                                    updated_at=datetime.utcnow() - timedelta(hours=1)))
+        db.session.commit()
+
+
+def test_bulk_respond_rejects_bad_filters(app, customer_headers):
+    _responded_feedback(app, customer_headers, 2)
+    client = app.test_client()
+    headers = _admin_headers(app)
+    for selection in ({'stauts': 'new'}, {'status': [1]}, {'min_rating': 'x'}, {'rating': True},
+                      {'since': 'yesterday'}, {'q': ['a']}, {'status': ' , '}):
+        response = client.put('/api/v1/feedback/bulk-respond', headers=headers,
+                              json={'response': 'Thanks', 'filter': selection, 'dry_run': True})
+        assert response.status_code == 400, selection
+
+    response = client.put('/api/v1/feedback/bulk-respond', headers=headers,
+                          json={'response': 'Thanks', 'filter': {'status': ['new']}, 'dry_run': True})
+    assert response.status_code == 200
+    assert response.get_json()['matched'] == 2
+
+
+def test_response_emails_are_marked_one_by_one(app, customer_headers):
+    from app.extensions import mail
+    from app.inbox import send_response_emails, sweep_response_emails
+    from flask_mail import email_dispatched
+    _responded_feedback(app, customer_headers, 3)
+
+    def fail_on_second(sender, message):
+        if len(outbox) == 2:
+            raise ConnectionError('SMTP connection lost')
+
+    with app.app_context():
+        with mail.record_messages() as outbox:
+            email_dispatched.connect(fail_on_second)
+            try:
+                send_response_emails([1, 2, 3])
+            except ConnectionError:
+                pass
+            finally:
+                email_dispatched.disconnect(fail_on_second)
+        notified = [feedback.response_notified_at is not None for feedback in Feedback.query.order_by(Feedback.id)]
+        assert notified == [True, False, False]
+
+        with mail.record_messages() as outbox:
+            assert sweep_response_emails() == 2
+        assert len(outbox) == 2
+        assert Feedback.query.filter(Feedback.response_notified_at.is_(None)).count() == 0
+        assert sweep_response_emails() == 0
+
+
+def test_bulk_filter_until_date_matches_the_inbox(app, customer_headers):
+    from datetime import datetime
+    from app.extensions import db
+    customer_headers(1)
+    with app.app_context():
+        for day in (1, 2):
+            db.session.add(Feedback(customer_id=1, feedback_message=f'October {day}',
+                                    created_at=datetime(2026, 10, day, 12, 0)))
+        db.session.commit()
+    client = app.test_client()
+    headers = _admin_headers(app)
+
+    inbox = client.get('/api/v1/feedback/', headers=headers, query_string={'until': '2026-10-01'})
+    bulk = client.put('/api/v1/feedback/bulk-respond', headers=headers,
+                      json={'response': 'Thanks', 'filter': {'until': '2026-10-01'}, 'dry_run': True})
+
+    assert [item['message'] for item in inbox.get_json()['feedbacks']] == ['October 1']
+    assert bulk.get_json()['matched'] == 1
@@ -0,0 +1,19 @@
+from app.controllers import health
+
+
+def readiness(app):
+    health._probe_cache.clear()
+    return app.test_client().get('/health/ready')
+
+
+def test_readiness_probes_the_configured_upload_folder(app, tmp_path):
+    app.config['HEALTH_CHECK_SMTP'] = False
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    response = readiness(app)
+    assert response.status_code == 200
+    assert response.get_json()['checks']['uploads']['path'] == str(tmp_path)
+
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'missing')
+    response = readiness(app)
+    assert response.status_code == 503
+    assert response.get_json()['checks']['uploads']['status'] == 'down'
@@ -0,0 +1,20 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.extensions import db, query_instrumentation
+
+
+def test_failed_statements_leave_nothing_on_the_connection(app):
+    with app.test_request_context('/'):
+        query_instrumentation._start_request()
+        connection = db.session.connection()
+        with pytest.raises(OperationalError):
+            connection.execute(text('SELECT * FROM no_such_table'))
+        db.session.rollback()
+
+        connection = db.session.connection()
+        connection.execute(text('SELECT 1'))
+        assert 'query_start_time' not in connection.info
+        response = query_instrumentation._finish_request(app.response_class())
+        assert 'desc="1 queries"' in response.headers['Server-Timing']
@@ -0,0 +1,39 @@
+from app.cache import PRODUCTS
+from app.extensions import db, cache
+from app.inventory import apply_movements, set_stock
+from app.models.inventory import StockMovement
+
+
+def test_selling_out_invalidates_the_products_cache(app, make_product):
+    with app.app_context():
+        product_id = make_product(stock=2)
+        version = cache.version(PRODUCTS)
+
+        apply_movements(StockMovement.SALE, {product_id: -1})
+        db.session.commit()
+        assert cache.version(PRODUCTS) == version
+
+        apply_movements(StockMovement.SALE, {product_id: -1})
+        db.session.commit()
+        assert cache.version(PRODUCTS) == version + 1
+
+
+def test_restocking_invalidates_the_products_cache(app, make_product):
+    with app.app_context():
+        product_id = make_product(stock=0)
+        version = cache.version(PRODUCTS)
+
+        set_stock(product_id, 5)
+        db.session.commit()
+        assert cache.version(PRODUCTS) == version + 1
+
+
+def test_rolled_back_sale_keeps_the_products_cache(app, make_product):
+    with app.app_context():
+        product_id = make_product(stock=1)
+        version = cache.version(PRODUCTS)
+
+        apply_movements(StockMovement.SALE, {product_id: -1})
+        db.session.rollback()
+        db.session.commit()
+        assert cache.version(PRODUCTS) == version
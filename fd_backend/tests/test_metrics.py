@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+from app.extensions import metrics
+
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_metrics_need_an_allowed_address_or_the_token(app):
+    app.config['METRICS_TOKEN'] = 'scrape-secret'
+    client = app.test_client()
+    outside = {'REMOTE_ADDR': '203.0.113.7'}
+
+    assert client.get('/metrics').status_code == 200
+    assert client.get('/metrics', environ_base=outside).status_code == 403
+    assert client.get('/metrics', environ_base=outside,
+                      headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    assert client.get('/metrics', environ_base=outside,
+                      headers={'Authorization': 'Bearer scrape-secret'}).status_code == 200
+
+
+def test_exited_workers_are_folded_into_one_file(app, tmp_path):
+    metrics_dir = tmp_path / 'metrics'
+    metrics_dir.mkdir()
+    app.config['METRICS_DIR'] = str(metrics_dir)
+    for number in range(3):
+        with open(metrics_dir / f'metrics_{number}_dead.json', 'w') as fh:
+            json.dump({'pid': exited_pid(), 'metrics': {
+                'fruitdesign_checkouts_total': [[['cart'], 2.0]],
+                'fruitdesign_http_requests_in_flight': [[['app'], 1.0]]
+            }}, fh)
+
+    with app.app_context():
+        own = {tuple(key): value for key, value in metrics.snapshot()['fruitdesign_checkouts_total']}.get(('cart',), 0.0)
+        before = metrics.collect()['fruitdesign_checkouts_total'].get(('cart',), 0.0)
+        assert before == own + 6.0
+        assert sorted(os.listdir(metrics_dir)) == ['exited_metrics.json', 'metrics.lock']
+        # A second scrape neither loses nor double-counts the folded workers
+        after = metrics.collect()
+        assert after['fruitdesign_checkouts_total'].get(('cart',), 0.0) == before
+        assert after['fruitdesign_http_requests_in_flight'].get(('app',), 0.0) == 0.0
@@ -0,0 +1,13 @@
+from app.sentiment import analyze
+
+
+def test_praise_with_never_is_not_urgent():
+    score, label, _, urgency = analyze('Best juice', 'I will never buy any other mango juice, love it', rating=5)
+    assert label == 'positive'
+    assert urgency < 30
+
+
+def test_complaint_words_raise_urgency():
+    _, _, _, calm = analyze('Order', 'The order arrived today', rating=3)
+    _, _, _, urgent = analyze('Order', 'The juice arrived rotten, I want a refund', rating=3)
+    assert urgent >= calm + 20
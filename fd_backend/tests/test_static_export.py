@@ -0,0 +1,28 @@
+import fcntl
+import os
+import threading
+
+from app.static_export import LOCK_FILE, MANIFEST, export_static
+
+
+def test_export_waits_for_another_workers_export(app, tmp_path):
+    output_dir = tmp_path / 'export'
+    output_dir.mkdir()
+    finished = threading.Event()
+
+    def run():
+        with app.app_context():
+            export_static(str(output_dir))
+        finished.set()
+
+    # Another open file description stands in for another worker holding the lock
+    with open(output_dir / LOCK_FILE, 'a') as other_worker:
+        fcntl.flock(other_worker, fcntl.LOCK_EX)
+        thread = threading.Thread(target=run)
+        thread.start()
+        assert not finished.wait(0.5)
+        assert not os.path.exists(output_dir / MANIFEST)
+    thread.join(10)
+
+    assert finished.is_set()
+    assert os.path.exists(output_dir / MANIFEST)
@@ -0,0 +1,35 @@
+from app.suggest import SuggestIndex
+
+
+def names(results):
+    return [result['name'] for result in results]
+
+
+def test_multi_word_query_finds_rare_matches_behind_many_candidates():
+    rows = [(product_id, f'Mango Juice {product_id}', 'Juices', False) for product_id in range(1, 3001)]
+    rows.append((5000, 'Tropical Gold Mango Sorbet with Baobab', 'Desserts', False))
+    index = SuggestIndex()
+    index.build(rows)
+
+    assert names(index.search('mango baob')) == ['Tropical Gold Mango Sorbet with Baobab']
+    assert names(index.search('sorbet mango')) == ['Tropical Gold Mango Sorbet with Baobab']
+    assert index.search('mango kiwi') == []
+
+
+def test_multi_word_query_ranks_names_starting_with_the_phrase_first():
+    index = SuggestIndex()
+    index.build([
+        (1, 'Fresh Farm Apple Juice 1l', 'Juices', True),
+        (2, 'Apple Juice', 'Juices', False),
+        (3, 'Apple & Mango Juice 500ml', 'Juices', False),
+        (4, 'Apple Slices', 'Fresh Fruit', False),
+    ])
+
+    # Then featured, then shorter names
+    assert names(index.search('apple ju')) == ['Apple Juice', 'Fresh Farm Apple Juice 1l', 'Apple & Mango Juice 500ml']
+
+    index.upsert(4, 'Apple Juice Concentrate', 'Juices', False)
+    index.remove(2)
+    assert names(index.search('apple ju')) == [
+        'Apple Juice Concentrate', 'Fresh Farm Apple Juice 1l', 'Apple & Mango Juice 500ml'
+    ]
@@ -0,0 +1,25 @@
+import pytest
+
+from app.extensions import background_tasks
+
+
+# Jobs whose side effects (logs, alerts, shared files) must happen once, not once per worker
+@pytest.mark.parametrize('name', ['reconcile_stock', 'analyze_feedback'])
+def test_single_worker_jobs_are_exclusive(app, name):
+    assert background_tasks._periodic[name]['exclusive']
+
+
+def test_static_export_runs_in_one_worker(tmp_path):
+    from app import create_app
+    from config import TestingConfig
+
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        STATIC_EXPORT_ENABLED = True
+        STATIC_EXPORT_DIR = str(tmp_path / 'export')
+
+    create_app(Config)
+    try:
+        assert background_tasks._periodic['export_static']['exclusive']
+    finally:
+        background_tasks._periodic.pop('export_static', None)